@@ -0,0 +1,101 @@
+'''
+Benchmark the terminal escape sequence renderer.
+
+Generates a coloured log with progress bar lines redrawn through carriage
+returns, feeds it in 64 KiB chunks to a Screen alone and to the terminal
+panel, flushing the panel once per simulated frame, and reports lines and
+megabytes per second.
+
+    $ python3 ./bench/ansi.py [--lines N]
+'''
+
+import argparse
+import json
+import time
+import common
+from utils.ansi import Screen
+from view.terminal import Terminal
+
+LEVELS = ['\x1b[32mINFO\x1b[0m', '\x1b[33mWARN\x1b[0m', '\x1b[1;31mERROR\x1b[0m',
+          '\x1b[38;5;244mDEBUG\x1b[0m']
+CHUNK = 65536
+# Chunks read between two frames
+CHUNKS_PER_FRAME = 8
+
+
+def coloured_log(lines):
+    '''
+    Return lines of coloured log, every 100th a progress bar
+    '''
+    parts = []
+    for i in range(lines):
+        if i % 100 == 99:
+            parts.append(''.join('\r\x1b[36m[%-20s]\x1b[0m %3d%%' % ('#' * (step // 5), step)
+                                 for step in range(0, 101, 10)) + '\r\n')
+        else:
+            parts.append('2024-05-01 12:00:%02d %s \x1b[1mworker.%d\x1b[22m processed '
+                         'item %d in %d ms\r\n' % (i % 60, LEVELS[i % 4], i % 8, i, i % 97))
+    return ''.join(parts)
+
+
+def chunks(text):
+    '''
+    Split text in CHUNK sized pieces, cutting through escape sequences
+    '''
+    return [text[i:i + CHUNK] for i in range(0, len(text), CHUNK)]
+
+
+def parse(pieces):
+    '''
+    Feed the pieces to a Screen, taking its output once per frame
+    '''
+    screen = Screen(rows=40)
+    for i, piece in enumerate(pieces):
+        screen.feed(piece)
+        if i % CHUNKS_PER_FRAME == 0:
+            screen.take()
+    screen.take()
+
+
+def render(pieces):
+    '''
+    Feed the pieces to a terminal panel, flushing it once per frame
+    '''
+    terminal = Terminal()
+    terminal.resize(800, 600)
+    terminal.show()
+    common.application().processEvents()
+    start = time.perf_counter()
+    for i, piece in enumerate(pieces):
+        terminal.write_output(piece)
+        if i % CHUNKS_PER_FRAME == 0:
+            terminal.flush_output()
+    terminal.flush_output()
+    return time.perf_counter() - start
+
+
+def run(lines=1000000):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    common.application()
+    text = coloured_log(lines)
+    pieces = chunks(text)
+    megabytes = len(text.encode('utf-8')) / 2 ** 20
+    parsed = common.timed(parse, pieces)
+    rendered = render(pieces)
+    return {
+        'lines': lines,
+        'megabytes': round(megabytes, 1),
+        'parse_lines_per_second': int(lines / parsed),
+        'parse_mb_per_second': round(megabytes / parsed, 1),
+        'render_lines_per_second': int(lines / rendered),
+        'render_mb_per_second': round(megabytes / rendered, 1),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--lines', type=int, default=1000000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines), indent=4))
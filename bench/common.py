@@ -0,0 +1,71 @@
+'''
+Shared helpers for the headless benchmarks.
+'''
+
+import os
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.abspath(SRC))
+
+from PyQt5.QtWidgets import QApplication
+
+SAMPLE = '''\
+class Vector(object):
+    """
+    A small vector class, used as synthetic benchmark input.
+    """
+
+    def __init__(self, x=0, y=0.5e3):
+        self.x = x  # horizontal
+        self.y = y
+
+    def __add__(self, other):
+        return Vector(self.x + other.x, self.y + other.y)
+
+    def scale(self, factor):
+        if factor == 0 or factor is None:
+            raise ValueError('factor must be non-zero, got %r' % factor)
+        return [self.x * factor, self.y * factor, {"k": 0xFF}]
+
+'''
+
+
+_application = None
+
+
+def application():
+    '''
+    Return the running QApplication, creating an offscreen one if needed.
+    '''
+    global _application
+    if QApplication.instance() is None:
+        _application = QApplication(sys.argv[:1])
+    return QApplication.instance()
+
+
+def synthetic_python(lines):
+    '''
+    Return roughly the given number of lines of Python source.
+    '''
+    sample = SAMPLE.splitlines()
+    repeat = lines // len(sample) + 1
+    return '\n'.join((sample * repeat)[:lines])
+
+
+def timed(fn, *args, repeat=1, warmup=False):
+    '''
+    Return the best wall time of fn(*args) over repeat runs, after an
+    untimed run with warmup.
+    '''
+    if warmup:
+        fn(*args)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
@@ -0,0 +1,99 @@
+'''
+Benchmark code completion served by the jedi worker process.
+
+Reports the latency from request to reply of the first completion, while
+jedi loads, and the p50 and p99 of the following ones at various places
+of a generated module, the same for bursts of requests where only the
+last one is answered, and the time to filter a cached list as the word
+grows.
+
+    $ python3 ./bench/completion.py [--lines N] [--requests N]
+'''
+
+import argparse
+import json
+import time
+import common
+from utils.completion import CompletionClient
+from utils.profiler import Histogram
+from view.completer import Completer
+from view.editor import Editor
+
+
+def wait(app, client, seconds=60):
+    '''
+    Process events until the client has no pending request
+    '''
+    end = time.perf_counter() + seconds
+    while client.pending and time.perf_counter() < end:
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def run(lines=2000, requests=50):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    app = common.application()
+    text = common.synthetic_python(lines) + '\nimport os\n'
+    positions = [(number, line.index('self.') + 5)
+                 for number, line in enumerate(text.splitlines(), 1) if 'self.' in line]
+    client = CompletionClient()
+    try:
+        start = time.perf_counter()
+        client.request(('first',), None, None, text + 'os.', lines + 2, 3)
+        wait(app, client)
+        first = time.perf_counter() - start
+        names = client.cached(('first',))
+
+        client.latency = Histogram()
+        for number in range(requests):
+            line, column = positions[number * 7 % len(positions)]
+            client.request(('warm', number), None, None, text, line, column)
+            wait(app, client)
+        warm = client.latency.stats()
+
+        client.latency = Histogram()
+        for burst in range(requests // 5):
+            for number in range(5):
+                line, column = positions[(burst * 5 + number) * 3 % len(positions)]
+                client.request(('burst', burst, number), None, None, text, line, column)
+            wait(app, client)
+        bursts = client.latency.stats()
+        counts = dict(client.counts)
+
+        editor = Editor()
+        completer = Completer(editor, client)
+        completer.completions = names
+        prefixes = ['', 'p', 'pa', 'pat', 'path']
+
+        def filter_all():
+            for prefix in prefixes:
+                completer.prefix = prefix
+                completer.filter()
+        filtered = common.timed(filter_all, repeat=5) / len(prefixes)
+        completions = len(completer.completions)
+        completer.hide()
+        editor.deleteLater()
+    finally:
+        client.close()
+    return {
+        'first_ms': round(first * 1000, 1),
+        'warm_p50_ms': warm['p50_ms'],
+        'warm_p99_ms': warm['p99_ms'],
+        'warm_mean_ms': warm['mean_ms'],
+        'burst_p50_ms': bursts['p50_ms'],
+        'burst_p99_ms': bursts['p99_ms'],
+        'cancelled': counts['cancelled'],
+        'stale': counts['stale'],
+        'completions': completions,
+        'filter_ms': round(filtered * 1000, 2),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--lines', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines, args.requests), indent=4))
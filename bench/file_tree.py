@@ -0,0 +1,149 @@
+'''
+Benchmark the file tree.
+
+Opens a generated folder in a QTreeView backed by QFileSystemModel rooted
+at '/', as the editor used to, and by the lazy FileTreeModel, then expands
+a few folders. Each model runs in its own process; reports the time until
+the folder is listed, the number of inotify watches (Linux only) and the
+growth of the resident memory.
+
+    $ python3 ./bench/file_tree.py [--folders N] [--expand N]
+'''
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import common
+from PyQt5.QtCore import QDir
+from PyQt5.QtWidgets import QFileSystemModel, QTreeView
+from view.filemodel import FileTreeModel
+
+
+def inotify_watches():
+    '''
+    Return the number of inotify watches of this process, None if unknown
+    '''
+    try:
+        fds = os.listdir('/proc/self/fdinfo')
+    except OSError:
+        return None
+    count = 0
+    for fd in fds:
+        try:
+            with open('/proc/self/fdinfo/%s' % fd) as file:
+                count += sum(line.startswith('inotify') for line in file)
+        except OSError:
+            pass
+    return count
+
+
+def resident_memory():
+    '''
+    Return the resident memory of this process in bytes, None if unknown
+    '''
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def make_tree(root, folders):
+    '''
+    Write folders folders of 20 files, each with a subfolder of 20 files
+    '''
+    for i in range(folders):
+        sub = os.path.join(root, 'pkg%04d' % i, 'sub')
+        os.makedirs(sub)
+        for j in range(20):
+            open(os.path.join(root, 'pkg%04d' % i, 'f%d.py' % j), 'w').close()
+            open(os.path.join(sub, 'g%d.py' % j), 'w').close()
+
+
+def wait_rows(app, model, index, timeout=60):
+    '''
+    Process events until the index has rows
+    '''
+    deadline = time.perf_counter() + timeout
+    while model.rowCount(index) == 0 and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def measure(kind, root, expand):
+    '''
+    Open root with one kind of model in this process, return the results
+    '''
+    app = common.application()
+    memory = resident_memory()
+    start = time.perf_counter()
+    view = QTreeView()
+    if kind == 'legacy':
+        model = QFileSystemModel()
+        model.setRootPath(QDir.rootPath())
+        view.setModel(model)
+        model.setRootPath(root)
+        parent = model.index(root)
+        view.setRootIndex(parent)
+    else:
+        model = FileTreeModel()
+        view.setModel(model)
+        model.setRootPath(root)
+        parent = view.rootIndex()
+    view.show()
+    wait_rows(app, model, parent)
+    listed = time.perf_counter() - start
+    for row in range(expand):
+        index = model.index(row, 0, parent)
+        view.expand(index)
+        wait_rows(app, model, index)
+    expanded = time.perf_counter() - start
+    for _ in range(20):
+        app.processEvents()
+        time.sleep(0.005)
+    results = {
+        'listed_ms': round(listed * 1000, 1),
+        'expanded_ms': round(expanded * 1000, 1),
+        'inotify_watches': inotify_watches(),
+        'memory_growth_kb': (resident_memory() - memory) // 1024 if memory else None,
+    }
+    if kind == 'lazy':
+        results['model'] = model.stats()
+        model.close()
+    return results
+
+
+def run(folders=2000, expand=5):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    root = tempfile.mkdtemp()
+    try:
+        make_tree(root, folders)
+        results = {'folders': folders, 'expanded': expand}
+        for kind in ('legacy', 'lazy'):
+            output = subprocess.check_output(
+                [sys.executable, __file__, '--measure', kind, root,
+                 '--expand', str(expand)])
+            results[kind] = json.loads(output)
+        return results
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--folders', type=int, default=2000)
+    parser.add_argument('--expand', type=int, default=5)
+    parser.add_argument('--measure', nargs=2, metavar=('KIND', 'ROOT'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], args.measure[1], args.expand)))
+    else:
+        print(json.dumps(run(args.folders, args.expand), indent=4))
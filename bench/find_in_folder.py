@@ -0,0 +1,116 @@
+'''
+Benchmark searching a folder.
+
+Generates a checkout of small Python files with an ignored build folder and
+some binary files, then searches it on one process, as a plain loop would,
+and with FolderSearch on the process pool, cold (spawning the workers) and
+warm. Reports files/s, MB/s and the time until the first results arrive.
+
+    $ python3 ./bench/find_in_folder.py [--files N] [--query TEXT]
+'''
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import common
+from utils.grep import FolderSearch, compile_query, search_batch, WORKERS
+from utils.ignore import walk
+
+
+def make_tree(root, files):
+    '''
+    Write files Python files in folders of 100, plus ignored and binary ones
+    '''
+    text = common.synthetic_python(80).encode('utf-8')
+    for i in range(files):
+        folder = os.path.join(root, 'pkg%d' % (i // 100))
+        if i % 100 == 0:
+            os.makedirs(folder)
+        with open(os.path.join(folder, 'module%d.py' % i), 'wb') as file:
+            file.write(text.replace(b'Vector', b'Vector%d' % i))
+    os.makedirs(os.path.join(root, 'build'))
+    for i in range(files // 100):
+        with open(os.path.join(root, 'build', 'out%d.py' % i), 'wb') as file:
+            file.write(text)
+        with open(os.path.join(root, 'pkg0', 'blob%d.bin' % i), 'wb') as file:
+            file.write(b'\0' * 64 + text)
+    with open(os.path.join(root, '.gitignore'), 'w') as file:
+        file.write('/build/\n')
+
+
+def serial(root, pattern):
+    '''
+    Walk and search on the calling process
+    '''
+    start = time.perf_counter()
+    paths = [path for path, _ in walk(root)]
+    matches = sum(len(found) for _, found in search_batch(paths, pattern))
+    return time.perf_counter() - start, len(paths), matches
+
+
+def parallel(root, pattern):
+    '''
+    Run a FolderSearch, return (seconds, first results, files, matches)
+    '''
+    app = common.application()
+    search = FolderSearch(root, pattern)
+    first = []
+    search.found.connect(lambda _: first or first.append(time.perf_counter()))
+    start = time.perf_counter()
+    search.start()
+    while not search.isFinished():
+        app.processEvents()
+        time.sleep(0.001)
+    search.wait()
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    return (elapsed, first[0] - start if first else None,
+            search.files, search.results)
+
+
+def rate(files, size, seconds):
+    '''
+    Return throughput figures for a run
+    '''
+    return {'seconds': round(seconds, 3),
+            'files_per_second': round(files / seconds),
+            'megabytes_per_second': round(size / seconds / 1e6, 1)}
+
+
+def run(files=50000, query='Vector1234'):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    root = tempfile.mkdtemp()
+    try:
+        make_tree(root, files)
+        size = sum(file_size for _, file_size in walk(root))
+        pattern = compile_query(query)
+        serial_time, searched, serial_matches = serial(root, pattern)
+        cold, _, _, _ = parallel(root, pattern)
+        warm, first, parallel_files, parallel_matches = parallel(root, pattern)
+        assert (parallel_files, parallel_matches) == (searched, serial_matches)
+        return {
+            'files': searched,
+            'megabytes': round(size / 1e6, 1),
+            'matches': serial_matches,
+            'workers': WORKERS,
+            'serial': rate(searched, size, serial_time),
+            'parallel_cold': rate(searched, size, cold),
+            'parallel_warm': rate(searched, size, warm),
+            'first_results_ms': round(first * 1000, 1),
+            'speedup': round(serial_time / warm, 2),
+        }
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--files', type=int, default=50000)
+    parser.add_argument('--query', default='Vector1234')
+    args = parser.parse_args()
+    print(json.dumps(run(args.files, args.query), indent=4))
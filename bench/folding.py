@@ -0,0 +1,70 @@
+'''
+Benchmark the fold index of a Python module.
+
+Reports the time to index the module, to index it again after typing
+a character and after opening a string that runs to the end of the
+module, and to fold and unfold every top-level region.
+
+    $ python3 ./bench/folding.py [--lines N]
+'''
+
+import argparse
+import json
+import common
+from PyQt5.QtGui import QTextDocument, QTextCursor
+from PyQt5.QtWidgets import QPlainTextDocumentLayout
+from syntax.folding import FoldIndex
+
+
+def run(lines=100000):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    common.application()
+    document = QTextDocument()
+    # Changes are only reported once the document has a layout, the
+    # editor's one
+    document.setDocumentLayout(QPlainTextDocumentLayout(document))
+    document.setPlainText(common.synthetic_python(lines))
+    index = FoldIndex(document)
+    rebuild = common.timed(index.rebuild, repeat=3)
+
+    cursor = QTextCursor(document.findBlockByNumber(document.blockCount() // 2))
+
+    def type_character():
+        cursor.insertText('x')
+        cursor.deletePreviousChar()
+
+    typing = common.timed(type_character, repeat=20) / 2
+
+    def open_string():
+        cursor.insertText('"""')
+        for _ in range(3):
+            cursor.deletePreviousChar()
+
+    string = common.timed(open_string, repeat=3) / 2
+
+    headers = [line for line in range(document.blockCount())
+               if index.indents[line] == 0 and index.is_header(line)]
+
+    def fold_all():
+        for line in headers:
+            index.fold(line)
+        index.unfold_all()
+
+    folding = common.timed(fold_all, repeat=3)
+    return {
+        'lines': document.blockCount(),
+        'regions': len(headers),
+        'rebuild_ms': round(rebuild * 1000, 1),
+        'type_ms': round(typing * 1000, 3),
+        'open_string_ms': round(string * 1000, 1),
+        'fold_unfold_all_ms': round(folding * 1000, 1),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--lines', type=int, default=100000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines), indent=4))
@@ -0,0 +1,133 @@
+'''
+Benchmark painting the line number gutter.
+
+Holds the down arrow key in a large document, first on screen and then
+scrolling, with the gutter as it used to be (every line painted, with the
+current line looked up per line, on every cursor move) and with the
+cached, damage-only gutter. Reports the gutter paint time per frame, the
+lines it painted and the whole frame time.
+
+    $ python3 ./bench/gutter.py [--lines N] [--presses N]
+'''
+
+import argparse
+import json
+import time
+import common
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QPainter, QTextCursor
+from PyQt5.QtTest import QTest
+from view.editor import Editor
+
+
+class TimedEditor(Editor):
+    '''
+    Editor timing the paint events of its gutter
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.paint_times = []
+        self.painted_lines = 0
+
+    def lineNumberBarPaintEvent(self, event):
+        start = time.perf_counter()
+        self.paintLineNumbers(event)
+        self.paint_times.append(time.perf_counter() - start)
+
+    def paintLineNumbers(self, event):
+        super().lineNumberBarPaintEvent(event)
+        self.painted_lines += event.rect().height() // self.fontMetrics().height()
+
+
+class LegacyEditor(TimedEditor):
+    '''
+    The previous gutter: all visible numbers repainted on every cursor move
+    '''
+
+    def paintLineNumbers(self, event):
+        painter = QPainter(self.lineNumberBar)
+        painter.fillRect(event.rect(), QColor(41, 44, 51))
+        block = self.firstVisibleBlock()
+        blockNumber = block.blockNumber()
+        char_width = self.fontMetrics().width('9')
+        top = self.blockBoundingGeometry(
+            block).translated(self.contentOffset()).top()
+        bottom = top + self.blockBoundingRect(block).height()
+        height = self.fontMetrics().height()
+
+        while block.isValid() and (top <= event.rect().bottom()):
+            if block.isVisible() and (bottom >= event.rect().top()):
+                number = str(self.first_line + blockNumber + 1)
+                if blockNumber == self.textCursor().blockNumber():
+                    painter.setPen(QColor(172, 178, 190))
+                else:
+                    painter.setPen(QColor(75, 81, 97))
+                painter.setFont(self.font())
+                painter.drawText(0, int(top), self.lineNumberBar.width() -
+                                 2*char_width, height, Qt.AlignRight, number)
+                self.painted_lines += 1
+
+            block = block.next()
+            top = bottom
+            bottom = top + self.blockBoundingRect(block).height()
+            blockNumber += 1
+
+    def highlightCurrentLine(self):
+        super().highlightCurrentLine()
+        self.lineNumberBar.update()
+
+
+def measure(editor, text, presses):
+    '''
+    Hold the down key in editor, return the results
+    '''
+    app = common.application()
+    editor.display_welcome = False
+    editor.setPlainText(text)
+    editor.setReadOnly(False)
+    editor.resize(1000, 800)
+    editor.show()
+    editor.moveCursor(QTextCursor.Start)
+    for _ in range(10):
+        app.processEvents()
+    editor.paint_times = []
+    editor.painted_lines = 0
+    frames = []
+    for _ in range(presses):
+        QTest.keyClick(editor, Qt.Key_Down)
+        start = time.perf_counter()
+        app.processEvents()
+        frames.append(time.perf_counter() - start)
+    editor.hide()
+    paint = sorted(editor.paint_times)
+    frames.sort()
+    return {
+        'gutter_paints': len(paint),
+        'gutter_ms_per_frame': round(sum(paint) / presses * 1000, 3),
+        'gutter_p99_ms': round(paint[len(paint) * 99 // 100] * 1000, 3) if paint else 0,
+        'lines_painted_per_frame': round(editor.painted_lines / presses, 1),
+        'frame_ms': round(sum(frames) / presses * 1000, 3),
+    }
+
+
+def run(lines=200000, presses=300):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    common.application()
+    text = common.synthetic_python(lines)
+    return {
+        'lines': lines,
+        'presses': presses,
+        'legacy': measure(LegacyEditor(), text, presses),
+        'cached': measure(TimedEditor(), text, presses),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--presses', type=int, default=300)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines, args.presses), indent=4))
@@ -0,0 +1,296 @@
+'''
+Benchmark Python highlighting throughput in blocks per second.
+
+Compares the single-pass tokenizer against the previous one-QRegExp-per-rule
+highlighter and reports how many blocks end up with different colours.
+
+    $ python3 ./bench/highlight.py [--lines N] [file.py]
+'''
+
+import argparse
+import json
+import common
+from PyQt5.QtCore import QRegExp
+from PyQt5.QtGui import QSyntaxHighlighter, QTextDocument, QTextCursor
+from PyQt5.QtWidgets import QPlainTextEdit
+from syntax.py import STYLES, CACHE, Highlighter
+
+
+class LegacyHighlighter(QSyntaxHighlighter):
+    '''
+    The previous highlighter, as it was: one QRegExp per rule, applied
+    in order, and triple quotes skipped when they look quoted.
+    '''
+    keywords = [
+        'and', 'assert', 'break', 'class', 'continue', 'def',
+        'del', 'elif', 'else', 'except', 'exec', 'finally',
+        'for', 'from', 'global', 'if', 'import', 'in',
+        'is', 'lambda', 'not', 'or', 'pass', 'print',
+        'raise', 'return', 'super', 'try', 'while', 'yield',
+        'None', 'True', 'False', 'as', 'with', 'async', 'await',
+    ]
+
+    operators = [
+        '=',
+        '==', '!=', '<', '<=', '>', '>=',
+        r'\+', '-', r'\*', '/', '//', r'\%', r'\*\*',
+        r'\+=', '-=', r'\*=', '/=', r'\%=',
+        r'\^', r'\|', r'\&', r'\~', '>>', '<<',
+    ]
+
+    braces = [
+        r'\{', r'\}', r'\(', r'\)', r'\[', r'\]',
+    ]
+
+    def __init__(self, document):
+        QSyntaxHighlighter.__init__(self, document)
+        tri = ("'''")
+        trid = ('"""')
+
+        self.tri_single = (QRegExp(tri), 1, STYLES['triplestring'])
+        self.tri_double = (QRegExp(trid), 2, STYLES['triplestring'])
+
+        rules = []
+
+        # Keyword, operator, and brace rules
+        rules += [(r'\b%s\b' % w, 0, STYLES['keyword'])
+                  for w in LegacyHighlighter.keywords]
+        rules += [(r'%s' % o, 0, STYLES['operator'])
+                  for o in LegacyHighlighter.operators]
+        rules += [(r'%s' % b, 0, STYLES['brace'])
+                  for b in LegacyHighlighter.braces]
+
+        # All other rules
+        rules += [
+            # Numeric literals
+            (r'\b[+-]?[0-9]+[lL]?\b', 0, STYLES['numbers']),
+            (r'\b[+-]?0[xX][0-9A-Fa-f]+[lL]?\b', 0, STYLES['numbers']),
+            (r'\b[+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?\b',
+             0, STYLES['numbers']),
+
+            # 'self'
+            (r'\bself\b', 0, STYLES['self']),
+
+            # Variable names
+            (r'\b(\w+)\b\s*(?=\=)', 1, STYLES['variable']),
+
+            # Function names
+            (r'\b(\w+)\b\s*(\()', 1, STYLES['functions']),
+
+            # Class names
+            (r'\bclass\b\s*(\w+)', 1, STYLES['classes']),
+
+            # Magic methods
+            (r'\b__(\w+)__\b', 0, STYLES['magicmethods']),
+
+            # Single line comment
+            (r'#[^\n]*', 0, STYLES['comment']),
+
+            # Single-quoted string, possibly containing escape sequences
+            (r"'(?:\\.|[^'\\])*'", 0, STYLES['string']),
+
+            # Double-quoted string, possibly containing escape sequences
+            (r'"(?:\\.|[^"\\])*"', 0, STYLES['string']),
+        ]
+
+        # Build a QRegExp for each pattern
+        self.rules = [(QRegExp(pat), index, fmt)
+                      for (pat, index, fmt) in rules]
+
+    def highlightBlock(self, text):
+        '''
+        Apply syntax highlighting to the given block of text.
+        '''
+        # Do other syntax formatting
+        for expression, nth, format in self.rules:
+            index = expression.indexIn(text, 0)
+
+            while index >= 0:
+                # We actually want the index of the nth match
+                index = expression.pos(nth)
+                length = len(expression.cap(nth))
+                self.setFormat(index, length, format)
+                index = expression.indexIn(text, index + length)
+
+        self.setCurrentBlockState(0)
+
+        # Do multi-line strings
+        in_multiline = self.match_multiline(text, *self.tri_single)
+        if not in_multiline:
+            in_multiline = self.match_multiline(text, *self.tri_double)
+
+    def in_quotes(self, text, position, delimiter):
+        '''
+        Check if the position is inside quotes
+        '''
+        in_quotes = False
+        quote_delimiters = ['"', "'"]
+        for quote in quote_delimiters:
+            quote_start = text.find(quote, 0, position)
+            quote_end = text.find(quote, position + delimiter.matchedLength())
+            if quote_start >= 0 and quote_end >= 0 and quote_start < position < quote_end:
+                in_quotes = True
+                break
+        return in_quotes
+
+    def match_multiline(self, text, delimiter, in_state, style):
+        '''
+        Do highlighting of multi-line strings.
+        '''
+        # If inside triple-single quotes, start at 0
+        if self.previousBlockState() == in_state:
+            start = 0
+            add = 0
+        # Otherwise, look for the delimiter on this line
+        else:
+            start = delimiter.indexIn(text)
+            # Move past this match
+            add = delimiter.matchedLength()
+
+        # As long as there's a delimiter match on this line...
+        while start >= 0:
+            # Check if the delimiter is inside quotes
+            if self.in_quotes(text, start, delimiter):
+                # Move past this match and continue searching
+                start = delimiter.indexIn(text, start + add)
+                continue
+            # Look for the ending delimiter
+            end = delimiter.indexIn(text, start + add)
+            # Ending delimiter on this line?
+            if end >= add:
+                length = end - start + add + delimiter.matchedLength()
+                self.setCurrentBlockState(0)
+            # No; multi-line string
+            else:
+                self.setCurrentBlockState(in_state)
+                length = len(text) - start + add
+            # Apply formatting
+            self.setFormat(start, length, style)
+            # Look for the next match
+            start = delimiter.indexIn(text, start + length)
+
+        # Return True if still inside a multi-line string, False otherwise
+        if self.currentBlockState() == in_state:
+            return True
+        else:
+            return False
+
+
+def colours(document):
+    '''
+    Return the foreground colour of every character, block by block.
+    '''
+    result = []
+    block = document.begin()
+    while block.isValid():
+        line = [None] * block.length()
+        for fmt in block.layout().formats():
+            name = fmt.format.foreground().color().name()
+            line[fmt.start:fmt.start + fmt.length] = \
+                [name] * len(line[fmt.start:fmt.start + fmt.length])
+        result.append(line)
+        block = block.next()
+    return result
+
+
+def measure_legacy(text):
+    '''
+    Highlight text with the legacy highlighter,
+    return (blocks per second, document).
+    '''
+    document = QTextDocument()
+    document.setPlainText(text)
+    highlighter = LegacyHighlighter(document)
+    seconds = common.timed(highlighter.rehighlight)
+    return document.blockCount() / seconds, document
+
+
+def highlight_all(highlighter):
+    '''
+    Highlight the whole document without going through the event loop.
+    '''
+    highlighter.rehighlight()
+    while not highlighter.is_finished():
+        highlighter.highlight_slice()
+
+
+def measure(text):
+    '''
+    Highlight text from scratch, return (blocks per second, document).
+    '''
+    editor = QPlainTextEdit()
+    editor.setPlainText(text)
+    highlighter = Highlighter(editor)
+    seconds = common.timed(highlight_all, highlighter)
+    document = editor.document()
+    document.setParent(None)
+    return document.blockCount() / seconds, document
+
+
+def storm(highlighter, editor):
+    '''
+    Open and close a triple-quoted string at the top of the document,
+    re-highlighting every block twice.
+    '''
+    cursor = QTextCursor(editor.document())
+    cursor.insertText('"""')
+    while not highlighter.is_finished():
+        highlighter.highlight_slice()
+    cursor.deletePreviousChar()
+    cursor.deletePreviousChar()
+    cursor.deletePreviousChar()
+    while not highlighter.is_finished():
+        highlighter.highlight_slice()
+
+
+def measure_storm(text, maxsize):
+    '''
+    Time a re-highlight storm with a format cache of the given size,
+    return (seconds, cache counters).
+    '''
+    editor = QPlainTextEdit()
+    editor.setPlainText(text)
+    highlighter = Highlighter(editor)
+    highlight_all(highlighter)
+    CACHE.clear()
+    CACHE.maxsize = maxsize
+    seconds = common.timed(storm, highlighter, editor)
+    return seconds, highlighter.cache_info()
+
+
+def run(lines=20000, path=None):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    common.application()
+    if path:
+        with open(path, encoding='utf-8') as file:
+            text = file.read()
+    else:
+        text = common.synthetic_python(lines)
+    before, legacy = measure_legacy(text)
+    maxsize = CACHE.maxsize
+    CACHE.maxsize = 0
+    after, current = measure(text)
+    different = sum(a != b for a, b in zip(colours(legacy), colours(current)))
+    uncached, _ = measure_storm(text, 0)
+    cached, info = measure_storm(text, maxsize)
+    return {
+        'blocks': current.blockCount(),
+        'legacy_blocks_per_second': round(before),
+        'blocks_per_second': round(after),
+        'speedup': round(after / before, 2),
+        'blocks_with_different_colours': different,
+        'storm_uncached_ms': round(uncached * 1000, 1),
+        'storm_cached_ms': round(cached * 1000, 1),
+        'storm_cache_hits': info['hits'],
+        'storm_cache_misses': info['misses'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('path', nargs='?')
+    parser.add_argument('--lines', type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines, args.path), indent=4))
@@ -0,0 +1,53 @@
+'''
+Benchmark opening a large Python document in the editor.
+
+Reports the time until setPlainText returns with the viewport highlighted,
+the time until the background pass has coloured the whole document and the
+longest single event-loop stall while it did so.
+
+    $ python3 ./bench/open_large.py [--lines N]
+'''
+
+import argparse
+import json
+import time
+import common
+from view.editor import Editor
+from syntax.py import Highlighter
+
+
+def run(lines=100000):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    app = common.application()
+    editor = Editor()
+    editor.resize(1000, 800)
+    editor.show()
+    highlighter = Highlighter(editor)
+    text = common.synthetic_python(lines)
+    app.processEvents()
+
+    start = time.perf_counter()
+    editor.setPlainText(text)
+    interactive = time.perf_counter() - start
+
+    stall = 0
+    while not highlighter.is_finished():
+        tick = time.perf_counter()
+        app.processEvents()
+        stall = max(stall, time.perf_counter() - tick)
+    finished = time.perf_counter() - start
+    return {
+        'blocks': editor.blockCount(),
+        'interactive_ms': round(interactive * 1000, 1),
+        'fully_highlighted_ms': round(finished * 1000, 1),
+        'longest_stall_ms': round(stall * 1000, 1),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--lines', type=int, default=100000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines), indent=4))
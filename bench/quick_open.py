@@ -0,0 +1,80 @@
+'''
+Benchmark the quick open path index.
+
+Builds a PathIndex over synthetic project paths, saves and reloads it, and
+times a set of fuzzy queries typed character by character.
+
+    $ python3 ./bench/quick_open.py [--paths N]
+'''
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+import common
+import utils.quickopen as quickopen
+
+WORDS = ['core', 'utils', 'view', 'model', 'test', 'data', 'net', 'http',
+         'server', 'client', 'config', 'parser', 'lexer', 'editor', 'widget',
+         'main', 'index', 'search', 'file', 'tree', 'io', 'api', 'impl']
+QUERIES = ['mainwindow', 'edtrwdg', 'src/view/mw', 'config_lexer', 'qzx']
+
+
+def synthetic_paths(count):
+    '''
+    Return count random relative paths, and one known file
+    '''
+    rng = random.Random(0)
+    paths = ['src/view/mainwindow.py']
+    for i in range(count - 1):
+        folders = '/'.join(rng.choice(WORDS) + str(rng.randint(0, 30))
+                           for _ in range(rng.randint(1, 5)))
+        paths.append('%s/%s_%s%d.%s' % (folders, rng.choice(WORDS),
+                                        rng.choice(WORDS), i,
+                                        rng.choice(['py', 'js', 'c', 'md'])))
+    return paths
+
+
+def run(count=200000):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    quickopen.DATA_DIR = tempfile.mkdtemp()
+    try:
+        paths = synthetic_paths(count)
+        start = time.perf_counter()
+        index = quickopen.PathIndex('/project', paths)
+        build = time.perf_counter() - start
+        save = common.timed(index.save)
+        start = time.perf_counter()
+        index = quickopen.PathIndex.load('/project')
+        load = time.perf_counter() - start
+
+        timings = []
+        for query in QUERIES:
+            for end in range(1, len(query) + 1):
+                start = time.perf_counter()
+                index.query(query[:end])
+                timings.append(time.perf_counter() - start)
+        timings.sort()
+        return {
+            'paths': len(index),
+            'build_ms': round(build * 1000, 1),
+            'save_ms': round(save * 1000, 1),
+            'load_ms': round(load * 1000, 1),
+            'queries': len(timings),
+            'query_p50_ms': round(timings[len(timings) // 2] * 1000, 2),
+            'query_max_ms': round(timings[-1] * 1000, 2),
+            'mainwindow_first': index.query('mainwin')[0] == paths[0],
+        }
+    finally:
+        shutil.rmtree(quickopen.DATA_DIR)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--paths', type=int, default=200000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.paths), indent=4))
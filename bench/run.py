@@ -0,0 +1,323 @@
+'''
+Run the benchmark suite of the editor hot paths.
+
+Every case drives the real classes on the offscreen platform and reports
+one or more metrics; names ending in _ms are better lower, names ending
+in _per_s better higher. The results are compared with the stored
+baseline and the run fails when a metric regressed by more than the
+tolerance. Every case runs once untimed first, so that --repeat 1 is not
+a cold start. A baseline is only meaningful on the machine that recorded
+it, --save stores the median of several runs of the suite timed once
+each, which the best of any number of repeats can be compared with.
+
+    $ python3 ./bench/run.py [--repeat N] [--runs N] [--tolerance PERCENT]
+                             [--baseline FILE] [--save] [--only CASE ...]
+'''
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import common
+from highlight import highlight_all
+from PyQt5.QtCore import QCoreApplication, QEvent
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtWidgets import QPlainTextEdit
+from syntax.py import CACHE, Highlighter
+from view.editor import Editor
+import view.mainwindow as mainwindow
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+LINES = 100000
+# Runs of the suite, timed once each, whose median --save stores
+SAVE_RUNS = 5
+# Percent that metrics timed in pieces of a millisecond or through the
+# event loop may get worse, their single runs vary that much
+NOISY = {
+    'gutter_paint_ms': 60,
+    'jump_ms': 50,
+    'terminal_lines_per_s': 50,
+    'find_next_per_s': 50,
+}
+# Slowdowns of _ms metrics below this many milliseconds are timer noise
+FLOOR_MS = 1.0
+TERMINAL_LINE = '\x1b[32mok\x1b[0m gcc -O2 -Wall -c src/module/source_file.c -o build/module/source_file.o\n'
+
+
+def dispose(window):
+    '''
+    Close a main window and delete it with the documents of its tabs
+    '''
+    window.close()
+    window.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+
+def editor_with(text):
+    '''
+    Return a shown editor holding text
+    '''
+    editor = Editor()
+    editor.display_welcome = False
+    editor.setReadOnly(False)
+    editor.setPlainText(text)
+    editor.resize(1000, 800)
+    editor.show()
+    common.application().processEvents()
+    return editor
+
+
+def highlight_cold(highlighter):
+    '''
+    Highlight the whole document from an empty format cache, without
+    going through the event loop
+    '''
+    CACHE.clear()
+    highlight_all(highlighter)
+
+
+def highlight_rate(text, repeat):
+    '''
+    Return the blocks per second highlighted from scratch
+    '''
+    editor = QPlainTextEdit()
+    editor.setPlainText(text)
+    highlighter = Highlighter(editor)
+    seconds = common.timed(highlight_cold, highlighter, repeat=repeat, warmup=True)
+    highlighter.timer.stop()
+    return editor.document().blockCount() / seconds
+
+
+def case_highlight(repeat):
+    '''
+    Highlighter.highlightBlock on synthetic code and on the sources of the
+    editor itself
+    '''
+    real = []
+    for path in sorted(glob.glob(os.path.join(common.SRC, '**', '*.py'), recursive=True)):
+        with open(path, encoding='utf-8') as file:
+            real.append(file.read())
+    return {
+        'highlight_synthetic_blocks_per_s': round(
+            highlight_rate(common.synthetic_python(LINES // 5), repeat)),
+        'highlight_real_blocks_per_s': round(highlight_rate('\n'.join(real), repeat)),
+    }
+
+
+def case_open_from_tree(repeat):
+    '''
+    MainWindow.open_file_from_tree until the file is loaded and editable
+    '''
+    app = common.application()
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'module.py')
+        with open(path, 'w') as file:
+            file.write(common.synthetic_python(LINES))
+        window = mainwindow.MainWindow()
+        window.ensure_tree()
+        window.model.setRootPath(directory)
+        while window.model.rowCount() == 0:
+            app.processEvents()
+        index = window.model.index(0, 0)
+
+        def open_file():
+            window.open_file_from_tree(index)
+            while window.loader is not None:
+                app.processEvents()
+            window.remove_tab(window.workspace.active)
+
+        seconds = common.timed(open_file, repeat=repeat, warmup=True)
+        dispose(window)
+        return {'open_from_tree_ms': round(seconds * 1000, 1)}
+    finally:
+        shutil.rmtree(directory)
+
+
+def case_find_replace(repeat):
+    '''
+    MainWindow.fnd_next through a large document, rpl_all over it, and
+    jump to lines and offsets, repaint included
+    '''
+    app = common.application()
+    window = mainwindow.MainWindow()
+    editor = window.editor
+    editor.display_welcome = False
+    editor.setReadOnly(False)
+    text = common.synthetic_python(LINES)
+    editor.setPlainText(text)
+    window.find_bar.setText('factor')
+    window.show()
+    app.processEvents()
+
+    def find_all():
+        editor.moveCursor(QTextCursor.Start)
+        for _ in range(1000):
+            window.fnd_next()
+        window.updates.flush()
+
+    def replace_all():
+        editor.setPlainText(text)
+        window.find_bar.setText('factor')
+        start = time.perf_counter()
+        window.rpl_all()
+        window.updates.flush()
+        return time.perf_counter() - start
+
+    def jump():
+        for target in ('1', str(LINES // 2), str(LINES), '@%d' % (len(text) // 3)):
+            window.jump_bar.setText(target)
+            window.jump()
+            app.processEvents()
+
+    find = common.timed(find_all, repeat=repeat, warmup=True)
+    replace_all()
+    replace = min(replace_all() for _ in range(repeat))
+    jumps = common.timed(jump, repeat=repeat, warmup=True)
+    dispose(window)
+    return {
+        'find_next_per_s': round(1000 / find),
+        'replace_all_ms': round(replace * 1000, 1),
+        'jump_ms': round(jumps / 4 * 1000, 2),
+    }
+
+
+def case_gutter(repeat):
+    '''
+    A full repaint of the line number bar
+    '''
+    editor = editor_with(common.synthetic_python(LINES))
+    editor.goToLine(LINES // 2)
+    common.application().processEvents()
+
+    def paint():
+        for _ in range(200):
+            editor.lineNumberBar.repaint()
+
+    seconds = common.timed(paint, repeat=repeat, warmup=True)
+    editor.close()
+    return {'gutter_paint_ms': round(seconds / 200 * 1000, 3)}
+
+
+def case_terminal(repeat):
+    '''
+    Terminal output through the escape sequence screen into the widget,
+    one flush per 64 KiB chunk
+    '''
+    from view.terminal import Terminal
+    app = common.application()
+    terminal = Terminal()
+    terminal.resize(800, 400)
+    terminal.show()
+    # The shell started on show would compete with the timed cases
+    terminal.close_session()
+    while terminal.session is not None:
+        app.processEvents()
+    lines = LINES // 2
+    per_chunk = 65536 // len(TERMINAL_LINE)
+    chunk = TERMINAL_LINE * per_chunk
+
+    def ingest():
+        for _ in range(lines // per_chunk):
+            terminal.write_output(chunk)
+            terminal.flush_output()
+
+    seconds = common.timed(ingest, repeat=repeat, warmup=True)
+    terminal.close()
+    return {'terminal_lines_per_s': round(lines // per_chunk * per_chunk / seconds)}
+
+
+CASES = {
+    'highlight': case_highlight,
+    'open_from_tree': case_open_from_tree,
+    'find_replace': case_find_replace,
+    'gutter': case_gutter,
+    'terminal': case_terminal,
+}
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Return the change of every metric against the baseline, in percent
+    where positive is better, and the names of the regressed metrics.
+    Noisy metrics get the wider tolerance of NOISY and _ms metrics must
+    also have slowed down by FLOOR_MS.
+    '''
+    changes = {}
+    regressions = []
+    for name, value in results.items():
+        before = baseline.get(name)
+        if not before or not value:
+            continue
+        if name.endswith('_per_s'):
+            change = (value / before - 1) * 100
+        else:
+            change = (before / value - 1) * 100
+        changes[name] = round(change, 1)
+        if change >= -max(tolerance, NOISY.get(name, 0)):
+            continue
+        if name.endswith('_ms') and value - before < FLOOR_MS:
+            continue
+        regressions.append(name)
+    return changes, regressions
+
+
+def run(repeat=5, only=None, runs=1):
+    '''
+    Return the metrics of the cases as a dict, the median of each over
+    runs of the suite.
+    '''
+    common.application()
+    samples = {}
+    for _ in range(runs):
+        for name, case in CASES.items():
+            if only and name not in only:
+                continue
+            for metric, value in case(repeat).items():
+                samples.setdefault(metric, []).append(value)
+    return {metric: statistics.median(values) for metric, values in samples.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int,
+                        help='timed calls per case to take the best of, '
+                             '1 with --save and 5 otherwise')
+    parser.add_argument('--runs', type=int,
+                        help='runs of the suite to take the median of, '
+                             '%d with --save and 1 otherwise' % SAVE_RUNS)
+    parser.add_argument('--tolerance', type=float, default=25,
+                        help='percent a metric may get worse before failing')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--only', nargs='+', choices=sorted(CASES))
+    args = parser.parse_args()
+    repeat = args.repeat or (1 if args.save else 5)
+    runs = args.runs or (SAVE_RUNS if args.save else 1)
+    results = run(repeat, args.only, runs)
+    report = {'results': results}
+    status = 0
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=4, sort_keys=True)
+            file.write('\n')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        report['change_percent'], report['regressions'] = compare(
+            results, baseline, args.tolerance)
+        status = 1 if report['regressions'] else 0
+    print(json.dumps(report, indent=4))
+    sys.exit(status)
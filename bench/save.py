@@ -0,0 +1,98 @@
+'''
+Benchmark saving a large document.
+
+Compares writing toPlainText() in place, as the editor used to, with the
+atomic block-streaming save on the GUI thread and on a worker thread.
+Reports wall time, the longest GUI stall and the peak of Python
+allocations, which includes the full-document string of the old path.
+
+    $ python3 ./bench/save.py [--megabytes N]
+'''
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import common
+from PyQt5.QtGui import QTextDocument
+from utils.fileio import (DocumentStreamer, FileSaver,
+                          document_chunks, write_atomic)
+
+
+def legacy_save(document, path):
+    '''
+    The previous save path: one big string written in place.
+    '''
+    with open(path, 'w') as file:
+        file.write(document.toPlainText())
+
+
+def streaming_save(document, path):
+    '''
+    Atomic save streaming block batches on the calling thread.
+    '''
+    write_atomic(path, document_chunks(document, 'utf-8', 1 << 18))
+
+
+def background_save(document, path):
+    '''
+    Atomic save on a FileSaver thread fed by a DocumentStreamer,
+    return the longest event-loop stall.
+    '''
+    app = common.application()
+    streamer = DocumentStreamer(document, 'utf-8')
+    saver = FileSaver(path, streamer.chunks())
+    saver.start()
+    streamer.start()
+    stall = 0
+    while not saver.isFinished():
+        tick = time.perf_counter()
+        app.processEvents()
+        stall = max(stall, time.perf_counter() - tick)
+    saver.wait()
+    return stall
+
+
+def measure(fn, document, path):
+    '''
+    Return (seconds, longest stall, peak Python allocation) of a save.
+    Memory is traced in a second run so tracing does not skew the timing.
+    '''
+    start = time.perf_counter()
+    stall = fn(document, path)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn(document, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, seconds if stall is None else stall, peak
+
+
+def run(megabytes=200):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    common.application()
+    line = common.synthetic_python(17) + '\n'
+    document = QTextDocument()
+    document.setPlainText(line * (megabytes * 1024 * 1024 // len(line)))
+    results = {'megabytes': megabytes}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'saved.py')
+        for name, fn in [('legacy', legacy_save),
+                         ('streaming', streaming_save),
+                         ('background', background_save)]:
+            seconds, stall, peak = measure(fn, document, path)
+            results[name + '_ms'] = round(seconds * 1000, 1)
+            results[name + '_gui_stall_ms'] = round(stall * 1000, 1)
+            results[name + '_peak_python_mb'] = round(peak / 2 ** 20, 1)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--megabytes', type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.megabytes), indent=4))
@@ -0,0 +1,60 @@
+'''
+Benchmark the semantic analysis of a Python module.
+
+Reports the time to analyse the module from scratch, again with every
+top-level statement cached, and after an edit inside one statement,
+with the number of lines the edit makes the editor update.
+
+    $ python3 ./bench/semantic.py [--lines N]
+'''
+
+import argparse
+import json
+from collections import OrderedDict
+import common
+from syntax.py import KEYWORDS
+from syntax.semantic import analyse, changed_lines
+
+
+def run(lines=100000):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    text = common.synthetic_python(lines).split('\n')
+    # Distinct classes, so that no statement is found in the cache
+    text = [line.replace('class Vector', 'class Vector%d' % number)
+            for number, line in enumerate(text)]
+    cache = OrderedDict()
+    cold = common.timed(lambda: analyse(text, cache, KEYWORDS))
+    cache_size = len(cache)
+    cached = common.timed(lambda: analyse(text, cache, KEYWORDS), repeat=3)
+    spans, module = analyse(text, cache, KEYWORDS)
+
+    # A new local variable in a method in the middle of the module
+    line = len(text) // 2
+    while not text[line].startswith('        return'):
+        line += 1
+    edited = text[:line] + ['        scaled = factor'] + text[line:]
+    untouched = (line, len(text) - line)
+
+    def incremental():
+        new_spans, new_module = analyse(edited, cache, KEYWORDS)
+        return changed_lines(new_spans, new_module, len(edited),
+                             (len(text), spans, module), untouched)
+
+    edit = common.timed(incremental, repeat=3)
+    return {
+        'lines': len(text),
+        'statements_cached': cache_size,
+        'cold_ms': round(cold * 1000, 1),
+        'cached_ms': round(cached * 1000, 1),
+        'edit_ms': round(edit * 1000, 1),
+        'edit_changed_lines': len(incremental()),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--lines', type=int, default=100000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines), indent=4))
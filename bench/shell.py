@@ -0,0 +1,104 @@
+'''
+Benchmark the round trip of a terminal command.
+
+Runs the same short commands in a new bash process each, as the terminal
+used to, and in one shell session on a pseudo-terminal, measuring the
+time from sending a command to receiving its complete output.
+
+    $ python3 ./bench/shell.py [--commands N]
+'''
+
+import argparse
+import json
+import os
+import time
+import common
+from PyQt5.QtCore import QProcess
+from utils.shell import ShellSession
+
+
+def percentiles(timings):
+    '''
+    Return the p50 and p99 of timings in milliseconds
+    '''
+    timings = sorted(timings)
+    return {
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 2),
+        'p99_ms': round(timings[len(timings) * 99 // 100] * 1000, 2),
+    }
+
+
+def wait(app, condition, timeout=10):
+    '''
+    Process events until condition() is true
+    '''
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError('no output from the shell')
+        app.processEvents()
+
+
+def spawned(app, commands):
+    '''
+    Return the round trips of commands run by a new bash each
+    '''
+    timings = []
+    for i in range(commands):
+        output = []
+        done = []
+        start = time.perf_counter()
+        process = QProcess()
+        process.readyReadStandardOutput.connect(
+            lambda: output.append(bytes(process.readAllStandardOutput())))
+        process.finished.connect(lambda: done.append(True))
+        process.start('/bin/bash', ['-c', 'echo %d' % i])
+        wait(app, lambda: done)
+        timings.append(time.perf_counter() - start)
+        assert b''.join(output).strip() == str(i).encode()
+    return timings
+
+
+def session(app, commands):
+    '''
+    Return the round trips of commands run by one shell session
+    '''
+    output = bytearray()
+    shell = ShellSession()
+    shell.output.connect(output.extend)
+    # A bare shell, the startup files are not part of the round trip
+    shell.start('/', program='/bin/bash', env=dict(os.environ, PS1='$ ',
+                                                   BASH_ENV='', ENV=''))
+    shell.write(b'exec bash --norc --noprofile -i\n')
+    shell.write(b'echo ready$((1+1))\n')
+    wait(app, lambda: b'ready2' in output)
+    timings = []
+    for i in range(commands):
+        # The echoed command line holds the expression, not its value
+        marker = ('=%d=' % (i * 7)).encode()
+        del output[:]
+        start = time.perf_counter()
+        shell.write(b'echo =$((%d*7))=\n' % i)
+        wait(app, lambda: marker in output)
+        timings.append(time.perf_counter() - start)
+    shell.close()
+    return timings
+
+
+def run(commands=200):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    app = common.application()
+    return {
+        'commands': commands,
+        'spawn_per_command': percentiles(spawned(app, commands)),
+        'pty_session': percentiles(session(app, commands)),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--commands', type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.commands), indent=4))
@@ -0,0 +1,167 @@
+'''
+Benchmark the cold start of the main window.
+
+Every run is a fresh interpreter on the offscreen platform. It reports the
+import time of every module group, the construction time of every
+subsystem and the time from the start of the interpreter to the first
+paint of the editor, with the panels built on first use and, as before,
+all of them built with the window.
+
+    $ python3 ./bench/startup.py [--runs N]
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Time to the first paint of the editor that a cold start should stay under
+TARGET_MS = 400
+
+# Module groups needed to show the window, then the ones of the panels
+WINDOW_MODULES = [('editor', 'view.editor'),
+                  ('highlighter', 'syntax.py'), ('mainwindow', 'view.mainwindow')]
+PANEL_MODULES = [('file_tree', 'view.filemodel'), ('find_panel', 'view.findpanel'),
+                 ('quick_open', 'view.quickopen'), ('terminal', 'view.terminal'),
+                 ('editing', 'view.completer')]
+
+
+def import_times(modules):
+    '''
+    Import modules in order, return the milliseconds each group took
+    '''
+    import importlib
+    times = {}
+    for name, module in modules:
+        start = time.perf_counter()
+        importlib.import_module(module)
+        times[name] = round((time.perf_counter() - start) * 1000, 1)
+    return times
+
+
+def build_panels(window):
+    '''
+    Build every panel of a window, return the milliseconds each took
+    '''
+    times = {}
+    for name, build in [('file_tree', window.ensure_tree),
+                        ('find_panel', window.ensure_find_panel),
+                        ('quick_open', window.ensure_quick_open),
+                        ('terminal', window.ensure_terminal),
+                        ('editing', window.ensure_editing)]:
+        start = time.perf_counter()
+        build()
+        times[name] = round((time.perf_counter() - start) * 1000, 1)
+    return times
+
+
+def child(spawned, eager):
+    '''
+    Start the window once in this interpreter, spawned at the given wall
+    clock time, print the results as JSON
+    '''
+    started = time.time()
+    start = time.perf_counter()
+    import common
+    imports = {'qt': round((time.perf_counter() - start) * 1000, 1)}
+    imports.update(import_times(WINDOW_MODULES))
+    if eager:
+        imports.update(import_times(PANEL_MODULES))
+    from PyQt5.QtCore import QObject, QEvent
+    import view.mainwindow as mainwindow
+    from view.editor import Editor
+    from syntax.py import Highlighter
+
+    class PaintWatcher(QObject):
+        '''
+        Record the time of the first paint of a widget
+        '''
+        painted = None
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and self.painted is None:
+                self.painted = time.time()
+            return False
+
+    start = time.perf_counter()
+    app = common.application()
+    application = time.perf_counter() - start
+
+    construction = {}
+    start = time.perf_counter()
+    window = mainwindow.MainWindow()
+    construction['window'] = round((time.perf_counter() - start) * 1000, 1)
+    if eager:
+        construction.update(build_panels(window))
+    watcher = PaintWatcher()
+    window.editor.viewport().installEventFilter(watcher)
+    window.show()
+    while watcher.painted is None:
+        app.processEvents()
+    first_paint = watcher.painted - spawned
+
+    if not eager:
+        imports.update(import_times(PANEL_MODULES))
+        construction.update(build_panels(window))
+    start = time.perf_counter()
+    editor = Editor()
+    construction['editor'] = round((time.perf_counter() - start) * 1000, 1)
+    start = time.perf_counter()
+    Highlighter(editor)
+    construction['highlighter'] = round((time.perf_counter() - start) * 1000, 1)
+    window.close()
+    print(json.dumps({
+        'interpreter_ms': round((started - spawned) * 1000, 1),
+        'imports_ms': imports,
+        'application_ms': round(application * 1000, 1),
+        'construction_ms': construction,
+        'first_paint_ms': round(first_paint * 1000, 1),
+    }))
+
+
+def measure(eager, runs):
+    '''
+    Return the results of the run with the median first paint
+    '''
+    results = []
+    for _ in range(runs):
+        command = [sys.executable, os.path.abspath(__file__),
+                   '--child', repr(time.time())]
+        if eager:
+            command.append('--eager')
+        start = time.perf_counter()
+        output = subprocess.run(command, stdout=subprocess.PIPE, check=True,
+                                env=dict(os.environ, QT_QPA_PLATFORM='offscreen'))
+        result = json.loads(output.stdout.decode().splitlines()[-1])
+        result['process_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        results.append(result)
+    results.sort(key=lambda result: result['first_paint_ms'])
+    return results[len(results) // 2]
+
+
+def run(runs=5):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    lazy = measure(False, runs)
+    return {
+        'runs': runs,
+        'target_first_paint_ms': TARGET_MS,
+        'within_target': lazy['first_paint_ms'] <= TARGET_MS,
+        'eager': measure(True, runs),
+        'lazy': lazy,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', type=float, help=argparse.SUPPRESS)
+    parser.add_argument('--eager', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        child(args.child, args.eager)
+    else:
+        print(json.dumps(run(args.runs), indent=4))
@@ -0,0 +1,77 @@
+'''
+Benchmark the symbol index of a folder of Python files.
+
+Reports the time to index a generated project from scratch, to check it
+again with every file cached, to update it after one file changed, and
+to look symbols up by prefix, by substring and by exact name.
+
+    $ python3 ./bench/symbols.py [--files N] [--lines N]
+'''
+
+import argparse
+import json
+import os
+import tempfile
+import common
+from utils.symbols import SymbolIndexer, SymbolDatabase
+
+
+def index(root, database, paths=None):
+    '''
+    Run an indexer to the end, return it
+    '''
+    indexer = SymbolIndexer(root, paths, database)
+    indexer.start()
+    indexer.wait()
+    return indexer
+
+
+def run(files=2000, lines=200):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    common.application()
+    with tempfile.TemporaryDirectory() as root:
+        source = common.synthetic_python(lines)
+        for number in range(files):
+            folder = os.path.join(root, 'package%d' % (number // 100))
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, 'module%d.py' % number), 'w') as file:
+                file.write(source.replace('class Vector', 'class Vector%d' % number))
+        database = os.path.join(root, 'symbols.sqlite3')
+        cold = index(root, database)
+        warm = index(root, database)
+
+        changed = os.path.join(root, 'package0', 'module0.py')
+        with open(changed, 'a') as file:
+            file.write('\ndef added():\n    pass\n')
+        edit = index(root, database, [os.path.dirname(changed)])
+
+        connection = SymbolDatabase(database)
+        queries = {}
+        for name, method, query in (('prefix', connection.find, 'vector1'),
+                                    ('substring', connection.find, 'ector99'),
+                                    ('definition', connection.definitions, 'added')):
+            queries[name] = common.timed(lambda: method(root, query), repeat=5)
+        symbols = connection.count(root)[1]
+        connection.close()
+        return {
+            'files': cold.files,
+            'symbols': symbols,
+            'cold_s': round(cold.elapsed, 2),
+            'warm_ms': round(warm.elapsed * 1000, 1),
+            'warm_parsed': warm.parsed,
+            'folder_changed_ms': round(edit.elapsed * 1000, 1),
+            'folder_changed_parsed': edit.parsed,
+            'prefix_query_ms': round(queries['prefix'] * 1000, 2),
+            'substring_query_ms': round(queries['substring'] * 1000, 2),
+            'definition_query_ms': round(queries['definition'] * 1000, 2),
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--lines', type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.files, args.lines), indent=4))
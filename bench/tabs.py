@@ -0,0 +1,119 @@
+'''
+Benchmark many open tabs under a document memory budget.
+
+Opens synthetic Python files one tab each, waiting for every load and for
+the background highlighting, then switches back to the first tabs. Run
+with the default budget scaled down and with no budget at all.
+
+    $ python3 ./bench/tabs.py [--files N] [--lines N] [--budget MB]
+'''
+
+import argparse
+import ctypes
+import json
+import os
+import shutil
+import tempfile
+import time
+import common
+from PyQt5.QtCore import QCoreApplication, QEvent
+import view.mainwindow as mainwindow
+import view.workspace as workspace
+
+
+def resident_memory():
+    '''
+    Return the resident set size of the process in bytes, after handing
+    freed memory back to the system, or None off Linux
+    '''
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, AttributeError):
+        return None
+
+
+def settle(window):
+    '''
+    Wait for the load and the highlighting of the active tab
+    '''
+    app = common.application()
+    while window.loader is not None or not window.hightlighter.is_finished():
+        app.processEvents()
+
+
+def measure(paths, budget):
+    '''
+    Open every path in its own tab with the budget, return the results
+    '''
+    before = resident_memory()
+    window = mainwindow.MainWindow()
+    window.workspace.budget = budget
+    window.show()
+    start = time.perf_counter()
+    for path in paths:
+        window.open_tab(path)
+        settle(window)
+    opening = time.perf_counter() - start
+
+    # The first tabs are the least recently used, evicted first
+    switches = []
+    for index in range(min(10, len(paths))):
+        start = time.perf_counter()
+        window.tab_bar.setCurrentIndex(index)
+        switches.append(time.perf_counter() - start)
+        settle(window)
+    stats = window.workspace.stats()
+    after = resident_memory()
+    window.close()
+    window.deleteLater()
+    resident_memory()
+    switches.sort()
+    return {
+        'open_s': round(opening, 2),
+        'switch_p50_ms': round(switches[len(switches) // 2] * 1000, 1),
+        'switch_max_ms': round(switches[-1] * 1000, 1),
+        'resident_documents': stats['resident'],
+        'estimated_mb': round(stats['resident_bytes'] / (1 << 20), 1),
+        'rss_growth_mb': (round((after - before) / (1 << 20), 1)
+                          if before is not None else None),
+        'evictions': stats['evictions'],
+        'restores': stats['restores'],
+    }
+
+
+def run(files=120, lines=3000, budget=32):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    common.application()
+    directory = tempfile.mkdtemp()
+    workspace.SWAP_DIR = os.path.join(directory, 'swap')
+    try:
+        text = common.synthetic_python(lines)
+        paths = []
+        for i in range(files):
+            path = os.path.join(directory, 'module%d.py' % i)
+            with open(path, 'w') as file:
+                file.write(text + '\n# module %d\n' % i)
+            paths.append(path)
+        return {
+            'files': files,
+            'lines': lines,
+            'budget_mb': budget,
+            'budgeted': measure(paths, budget << 20),
+            'unbounded': measure(paths, float('inf')),
+        }
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--files', type=int, default=120)
+    parser.add_argument('--lines', type=int, default=3000)
+    parser.add_argument('--budget', type=int, default=32)
+    args = parser.parse_args()
+    print(json.dumps(run(args.files, args.lines, args.budget), indent=4))
@@ -0,0 +1,109 @@
+'''
+Benchmark the terminal panel output.
+
+Runs a command printing many lines in the terminal, as the editor used to
+(every read inserted into an unbounded QTextEdit) and with the bounded,
+frame-batched output. Reports the lines per second shown, the longest
+stalls of the event loop while the command ran and the lines kept.
+
+    $ python3 ./bench/terminal.py [--lines N] [--scrollback N]
+'''
+
+import argparse
+import json
+import time
+import common
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtWidgets import QTextEdit
+from view.terminal import Terminal
+
+LINE = 'gcc -O2 -Wall -c src/module/source_file.c -o build/module/source_file.o'
+
+
+class LegacyTerminal(Terminal):
+    '''
+    Terminal writing every read to an unbounded QTextEdit
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.output_text.hide()
+        self.output_text = QTextEdit()
+        self.output_text.setLineWrapMode(QTextEdit.NoWrap)
+        self.layout().addWidget(self.output_text)
+
+    def handle_output(self, process, decoder):
+        data = process.readAllStandardOutput()
+        data += process.readAllStandardError()
+        output = str(data, encoding='utf-8')
+        self.output_text.insertPlainText(output)
+        self.output_text.moveCursor(QTextCursor.End)
+
+    def write_output(self, text):
+        pass
+
+
+def measure(terminal, lines):
+    '''
+    Run the command in terminal, return the results
+    '''
+    app = common.application()
+    terminal.resize(800, 400)
+    terminal.show()
+    app.processEvents()
+    stalls = []
+    last = [time.perf_counter()]
+
+    def beat():
+        now = time.perf_counter()
+        stalls.append(now - last[0])
+        last[0] = now
+
+    heartbeat = QTimer()
+    heartbeat.timeout.connect(beat)
+    done = []
+    start = time.perf_counter()
+    process = terminal.handle_command("yes '%s' | head -n %d" % (LINE, lines))
+    process.finished.connect(lambda: done.append(time.perf_counter()))
+    # Starting the shell blocks the same way for both, leave it out
+    last[0] = time.perf_counter()
+    heartbeat.start(1)
+    while not done:
+        app.processEvents()
+    # Let the last frame reach the widget
+    while terminal.flush_timer.isActive():
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+    heartbeat.stop()
+    terminal.hide()
+    stalls.sort()
+    return {
+        'seconds': round(elapsed, 3),
+        'lines_per_second': int(lines / elapsed),
+        'p99_stall_ms': round(stalls[len(stalls) * 99 // 100] * 1000, 1),
+        'longest_stall_ms': round(stalls[-1] * 1000, 1),
+        'lines_kept': terminal.output_text.document().blockCount(),
+    }
+
+
+def run(lines=200000, scrollback=10000):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    common.application()
+    return {
+        'lines': lines,
+        'scrollback': scrollback,
+        # The unbounded document is still being freed after its run
+        'ring': measure(Terminal(scrollback), lines),
+        'legacy': measure(LegacyTerminal(), lines),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--scrollback', type=int, default=10000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines, args.scrollback), indent=4))
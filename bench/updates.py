@@ -0,0 +1,109 @@
+'''
+Benchmark the coalesced UI updates of the main window.
+
+Types into the editor several keys per frame, as key repeat does, then
+replaces matches one at a time as a macro would, with the updates run
+once per event loop turn and with every signal running its handlers
+immediately.
+
+    $ python3 ./bench/updates.py [--lines N] [--keys N]
+'''
+
+import argparse
+import json
+import time
+import common
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtTest import QTest
+import view.mainwindow as mainwindow
+from utils.scheduler import UpdateScheduler
+
+KEYS_PER_FRAME = 4
+
+
+class ImmediateScheduler(UpdateScheduler):
+    '''
+    Previous behaviour, every mark runs its handlers right away
+    '''
+
+    def mark(self, *names):
+        for name in names:
+            self.timings[name]['marks'] += 1
+            self.run(name, self.handlers[name])
+
+
+def measure(scheduler, text, keys, replacements):
+    '''
+    Drive a main window built with the scheduler class, return the results
+    '''
+    app = common.application()
+    mainwindow.UpdateScheduler = scheduler
+    try:
+        window = mainwindow.MainWindow()
+    finally:
+        mainwindow.UpdateScheduler = UpdateScheduler
+    editor = window.editor
+    editor.display_welcome = False
+    editor.setReadOnly(False)
+    editor.setPlainText(text)
+    editor.resize(1000, 800)
+    editor.show()
+    editor.moveCursor(QTextCursor.Start)
+    window.find_bar.setText('self')
+    window.replace_bar.setText('this')
+    app.processEvents()
+    for timing in window.updates.timings.values():
+        timing.update(marks=0, runs=0, total=0.0, max=0.0)
+
+    start = time.perf_counter()
+    for i in range(keys):
+        QTest.keyClick(editor, Qt.Key_A)
+        if i % KEYS_PER_FRAME == KEYS_PER_FRAME - 1:
+            app.processEvents()
+    app.processEvents()
+    typing = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(replacements):
+        window.rpl()
+    app.processEvents()
+    replacing = time.perf_counter() - start
+
+    stats = window.updates.stats()
+    editor.hide()
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    return {
+        'typing_ms': round(typing * 1000, 1),
+        'replace_ms': round(replacing * 1000, 1),
+        'handler_runs': sum(stat['runs'] for stat in stats.values()),
+        'handler_ms': round(sum(stat['total_ms'] for stat in stats.values()), 1),
+        'handlers': stats,
+    }
+
+
+def run(lines=20000, keys=400, replacements=300):
+    '''
+    Return the benchmark results as a dict.
+    '''
+    common.application()
+    text = common.synthetic_python(lines)
+    return {
+        'lines': lines,
+        'keys': keys,
+        'keys_per_frame': KEYS_PER_FRAME,
+        'replacements': replacements,
+        'immediate': measure(ImmediateScheduler, text, keys, replacements),
+        'coalesced': measure(UpdateScheduler, text, keys, replacements),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--lines', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=400)
+    parser.add_argument('--replacements', type=int, default=300)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines, args.keys, args.replacements), indent=4))
@@ -1,15 +1,31 @@
 '''
 Entry point of the application.
+
+    $ python3 ./src/main.py [--profile FILE]
+
+With --profile the hot paths are timed from the start and the statistics
+are written to FILE as JSON when the application quits.
 '''
 
+import argparse
 import sys
 from view.mainwindow import MainWindow
 from PyQt5.QtWidgets import QApplication
+from utils.profiler import PROFILER
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="YSCODE")
+    parser.add_argument('--profile', metavar='FILE',
+                        help='record performance and write it to FILE on exit')
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setApplicationName("YSCODE")
+    if args.profile:
+        PROFILER.set_enabled(True)
     window = MainWindow()
     window.show()
     window.showMaximized()
-    app.exec_()
+    status = app.exec_()
+    if args.profile:
+        PROFILER.dump(args.profile)
+    sys.exit(status)
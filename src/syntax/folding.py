@@ -0,0 +1,273 @@
+'''
+Code folding of Python from an incremental index of its structure
+'''
+
+from PyQt5.QtCore import QObject
+from syntax.py import tokenize, NORMAL
+
+# Indentation of blank lines, which neither start nor end a region
+BLANK = -1
+
+
+def line_structure(text, state):
+    '''
+    Return the indentation of a line, None for a comment or a line inside
+    a multi-line string, and the lexer state at its end
+    '''
+    if '"""' in text or "'''" in text:
+        end = tokenize(text, state)[1]
+    else:
+        end = state
+    if state != NORMAL:
+        return None, end
+    stripped = text.lstrip()
+    if not stripped:
+        return BLANK, end
+    if stripped.startswith('#'):
+        return None, end
+    return len(text[:len(text) - len(stripped)].expandtabs(4)), end
+
+
+class FoldIndex(QObject):
+    '''
+    Foldable regions of a Python document and the ones folded.
+
+    The indentation and the string state at the end of every line are
+    kept in lists, updated on every change from the edited lines until
+    the states agree again. A region is the block of lines indented
+    deeper than the line above it, or the rest of a multi-line string.
+    Folded regions are hidden blocks, which take no room in the layout
+    and are not highlighted until they are shown again.
+    '''
+    # Changes over this many lines are read as one text
+    BULK_LINES = 1000
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.indents = []
+        self.states = []
+        # Header line -> last line of the folded regions
+        self.folded = {}
+        self.document.contentsChange.connect(self.on_contents_change)
+        self.rebuild()
+
+    def set_document(self, document):
+        '''
+        Index another document, the folds of the previous one are opened
+        '''
+        self.unfold_all()
+        self.document.contentsChange.disconnect(self.on_contents_change)
+        self.document = document
+        self.document.contentsChange.connect(self.on_contents_change)
+        self.rebuild()
+
+    def texts(self, first, last):
+        '''
+        Return the text of the lines first to last
+        '''
+        if last - first < self.BULK_LINES:
+            block = self.document.findBlockByNumber(first)
+            result = []
+            for _ in range(last - first + 1):
+                result.append(block.text())
+                block = block.next()
+            return result
+        return self.document.toPlainText().split('\n')[first:last + 1]
+
+    def rebuild(self):
+        '''
+        Index the whole document
+        '''
+        self.folded.clear()
+        self.indents = []
+        self.states = []
+        self.index(0, self.document.blockCount() - 1, NORMAL)
+
+    def index(self, first, last, state):
+        '''
+        Index the lines first to last starting from state, appending
+        to the lists, return the state at the end
+        '''
+        for text in self.texts(first, last):
+            indent, state = line_structure(text, state)
+            self.indents.append(indent)
+            self.states.append(state)
+        return state
+
+    def on_contents_change(self, position, removed, added):
+        '''
+        Index the edited lines again, then the following ones whose start
+        state changed, and open the folds the edit touched
+        '''
+        first = self.document.findBlock(position).blockNumber()
+        last = self.document.findBlock(position + added)
+        last = (last if last.isValid() else self.document.lastBlock()).blockNumber()
+        delta = self.document.blockCount() - len(self.indents)
+        old_last = last - delta
+        self.update_folds(first, old_last, delta)
+
+        state = self.states[first - 1] if first else NORMAL
+        indents, states = self.indents, self.states
+        self.indents, self.states = [], []
+        end = self.index(first, last, state)
+        new_indents, new_states = self.indents, self.states
+        self.indents, self.states = indents, states
+        old_end = states[old_last]
+        indents[first:old_last + 1] = new_indents
+        states[first:old_last + 1] = new_states
+
+        # A string opened or closed, the following lines change until the
+        # states agree again
+        line = last + 1
+        block = self.document.findBlockByNumber(line)
+        while block.isValid() and end != old_end:
+            old_end = states[line]
+            indents[line], end = line_structure(block.text(), end)
+            states[line] = end
+            block = block.next()
+            line += 1
+
+    def update_folds(self, first, last, delta):
+        '''
+        Move the folds after an edit of the old lines first to last,
+        opening the ones containing it
+        '''
+        folded, opened = {}, []
+        for header, end in self.folded.items():
+            if end < first:
+                folded[header] = end
+            elif header > last:
+                folded[header + delta] = end + delta
+            else:
+                opened.append((header, end))
+        self.folded = folded
+        # The edit may end after the fold, or have merged its lines
+        # with those of the edit
+        last_line = self.document.blockCount() - 1
+        edited = min(last + delta, last_line)
+        for header, end in opened:
+            start = min(header + 1, first)
+            end = min(max(end + delta, edited), last_line)
+            if start <= end:
+                self.show(start, end)
+
+    def region(self, line):
+        '''
+        Return the last line of the region under a line, or None
+        '''
+        count = len(self.indents)
+        if not 0 <= line < count - 1:
+            return None
+        start = self.states[line - 1] if line else NORMAL
+        if start == NORMAL and self.states[line] != NORMAL:
+            end = line + 1
+            while end < count - 1 and self.states[end] != NORMAL:
+                end += 1
+            return end
+        if not self.is_header(line):
+            return None
+        indent = self.indents[line]
+        end = following = line + 1
+        while following < count:
+            deeper = self.indents[following]
+            if deeper is not None and deeper != BLANK and deeper <= indent:
+                break
+            if deeper != BLANK:
+                end = following
+            following += 1
+        return end
+
+    def is_header(self, line):
+        '''
+        Return whether a region starts under a line, without finding its end
+        '''
+        count = len(self.indents)
+        if not 0 <= line < count - 1:
+            return False
+        if self.states[line] != NORMAL:
+            return line == 0 or self.states[line - 1] == NORMAL
+        indent = self.indents[line]
+        if indent is None or indent == BLANK:
+            return False
+        following = line + 1
+        while following < count and self.indents[following] == BLANK:
+            following += 1
+        return (following < count and self.indents[following] is not None
+                and self.indents[following] > indent)
+
+    def is_folded(self, line):
+        '''
+        Return whether the region under a line is folded
+        '''
+        return line in self.folded
+
+    def fold(self, line):
+        '''
+        Hide the region under a line, return whether there is one
+        '''
+        end = self.region(line)
+        if end is None or line in self.folded:
+            return False
+        self.folded[line] = end
+        self.set_visible(line + 1, end, False)
+        return True
+
+    def unfold(self, line):
+        '''
+        Show the region under a line again, except the folds inside it
+        '''
+        end = self.folded.pop(line, None)
+        if end is None:
+            return False
+        self.show(line + 1, end)
+        return True
+
+    def unfold_at(self, line):
+        '''
+        Open the folds hiding a line, return whether there was one
+        '''
+        headers = [header for header, end in self.folded.items()
+                   if header < line <= end]
+        for header in sorted(headers):
+            self.unfold(header)
+        return bool(headers)
+
+    def unfold_all(self):
+        '''
+        Open every fold
+        '''
+        shown = -1
+        for header, end in sorted(self.folded.items()):
+            if end > shown:
+                self.set_visible(max(header, shown) + 1, end, True)
+                shown = end
+        self.folded.clear()
+
+    def show(self, first, last):
+        '''
+        Show the lines first to last, except those in folds within them
+        '''
+        line = first
+        for header, end in sorted(self.folded.items()):
+            if end < first or header > last:
+                continue
+            if header >= line:
+                self.set_visible(line, header, True)
+            line = max(line, end + 1)
+        if line <= last:
+            self.set_visible(line, last, True)
+
+    def set_visible(self, first, last, visible):
+        '''
+        Show or hide the lines first to last and lay them out again
+        '''
+        block = self.document.findBlockByNumber(first)
+        start = block.position()
+        for _ in range(last - first + 1):
+            if not block.isValid():
+                break
+            block.setVisible(visible)
+            stop = block.position() + block.length()
+            block = block.next()
+        self.document.markContentsDirty(start, stop - start)
@@ -0,0 +1,353 @@
+'''
+Viewport-first syntax highlighting scheduler
+'''
+
+from collections import OrderedDict
+from time import perf_counter
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtGui import QTextLayout
+from utils.profiler import PROFILER
+from utils.utils import utf16_spans
+
+
+class HighlightCache:
+    '''
+    Bounded LRU cache of block formats keyed by (block text, start state)
+    '''
+
+    def __init__(self, maxsize=20000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        '''
+        Return the cached (format ranges, end state) for key, or None
+        '''
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        '''
+        Store an entry, evicting the least recently used one when full
+        '''
+        self.entries[key] = entry
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        '''
+        Drop all entries and reset the counters
+        '''
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        '''
+        Return the hit/miss counters and the current size
+        '''
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self.entries), 'maxsize': self.maxsize}
+
+
+class BackgroundHighlighter(QObject):
+    '''
+    Highlight the visible blocks of an editor right away and the rest of
+    the document in time slices on the event loop.
+
+    Every highlighted block stores the lexer state it started from and the
+    state it ended in as its user state, -1 meaning "not highlighted yet".
+    Blocks before the frontier are known to be up to date. Hidden blocks,
+    inside folded code, only get their states; their formats are applied
+    once they are shown.
+    '''
+    SLICE = 0.008
+    SYNC_BLOCKS = 256
+    CHECK_EVERY = 32
+    # In the user state of a block whose formats are not applied
+    UNFORMATTED = 1 << 16
+
+    def __init__(self, editor, tokenize, styles, cache=None):
+        super().__init__(editor)
+        self.editor = editor
+        self.document = editor.document()
+        self.tokenize = tokenize
+        self.styles = styles
+        self.cache = cache if cache is not None else HighlightCache()
+        self.frontier = 0
+        self.highlighting = False
+        self.dirty = None
+        self.block_count = self.document.blockCount()
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.highlight_slice)
+
+        self.document.contentsChange.connect(self.on_contents_change)
+        self.editor.updateRequest.connect(self.on_update_request)
+        self.rehighlight()
+
+    def set_document(self, document):
+        '''
+        Highlight another document of the editor. Blocks keep their user
+        state, so a document highlighted before is only checked again.
+        '''
+        self.document.contentsChange.disconnect(self.on_contents_change)
+        self.document = document
+        self.document.contentsChange.connect(self.on_contents_change)
+        self.block_count = document.blockCount()
+        self.dirty = None
+        self.frontier = 0
+        self.highlight_visible()
+        self.flush()
+        self.timer.start()
+
+    @staticmethod
+    def end_state(block):
+        '''
+        Return the lexer state at the end of a block, or None
+        '''
+        state = block.userState()
+        return None if state < 0 else state & 0xFF
+
+    @staticmethod
+    def start_state(block):
+        '''
+        Return the lexer state a block was highlighted from, or None
+        '''
+        state = block.userState()
+        return None if state < 0 else (state >> 8) & 0xFF
+
+    def incoming_state(self, block):
+        '''
+        Return the lexer state at the end of the previous block
+        '''
+        previous = block.previous()
+        if not previous.isValid():
+            return 0
+        state = self.end_state(previous)
+        return 0 if state is None else state
+
+    @PROFILER.timed('highlight.block')
+    def highlightBlock(self, block, state):
+        '''
+        Apply the formats of a block highlighted from the given state,
+        return the state at the end of the block.
+        '''
+        text = block.text()
+        key = (text, state)
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = self.format_ranges(text, state)
+            self.cache.put(key, entry)
+        ranges, end = entry
+        overlay = self.overlay(block, text)
+        block.layout().setFormats(ranges + overlay if overlay else ranges)
+        block.setUserState(end | (state << 8))
+        start, stop = block.position(), block.position() + block.length()
+        if self.dirty:
+            start, stop = min(start, self.dirty[0]), max(stop, self.dirty[1])
+        self.dirty = (start, stop)
+        return end
+
+    def overlay(self, block, text):
+        '''
+        Return format ranges drawn over the lexical ones of a block, or None
+        '''
+        return None
+
+    def format_ranges(self, text, state):
+        '''
+        Tokenize text from the given state,
+        return (format ranges, state at the end of the text).
+        '''
+        spans, end = self.tokenize(text, state)
+        ranges = []
+        for start, length, style in utf16_spans(text, spans):
+            format_range = QTextLayout.FormatRange()
+            format_range.start = start
+            format_range.length = length
+            format_range.format = self.styles[style]
+            ranges.append(format_range)
+        return ranges, end
+
+    def cache_info(self):
+        '''
+        Return the hit/miss counters of the format cache
+        '''
+        return self.cache.info()
+
+    def flush(self):
+        '''
+        Relayout every block whose formats changed since the last flush
+        '''
+        if self.dirty:
+            start, stop = self.dirty
+            self.dirty = None
+            # Relayout makes the editor request an update synchronously
+            self.highlighting = True
+            self.document.markContentsDirty(start, stop - start)
+            self.highlighting = False
+
+    def refresh(self, block, state):
+        '''
+        Highlight a block unless it is already highlighted from state,
+        return the state at the end of the block.
+        '''
+        user_state = block.userState()
+        if user_state < 0 or self.start_state(block) != state:
+            if not block.isVisible():
+                return self.skip(block, state)
+            return self.highlightBlock(block, state)
+        if user_state & self.UNFORMATTED and block.isVisible():
+            return self.highlightBlock(block, state)
+        return self.end_state(block)
+
+    def skip(self, block, state):
+        '''
+        Store the states of a hidden block without applying its formats,
+        return the state at the end of the block.
+        '''
+        text = block.text()
+        entry = self.cache.get((text, state))
+        end = entry[1] if entry is not None else self.tokenize(text, state)[1]
+        block.setUserState(end | (state << 8) | self.UNFORMATTED)
+        return end
+
+    def reformat(self, block):
+        '''
+        Apply the formats of a highlighted block again, when it is next
+        shown if it is hidden
+        '''
+        state = block.userState()
+        if state < 0:
+            return
+        if block.isVisible():
+            self.highlightBlock(block, self.start_state(block))
+        else:
+            block.setUserState(state | self.UNFORMATTED)
+
+    def rehighlight(self):
+        '''
+        Forget all highlighting and start over
+        '''
+        block = self.document.begin()
+        while block.isValid():
+            block.setUserState(-1)
+            block = block.next()
+        self.frontier = 0
+        self.highlight_visible()
+        self.flush()
+        self.timer.start()
+
+    def on_contents_change(self, position, removed, added):
+        '''
+        Re-highlight the edited blocks, then let states cascade into the
+        following blocks until they agree again or the time budget is spent.
+        '''
+        first = self.document.findBlock(position)
+        last = self.document.findBlock(position + added)
+        if not last.isValid():
+            last = self.document.lastBlock()
+        delta = self.document.blockCount() - self.block_count
+        self.block_count = self.document.blockCount()
+        if self.frontier > first.blockNumber():
+            self.frontier = max(first.blockNumber(), self.frontier + delta)
+
+        # Blocks inside the range may have new text but an old user state,
+        # unless the whole document was replaced and they are all new
+        if position == 0 and added >= self.document.characterCount() - 1:
+            first.setUserState(-1)
+        else:
+            stop = last.next()
+            block = first
+            while block.isValid() and block != stop:
+                block.setUserState(-1)
+                block = block.next()
+
+        if last.blockNumber() - first.blockNumber() <= self.SYNC_BLOCKS:
+            self.cascade(first, last)
+        else:
+            self.frontier = min(self.frontier, first.blockNumber())
+        self.highlight_visible()
+        self.flush()
+        if self.frontier < self.document.blockCount():
+            self.timer.start()
+
+    def cascade(self, first, last):
+        '''
+        Highlight first..last and the following blocks whose start state
+        changed, falling back to the background pass when it takes too long.
+        '''
+        deadline = perf_counter() + self.SLICE
+        last_number = last.blockNumber()
+        block = first
+        state = self.incoming_state(block)
+        while block.isValid():
+            if block.blockNumber() > last_number:
+                if self.start_state(block) == state:
+                    return
+                if perf_counter() > deadline:
+                    self.frontier = min(self.frontier, block.blockNumber())
+                    return
+            state = self.refresh(block, state)
+            block = block.next()
+
+    def on_update_request(self, rect, dy):
+        '''
+        Highlight newly exposed blocks when the editor scrolls or resizes
+        '''
+        if self.highlighting:
+            return
+        if dy or rect.contains(self.editor.viewport().rect()):
+            self.highlight_visible()
+            self.flush()
+
+    def highlight_visible(self):
+        '''
+        Highlight the blocks in the viewport, guessing their start state from
+        the previous block when the background pass has not reached them.
+        '''
+        block = self.editor.firstVisibleBlock()
+        offset = self.editor.contentOffset()
+        height = self.editor.viewport().height()
+        state = self.incoming_state(block)
+        while block.isValid():
+            top = self.editor.blockBoundingGeometry(block).translated(offset).top()
+            if top > height:
+                break
+            state = self.refresh(block, state)
+            block = block.next()
+
+    def highlight_slice(self):
+        '''
+        Advance the frontier for one time slice
+        '''
+        deadline = perf_counter() + self.SLICE
+        block = self.document.findBlockByNumber(self.frontier)
+        state = self.incoming_state(block)
+        count = 0
+        while block.isValid():
+            state = self.refresh(block, state)
+            block = block.next()
+            count += 1
+            if count % self.CHECK_EVERY == 0 and perf_counter() > deadline:
+                break
+        self.flush()
+        if block.isValid():
+            self.frontier = block.blockNumber()
+        else:
+            self.frontier = self.document.blockCount()
+            self.timer.stop()
+
+    def is_finished(self):
+        '''
+        Return whether the whole document is highlighted
+        '''
+        return self.frontier >= self.document.blockCount()
@@ -5,9 +5,9 @@ Edited by: Yusen Zheng
 Fixed some bugs and added some features
 '''
 
-import ast
-from PyQt5.QtCore import QRegExp
-from PyQt5.QtGui import QSyntaxHighlighter
+import re
+from syntax.highlighter import BackgroundHighlighter, HighlightCache
+from syntax.semantic import SemanticHighlighter
 from utils.utils import format
 
 
@@ -24,162 +24,138 @@ STYLES = {
     'comment': format('#80838D', 'italic'),
     'self': format('#DABC81', 'italic'),
     'numbers': format('#C0956A'),
+    # Drawn over the others by the semantic pass
+    'parameter': format('#D19A66', 'italic'),
+    'attribute': format('#9DA5B4'),
+    'imported': format('#8FBCBB'),
 }
 
-class Highlighter(QSyntaxHighlighter):
+KEYWORDS = frozenset([
+    'and', 'assert', 'break', 'class', 'continue', 'def',
+    'del', 'elif', 'else', 'except', 'exec', 'finally',
+    'for', 'from', 'global', 'if', 'import', 'in',
+    'is', 'lambda', 'not', 'or', 'pass', 'print',
+    'raise', 'return', 'super', 'try', 'while', 'yield',
+    'None', 'True', 'False', 'as', 'with', 'async', 'await',
+])
+
+# Block states: outside of a multi-line string, or inside ''' / """
+NORMAL, IN_TRI_SINGLE, IN_TRI_DOUBLE = 0, 1, 2
+TRIPLE_STATES = {"'''": IN_TRI_SINGLE, '"""': IN_TRI_DOUBLE}
+TRIPLE_DELIMITERS = {IN_TRI_SINGLE: "'''", IN_TRI_DOUBLE: '"""'}
+
+# One alternation for the whole block, earlier groups win at a position
+TOKEN = re.compile(r'''
+      (?P<comment>\#.*)
+    | (?P<triple>\'\'\'|""")
+    | (?P<string>'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*")
+    | (?P<numbers>\b(?:0[xX][0-9A-Fa-f]+[lL]?
+                   |[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?[lL]?)\b)
+    | (?P<word>\w+)
+    | (?P<operator>(?:!=|[=<>+\-*/%^|&~])+)
+    | (?P<brace>[{}()\[\]])
+''', re.VERBOSE)
+CALL = re.compile(r'\s*\(')
+ASSIGN = re.compile(r'\s*=')
+
+
+def classify_word(text, word, end, after_class):
     '''
-    Syntax highlighter for the Python language.
+    Return the style of an identifier, or None for plain text.
     '''
-    keywords = [
-        'and', 'assert', 'break', 'class', 'continue', 'def',
-        'del', 'elif', 'else', 'except', 'exec', 'finally',
-        'for', 'from', 'global', 'if', 'import', 'in',
-        'is', 'lambda', 'not', 'or', 'pass', 'print',
-        'raise', 'return', 'super', 'try', 'while', 'yield',
-        'None', 'True', 'False', 'as', 'with', 'async', 'await',
-    ]
-
-    operators = [
-        '=',
-        '==', '!=', '<', '<=', '>', '>=',
-        '\+', '-', '\*', '/', '//', '\%', '\*\*',
-        '\+=', '-=', '\*=', '/=', '\%=',
-        '\^', '\|', '\&', '\~', '>>', '<<',
-    ]
-
-    braces = [
-        '\{', '\}', '\(', '\)', '\[', '\]',
-    ]
-
-    def __init__(self, document):
-        QSyntaxHighlighter.__init__(self, document)
-        tri = ("'''")
-        trid = ('"""')
-
-        self.tri_single = (QRegExp(tri), 1, STYLES['triplestring'])
-        self.tri_double = (QRegExp(trid), 2, STYLES['triplestring'])
-
-        rules = []
-
-        # Keyword, operator, and brace rules
-        rules += [(r'\b%s\b' % w, 0, STYLES['keyword'])
-                  for w in Highlighter.keywords]
-        rules += [(r'%s' % o, 0, STYLES['operator'])
-                  for o in Highlighter.operators]
-        rules += [(r'%s' % b, 0, STYLES['brace'])
-                  for b in Highlighter.braces]
-
-        # All other rules
-        rules += [
-            # Numeric literals
-            (r'\b[+-]?[0-9]+[lL]?\b', 0, STYLES['numbers']),
-            (r'\b[+-]?0[xX][0-9A-Fa-f]+[lL]?\b', 0, STYLES['numbers']),
-            (r'\b[+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?\b',
-             0, STYLES['numbers']),
-
-            # 'self'
-            (r'\bself\b', 0, STYLES['self']),
-
-            # Variable names
-            (r'\b(\w+)\b\s*(?=\=)', 1, STYLES['variable']),
-
-            # Function names
-            (r'\b(\w+)\b\s*(\()', 1, STYLES['functions']),
-
-            # Class names
-            (r'\bclass\b\s*(\w+)', 1, STYLES['classes']),
-
-            # Magic methods
-            (r'\b__(\w+)__\b', 0, STYLES['magicmethods']),
-
-            # Single line comment
-            (r'#[^\n]*', 0, STYLES['comment']),
-
-            # Single-quoted string, possibly containing escape sequences
-            (r"'(?:\\.|[^'\\])*'", 0, STYLES['string']),
-            
-            # Double-quoted string, possibly containing escape sequences
-            (r'"(?:\\.|[^"\\])*"', 0, STYLES['string']),
-        ]
-
-        # Build a QRegExp for each pattern
-        self.rules = [(QRegExp(pat), index, fmt)
-                      for (pat, index, fmt) in rules]
-
-    def highlightBlock(self, text):
-        '''
-        Apply syntax highlighting to the given block of text.
-        '''
-        # Do other syntax formatting
-        for expression, nth, format in self.rules:
-            index = expression.indexIn(text, 0)
+    if len(word) > 4 and word.startswith('__') and word.endswith('__'):
+        return 'magicmethods'
+    if after_class:
+        return 'classes'
+    if CALL.match(text, end):
+        return 'functions'
+    if ASSIGN.match(text, end):
+        return 'variable'
+    if word == 'self':
+        return 'self'
+    if word in KEYWORDS:
+        return 'keyword'
+    return None
+
+
+def tokenize(text, state=NORMAL):
+    '''
+    Scan a block once and return its non-overlapping
+    (start, length, style) spans together with the state for the next block.
+    '''
+    spans = []
+    pos = 0
+    length = len(text)
+
+    # Continue a multi-line string from the previous block
+    if state in TRIPLE_DELIMITERS:
+        end = text.find(TRIPLE_DELIMITERS[state])
+        if end < 0:
+            if length:
+                spans.append((0, length, 'triplestring'))
+            return tuple(spans), state
+        pos = end + 3
+        spans.append((0, pos, 'triplestring'))
+
+    previous_word = None
+    previous_end = 0
+    match = TOKEN.search(text, pos)
+    while match:
+        kind = match.lastgroup
+        start, end = match.span()
+        if kind == 'triple':
+            delimiter = match.group()
+            close = text.find(delimiter, end)
+            if close < 0:
+                spans.append((start, length - start, 'triplestring'))
+                return tuple(spans), TRIPLE_STATES[delimiter]
+            end = close + 3
+            spans.append((start, end - start, 'triplestring'))
+        elif kind == 'word':
+            word = match.group()
+            after_class = (previous_word == 'class'
+                           and text[previous_end:start].isspace())
+            style = classify_word(text, word, end, after_class)
+            if style:
+                spans.append((start, end - start, style))
+            previous_word = word
+            previous_end = end
+        else:
+            spans.append((start, end - start, kind))
+        match = TOKEN.search(text, end)
 
-            while index >= 0:
-                # We actually want the index of the nth match
-                index = expression.pos(nth)
-                length = len(expression.cap(nth))
-                self.setFormat(index, length, format)
-                index = expression.indexIn(text, index + length)
+    return tuple(spans), NORMAL
 
-        self.setCurrentBlockState(0)
 
-        # Do multi-line strings
-        in_multiline = self.match_multiline(text, *self.tri_single)
-        if not in_multiline:
-            in_multiline = self.match_multiline(text, *self.tri_double)
+# Shared by every Python highlighter
+CACHE = HighlightCache()
 
-    def in_quotes(self, text, position, delimiter):
-        '''
-        Check if the position is inside quotes
-        '''
-        in_quotes = False
-        quote_delimiters = ['"', "'"]
-        for quote in quote_delimiters:
-            quote_start = text.find(quote, 0, position)
-            quote_end = text.find(quote, position + delimiter.matchedLength())
-            if quote_start >= 0 and quote_end >= 0 and quote_start < position < quote_end:
-                in_quotes = True
-                break
-        return in_quotes
-
-    def match_multiline(self, text, delimiter, in_state, style):
+
+class Highlighter(BackgroundHighlighter):
+    '''
+    Syntax highlighter for the Python language, lexical as the text is
+    typed and semantic once typing pauses.
+    '''
+    semantic = None
+
+    def __init__(self, editor, semantic=True):
+        super().__init__(editor, tokenize, STYLES, CACHE)
+        if semantic:
+            self.enable_semantic()
+
+    def enable_semantic(self):
         '''
-        Do highlighting of multi-line strings.
+        Add the semantic highlighting, from the current document on
         '''
-        # If inside triple-single quotes, start at 0
-        if self.previousBlockState() == in_state:
-            start = 0
-            add = 0
-        # Otherwise, look for the delimiter on this line
-        else:
-            start = delimiter.indexIn(text)
-            # Move past this match
-            add = delimiter.matchedLength()
-
-        # As long as there's a delimiter match on this line...
-        while start >= 0:
-            # Check if the delimiter is inside quotes
-            if self.in_quotes(text, start, delimiter):
-                # Move past this match and continue searching
-                start = delimiter.indexIn(text, start + add)
-                continue
-            # Look for the ending delimiter
-            end = delimiter.indexIn(text, start + add)
-            # Ending delimiter on this line?
-            if end >= add:
-                length = end - start + add + delimiter.matchedLength()
-                self.setCurrentBlockState(0)
-            # No; multi-line string
-            else:
-                self.setCurrentBlockState(in_state)
-                length = len(text) - start + add
-            # Apply formatting
-            self.setFormat(start, length, style)
-            # Look for the next match
-            start = delimiter.indexIn(text, start + length)
-
-        # Return True if still inside a multi-line string, False otherwise
-        if self.currentBlockState() == in_state:
-            return True
-        else:
-            return False
+        if self.semantic is None:
+            self.semantic = SemanticHighlighter(self, STYLES, KEYWORDS)
+
+    def set_document(self, document):
+        super().set_document(document)
+        if self.semantic is not None:
+            self.semantic.set_document(document)
+
+    def overlay(self, block, text):
+        if self.semantic is None:
+            return None
+        return self.semantic.ranges(block, text)
@@ -0,0 +1,675 @@
+'''
+Semantic highlighting of Python code from its syntax tree, on a worker
+thread once typing pauses
+'''
+
+import ast
+import builtins
+import re
+from collections import OrderedDict
+from time import perf_counter
+from PyQt5.QtCore import QObject, QThread, QTimer, QCoreApplication
+from PyQt5.QtGui import QTextBlockUserData, QTextLayout
+from utils.profiler import PROFILER
+from utils.utils import utf16_spans
+
+# Top-level lines that continue the statement before them
+CONTINUATION = re.compile(r'(?:else|elif|except|finally)\b|[)\]}]')
+# Name of a function or class after its keywords
+DEFINITION = re.compile(r'(?:async\s+)?(?:def|class)\s+(\w+)')
+# The keyword of a from import
+IMPORT = re.compile(r'\bimport\b')
+# Following statements tried together when one alone does not parse,
+# as when a string spans top-level lines
+MAX_MERGE = 8
+# Broken lines replaced by pass before giving up on a statement
+MAX_REPAIRS = 8
+
+BUILTIN_STYLES = {name: 'classes' if isinstance(value, type) else 'functions'
+                  for name, value in vars(builtins).items()
+                  if callable(value) and not name.startswith('_')}
+
+# Result of a statement that does not parse, even repaired
+FAILED = object()
+# Result of a statement, not repaired, that ends inside a string or brackets
+UNCLOSED = object()
+
+
+def char_column(line, offset):
+    '''
+    Convert a UTF-8 byte offset of the syntax tree to a code point index
+    '''
+    if line.isascii():
+        return offset
+    return len(line.encode('utf-8')[:offset].decode('utf-8', 'ignore'))
+
+
+def statement_ranges(lines):
+    '''
+    Return the (first line, stop line) of every top-level statement
+    '''
+    ranges = []
+    first = 0
+    decorated = False
+    for number, line in enumerate(lines):
+        if not line or line[0] in ' \t#':
+            continue
+        if number > first and not decorated and not CONTINUATION.match(line):
+            ranges.append((first, number))
+            first = number
+        decorated = line.startswith('@')
+    if first < len(lines):
+        ranges.append((first, len(lines)))
+    return ranges
+
+
+def bindings(nodes):
+    '''
+    Return the style of every name bound by statements, without looking
+    into the functions, classes and comprehensions they define
+    '''
+    names = {}
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            names[node.name] = 'functions'
+        elif isinstance(node, ast.ClassDef):
+            names[node.name] = 'classes'
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name != '*':
+                    names[alias.asname or alias.name.split('.')[0]] = 'imported'
+        elif isinstance(node, (ast.Lambda, ast.ListComp, ast.SetComp,
+                               ast.DictComp, ast.GeneratorExp)):
+            continue
+        else:
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                names.setdefault(node.id, 'variable')
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                names.setdefault(node.name, 'variable')
+            stack.extend(ast.iter_child_nodes(node))
+    return names
+
+
+class StatementAnalyser(ast.NodeVisitor):
+    '''
+    Collect the semantic spans of one top-level statement.
+
+    Names bound in its functions and classes are resolved here, the
+    others are kept as references to the module, resolved once every
+    statement is known.
+    '''
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.spans = []
+        self.references = []
+        self.scopes = []
+        self.calls = set()
+
+    def add(self, line, column, name, style):
+        '''
+        Add a span when name really is at line and column
+        '''
+        if self.lines[line][column:column + len(name)] == name:
+            self.spans.append((line, column, len(name), style))
+
+    def add_node(self, node, name, style):
+        '''
+        Add a span for a node starting with name
+        '''
+        line = node.lineno - 1
+        self.add(line, char_column(self.lines[line], node.col_offset), name, style)
+
+    def resolve(self, name):
+        '''
+        Return the style of a name bound in the enclosing scopes, class
+        bodies only counting for their own statements, or None
+        '''
+        for depth, (kind, names) in enumerate(reversed(self.scopes)):
+            if kind == 'class' and depth:
+                continue
+            if name in names:
+                return names[name]
+        return None
+
+    def visit_Name(self, node):
+        if node.id == 'self':
+            return
+        if isinstance(node.ctx, ast.Store):
+            self.add_node(node, node.id, 'variable')
+            return
+        if not isinstance(node.ctx, ast.Load):
+            return
+        style = self.resolve(node.id)
+        if style is None:
+            line = node.lineno - 1
+            self.references.append(
+                (line, char_column(self.lines[line], node.col_offset), node.id))
+        elif style != 'variable':
+            self.add_node(node, node.id, style)
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Attribute):
+            self.calls.add(node.func)
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        self.visit(node.value)
+        end_line = getattr(node, 'end_lineno', None)
+        if end_line is None:
+            return
+        line = end_line - 1
+        end = char_column(self.lines[line], node.end_col_offset)
+        style = 'functions' if node in self.calls else 'attribute'
+        self.add(line, end - len(node.attr), node.attr, style)
+
+    def visit_JoinedStr(self, node):
+        # Positions inside f-strings are unreliable before Python 3.12
+        pass
+
+    def visit_FunctionDef(self, node):
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self.add_definition(node, 'functions')
+        self.visit_defaults(node.args)
+        if node.returns is not None:
+            self.visit(node.returns)
+        names = bindings(node.body)
+        names.update(self.parameters(node.args))
+        self.scopes.append(('function', names))
+        for statement in node.body:
+            self.visit(statement)
+        self.scopes.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        self.visit_defaults(node.args)
+        self.scopes.append(('function', self.parameters(node.args)))
+        self.visit(node.body)
+        self.scopes.pop()
+
+    def visit_ClassDef(self, node):
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self.add_definition(node, 'classes')
+        for base in node.bases + node.keywords:
+            self.visit(base)
+        self.scopes.append(('class', bindings(node.body)))
+        for statement in node.body:
+            self.visit(statement)
+        self.scopes.pop()
+
+    def visit_comprehension_scope(self, node):
+        names = {}
+        for generator in node.generators:
+            for target in ast.walk(generator.target):
+                if isinstance(target, ast.Name):
+                    names[target.id] = 'variable'
+        self.scopes.append(('function', names))
+        self.generic_visit(node)
+        self.scopes.pop()
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = \
+        visit_comprehension_scope
+
+    def visit_Import(self, node):
+        '''
+        Mark the names bound by an import, searched in its text since
+        aliases have no position before Python 3.10
+        '''
+        line = node.lineno - 1
+        column = char_column(self.lines[line], node.col_offset)
+        if isinstance(node, ast.ImportFrom):
+            match = IMPORT.search(self.lines[line], column)
+            while match is None and line + 1 < len(self.lines):
+                line, column = line + 1, 0
+                match = IMPORT.search(self.lines[line])
+            if match is None:
+                return
+            column = match.end()
+        for alias in node.names:
+            if alias.name == '*':
+                continue
+            for name in [alias.name.split('.')[0]] + ([alias.asname] if alias.asname else []):
+                found = self.find(name, line, column)
+                if found is None:
+                    return
+                line, column = found
+                column += len(name)
+            self.add(line, column - len(name), name, 'imported')
+
+    visit_ImportFrom = visit_Import
+
+    def find(self, name, line, column):
+        '''
+        Return the line and column of the next occurrence of a word
+        '''
+        word = re.compile(r'\b%s\b' % re.escape(name))
+        while line < len(self.lines):
+            match = word.search(self.lines[line], column)
+            if match:
+                return line, match.start()
+            line, column = line + 1, 0
+        return None
+
+    def add_definition(self, node, style):
+        '''
+        Mark the name of a function or class definition
+        '''
+        line = node.lineno - 1
+        text = self.lines[line]
+        match = DEFINITION.match(text, char_column(text, node.col_offset))
+        if match and match.group(1) == node.name:
+            self.add(line, match.start(1), node.name, style)
+
+    def visit_defaults(self, arguments):
+        '''
+        Visit the defaults and annotations, evaluated outside the function
+        '''
+        for default in arguments.defaults + arguments.kw_defaults:
+            if default is not None:
+                self.visit(default)
+        for argument in self.arguments(arguments):
+            if argument.annotation is not None:
+                self.visit(argument.annotation)
+
+    @staticmethod
+    def arguments(arguments):
+        '''
+        Return every parameter of a signature
+        '''
+        result = list(getattr(arguments, 'posonlyargs', [])) + arguments.args
+        if arguments.vararg:
+            result.append(arguments.vararg)
+        result += arguments.kwonlyargs
+        if arguments.kwarg:
+            result.append(arguments.kwarg)
+        return result
+
+    def parameters(self, arguments):
+        '''
+        Mark the parameters of a signature, return them as bound names
+        '''
+        names = {}
+        for argument in self.arguments(arguments):
+            if argument.arg != 'self':
+                self.add_node(argument, argument.arg, 'parameter')
+                names[argument.arg] = 'parameter'
+        return names
+
+
+def unclosed(error):
+    '''
+    Return whether a syntax error may come from a string or brackets that
+    the following statements close
+    '''
+    message = error.msg or ''
+    return 'EOF' in message or 'unterminated' in message or 'never closed' in message
+
+
+def analyse_statement(source, keep=frozenset(), repair=True):
+    '''
+    Return the spans of the lines of a top-level statement, the names it
+    binds and its references to the module, lines counted from the
+    statement, or FAILED. Without repair, a statement that does not parse
+    is UNCLOSED or FAILED. Words in keep and magic names keep their
+    lexical style.
+    '''
+    lines = source.split('\n')
+    for _ in range(MAX_REPAIRS):
+        try:
+            tree = ast.parse('\n'.join(lines))
+            break
+        except SyntaxError as e:
+            if not repair:
+                return UNCLOSED if unclosed(e) else FAILED
+            line = (e.lineno or len(lines)) - 1
+            if not 0 <= line < len(lines) or lines[line].strip() == 'pass':
+                return FAILED
+            # Keep the indentation so that the block still parses
+            lines[line] = lines[line][:len(lines[line]) - len(lines[line].lstrip())] + 'pass'
+        except ValueError:
+            # Null characters
+            return FAILED
+    else:
+        return FAILED
+    lines = source.split('\n')
+    analyser = StatementAnalyser(lines)
+    for statement in tree.body:
+        analyser.visit(statement)
+    spans = {}
+    for line, column, length, style in analyser.spans:
+        word = lines[line][column:column + length]
+        if word not in keep and not (word.startswith('__') and word.endswith('__')):
+            spans.setdefault(line, []).append((column, length, style))
+    references = {}
+    for line, column, name in analyser.references:
+        if name not in keep:
+            references.setdefault(line, []).append((column, name))
+    return (tuple((line, tuple(sorted(found))) for line, found in spans.items()),
+            bindings(tree.body),
+            tuple((line, tuple(found)) for line, found in references.items()))
+
+
+def analyse(lines, cache, keep=frozenset(), cancelled=lambda: False):
+    '''
+    Return the (column, length, style) spans of every line of a module as
+    a dict and the names bound by the module, or None when cancelled.
+    Statements found in cache are not parsed again.
+
+    A statement left inside a string or brackets is parsed with the
+    following ones until they close, and only repaired when they do not.
+    '''
+    def cached(first, stop, repair=False):
+        source = '\n'.join(lines[first:stop])
+        key = (source, repair)
+        result = cache.get(key)
+        if result is None:
+            result = analyse_statement(source, keep, repair)
+            cache[key] = result
+            if len(cache) > SemanticHighlighter.CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return result
+
+    statements = []
+    ranges = statement_ranges(lines)
+    index = 0
+    while index < len(ranges):
+        if cancelled():
+            return None
+        first, stop = ranges[index]
+        result = cached(first, stop)
+        end = index
+        while result is UNCLOSED and end + 1 < len(ranges) and end - index < MAX_MERGE:
+            end += 1
+            result = cached(first, ranges[end][1])
+        if result is UNCLOSED:
+            # Never closed, the broken lines of the statement alone go
+            end = index
+        if result is UNCLOSED or result is FAILED:
+            result = cached(first, ranges[end][1], repair=True)
+            if result is FAILED and end > index:
+                end = index
+                result = cached(first, stop, repair=True)
+        if result is FAILED:
+            end = index
+        else:
+            statements.append((first, result))
+        index = end + 1
+
+    module = {}
+    for _, (_, names, _) in statements:
+        module.update(names)
+    spans = {}
+    for first, (found, _, references) in statements:
+        for line, line_spans in found:
+            spans[first + line] = line_spans
+        for line, words in references:
+            extra = []
+            for column, name in words:
+                style = module.get(name) or BUILTIN_STYLES.get(name)
+                if style is not None and style != 'variable':
+                    extra.append((column, len(name), style))
+            if extra:
+                spans[first + line] = tuple(sorted(spans.get(first + line, ()) + tuple(extra)))
+    return spans, module
+
+
+def changed_lines(spans, module, count, previous, edited):
+    '''
+    Return the spans of the lines to update as a dict, empty for lines to
+    clear.
+
+    previous is the (line count, spans, module names) last applied to the
+    document, or None to update every line, and edited the number of
+    lines at its start and at its end left untouched by the edits since.
+    '''
+    if previous is None:
+        return {line: spans.get(line, ()) for line in range(count)}
+    old_count, old, old_module = previous
+    first = min(edited[0], count)
+    tail = min(edited[1], count - first, old_count - first)
+    changes = {line: spans.get(line, ()) for line in range(first, count - tail)}
+    if module == old_module:
+        # The untouched statements resolve their names as before
+        return changes
+    shift = count - old_count
+    untouched = set(line for line in spans if line < first or line >= count - tail)
+    untouched.update(line if line < first else line + shift for line in old
+                     if line < first or line >= old_count - tail)
+    for line in untouched:
+        before = old.get(line if line < first else line - shift, ())
+        if spans.get(line, ()) != before:
+            changes[line] = spans.get(line, ())
+    return changes
+
+
+class SemanticData(QTextBlockUserData):
+    '''
+    Semantic format ranges of a block, valid while it has the same text
+    '''
+
+    def __init__(self, text, spans, ranges):
+        super().__init__()
+        self.text = text
+        self.spans = spans
+        self.ranges = ranges
+
+
+class SemanticWorker(QThread):
+    '''
+    Analyse a snapshot of a document and diff it against the spans shown
+    '''
+
+    def __init__(self, document, previous, edited, cache, keep, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.keep = keep
+        self.revision = document.revision()
+        self.text = document.toPlainText()
+        self.previous = previous
+        self.edited = edited
+        self.cache = cache
+        self.result = None
+        self.elapsed = 0.0
+
+    def run(self):
+        start = perf_counter()
+        lines = self.text.split('\n')
+        analysis = analyse(lines, self.cache, self.keep, self.isInterruptionRequested)
+        if analysis is not None:
+            spans, module = analysis
+            self.result = ((len(lines), spans, module), changed_lines(
+                spans, module, len(lines), self.previous, self.edited))
+        self.elapsed = perf_counter() - start
+
+
+class SemanticHighlighter(QObject):
+    '''
+    Draw the semantic styles of a Python document over the lexical ones,
+    except on the words in keep.
+
+    Once typing pauses, a worker parses the document statement by
+    statement, top-level statements that did not change coming from the
+    cache, and resolves definitions, parameters, imports and attributes.
+    The spans of the lines whose result changed are stored in their
+    blocks, from the viewport on and in time slices, and merged into
+    their formats by the lexical highlighter.
+    '''
+    PAUSE = 400
+    SLICE = 0.008
+    CACHE_SIZE = 8192
+
+    def __init__(self, highlighter, styles, keep=frozenset()):
+        super().__init__(highlighter)
+        self.highlighter = highlighter
+        self.styles = styles
+        self.keep = keep
+        self.document = highlighter.document
+        self.cache = OrderedDict()
+        self.worker = None
+        self.pending = False
+        self.previous = None
+        self.edited = (float('inf'), float('inf'))
+        # Changes being applied, with the revision and result they are for
+        self.changes = None
+        self.revision = None
+        self.applying = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.PAUSE)
+        self.timer.timeout.connect(self.start)
+        self.slicer = QTimer(self)
+        self.slicer.setInterval(0)
+        self.slicer.timeout.connect(self.apply_slice)
+        self.document.contentsChange.connect(self.on_contents_change)
+        self.timer.start()
+
+    def set_document(self, document):
+        '''
+        Follow the editor to another document, analysed again from scratch
+        '''
+        self.document.contentsChange.disconnect(self.on_contents_change)
+        self.document = document
+        self.document.contentsChange.connect(self.on_contents_change)
+        self.stop_applying()
+        self.previous = None
+        self.edited = (float('inf'), float('inf'))
+        self.timer.start()
+
+    def on_contents_change(self, position, removed, added):
+        '''
+        Remember which lines were edited and wait for the next pause
+        '''
+        first = self.document.findBlock(position)
+        last = self.document.findBlock(position + added)
+        if not last.isValid():
+            last = self.document.lastBlock()
+        tail = self.document.blockCount() - 1 - last.blockNumber()
+        self.edited = (min(self.edited[0], first.blockNumber()),
+                       min(self.edited[1], tail))
+        if self.changes is not None:
+            # Half applied, only a full update is sure to be right
+            self.stop_applying()
+            self.previous = None
+        self.timer.start()
+
+    def start(self):
+        '''
+        Analyse the document on a worker, after the running one if any
+        '''
+        if self.worker is not None:
+            self.pending = True
+            return
+        if getattr(self.highlighter.editor, 'buffer', None) is not None:
+            # Only a window of a large file is in the document
+            return
+        # Owned by the application, so that it outlives a closed editor
+        self.worker = SemanticWorker(self.document, self.previous, self.edited,
+                                     self.cache, self.keep, QCoreApplication.instance())
+        self.worker.finished.connect(self.on_finished)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.worker.start()
+
+    def cancel(self):
+        '''
+        Stop the running worker and drop its result
+        '''
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            self.worker.wait()
+            self.worker = None
+        self.timer.stop()
+        self.stop_applying()
+
+    def on_finished(self):
+        '''
+        Apply the result of the worker if the document is still the same
+        '''
+        worker = self.sender()
+        if worker is not self.worker:
+            return
+        self.worker = None
+        if PROFILER.enabled:
+            PROFILER.add_time('semantic.analyse', worker.elapsed)
+        if (worker.result is not None and worker.document is self.document
+                and worker.revision == self.document.revision()):
+            self.applying, changes = worker.result
+            self.revision = worker.revision
+            # The viewport first, then the rest of the document in order
+            top = self.highlighter.editor.firstVisibleBlock().blockNumber()
+            self.changes = iter(sorted(changes.items(),
+                                       key=lambda item: (item[0] < top, item[0])))
+            self.apply_slice()
+        if self.pending:
+            self.pending = False
+            self.start()
+
+    @PROFILER.timed('semantic.apply')
+    def apply_slice(self):
+        '''
+        Store the spans of the changed lines in their blocks for one time
+        slice, then take the result as applied once they are all done
+        '''
+        deadline = perf_counter() + self.SLICE
+        block = self.document.begin()
+        count = 0
+        for line, spans in self.changes:
+            if block.blockNumber() + 1 == line:
+                block = block.next()
+            else:
+                block = self.document.findBlockByNumber(line)
+            self.update_block(block, spans)
+            count += 1
+            if count % 32 == 0 and perf_counter() > deadline:
+                self.highlighter.flush()
+                self.slicer.start()
+                return
+        self.highlighter.flush()
+        self.previous = self.applying
+        self.edited = (float('inf'), float('inf'))
+        self.stop_applying()
+
+    def stop_applying(self):
+        '''
+        Drop the changes left to apply
+        '''
+        self.slicer.stop()
+        self.changes = None
+        self.applying = None
+
+    def update_block(self, block, spans):
+        '''
+        Replace the spans of a block, highlighting it again if they changed
+        '''
+        data = block.userData()
+        text = block.text()
+        if isinstance(data, SemanticData):
+            if data.text == text and data.spans == spans:
+                return
+        elif not spans:
+            return
+        ranges = []
+        for start, length, style in utf16_spans(text, spans):
+            format_range = QTextLayout.FormatRange()
+            format_range.start = start
+            format_range.length = length
+            format_range.format = self.styles[style]
+            ranges.append(format_range)
+        block.setUserData(SemanticData(text, spans, ranges) if spans else None)
+        self.highlighter.reformat(block)
+
+    @staticmethod
+    def ranges(block, text):
+        '''
+        Return the semantic format ranges of a block, or None
+        '''
+        data = block.userData()
+        if isinstance(data, SemanticData) and data.text == text:
+            return data.ranges
+        return None
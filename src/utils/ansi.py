@@ -0,0 +1,524 @@
+'''
+Streaming renderer of ANSI/VT escape sequences into styled text runs
+'''
+
+import re
+from collections import deque, namedtuple
+
+# Colours are palette indexes (0-255) or (red, green, blue) tuples
+Style = namedtuple('Style', 'foreground background bold italic underline inverse')
+DEFAULT = Style(None, None, False, False, False, False)
+
+# Control sequences and control characters but line feeds and the
+# sequences that only set the style of the text
+TOKEN = re.compile(r'\x1b(?!\[[0-9;:]*m)(?:\[([0-?]*)[ -/]*([@-~])'
+                   r'|\][^\x07\x1b]*(?:\x07|\x1b\\)'
+                   r'|[ -/]*[0-~])'
+                   r'|[\x00-\x09\x0b-\x1a\x1c-\x1f\x7f]')
+RENDITION = re.compile(r'\x1b\[([0-9;:]*)m')
+# A sequence cut at the end of a chunk
+INCOMPLETE = re.compile(r'\x1b(?:\[[0-?]*[ -/]*|[ -/]*)?\Z')
+TAB = 8
+# Bound of the cache of SGR results
+RENDITIONS = 4096
+
+
+def select_graphic_rendition(style, parameters):
+    '''
+    Return style after an SGR sequence with the given parameters
+    '''
+    if parameters[:1] in ('?', '>', '<', '='):
+        return style
+    codes = [int(code) if code.isdigit() else 0
+             for code in parameters.replace(':', ';').split(';')]
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code == 0:
+            style = DEFAULT
+        elif code == 1:
+            style = style._replace(bold=True)
+        elif code == 3:
+            style = style._replace(italic=True)
+        elif code == 4:
+            style = style._replace(underline=True)
+        elif code == 7:
+            style = style._replace(inverse=True)
+        elif code == 22:
+            style = style._replace(bold=False)
+        elif code == 23:
+            style = style._replace(italic=False)
+        elif code == 24:
+            style = style._replace(underline=False)
+        elif code == 27:
+            style = style._replace(inverse=False)
+        elif 30 <= code <= 37:
+            style = style._replace(foreground=code - 30)
+        elif 40 <= code <= 47:
+            style = style._replace(background=code - 40)
+        elif 90 <= code <= 97:
+            style = style._replace(foreground=code - 82)
+        elif 100 <= code <= 107:
+            style = style._replace(background=code - 92)
+        elif code == 39:
+            style = style._replace(foreground=None)
+        elif code == 49:
+            style = style._replace(background=None)
+        elif code in (38, 48) and i + 1 < len(codes):
+            if codes[i + 1] == 5 and i + 2 < len(codes):
+                colour = codes[i + 2] & 255
+                i += 2
+            elif codes[i + 1] == 2 and i + 4 < len(codes):
+                colour = tuple(value & 255 for value in codes[i + 2:i + 5])
+                i += 4
+            else:
+                break
+            if code == 38:
+                style = style._replace(foreground=colour)
+            else:
+                style = style._replace(background=colour)
+        i += 1
+    return style
+
+
+def merge(runs):
+    '''
+    Return runs with the neighbours of the same style joined
+    '''
+    merged = []
+    texts = []
+    current = None
+    for text, style in runs:
+        if style is not current and style != current:
+            if texts:
+                merged.append([''.join(texts), current])
+            texts = []
+            current = style
+        texts.append(text)
+    if texts:
+        merged.append([''.join(texts), current])
+    return merged
+
+
+class Line:
+    '''
+    A line of the screen as [text, style] runs
+    '''
+    __slots__ = ('runs', 'length')
+
+    def __init__(self, runs=None, length=0):
+        self.runs = runs if runs is not None else []
+        self.length = length
+
+    def slice(self, start, end):
+        '''
+        Return the runs between two columns
+        '''
+        runs = []
+        position = 0
+        for text, style in self.runs:
+            left = max(start - position, 0)
+            right = min(end - position, len(text))
+            if left < right:
+                runs.append([text[left:right], style])
+            position += len(text)
+            if position >= end:
+                break
+        return runs
+
+    def write(self, column, text, style):
+        '''
+        Write text from column on, over what is there
+        '''
+        if not text:
+            return
+        if column > self.length:
+            self.write(self.length, ' ' * (column - self.length), DEFAULT)
+        if column == self.length:
+            if self.runs and self.runs[-1][1] == style:
+                self.runs[-1][0] += text
+            else:
+                self.runs.append([text, style])
+            self.length += len(text)
+            return
+        end = column + len(text)
+        if column == 0 and end >= self.length:
+            self.runs = [[text, style]]
+            self.length = end
+            return
+        runs = self.slice(0, column) + [[text, style]] + self.slice(end, self.length)
+        self.runs = runs
+        self.length = max(self.length, end)
+
+    def erase(self, start, end):
+        '''
+        Blank the columns from start to end, the end of the line for None
+        '''
+        if end is None or end >= self.length:
+            self.runs = self.slice(0, start)
+            self.length = min(start, self.length)
+        elif start < end:
+            self.write(start, ' ' * (end - start), DEFAULT)
+
+
+class Screen:
+    '''
+    Terminal output as the last rows lines, where the cursor can move and
+    overwrite, and the lines that scrolled out of them. Those are kept as
+    runs whose text holds the line feeds, at most scrollback lines until
+    taken. feed() accepts any split of the output: an escape sequence cut
+    at the end of a chunk is completed by the next one.
+    '''
+
+    def __init__(self, rows=24, scrollback=10000):
+        self.rows = rows
+        self.scrollback = scrollback
+        self.style = DEFAULT
+        self.partial = ''
+        self.lines = deque([Line()])
+        self.row = 0
+        self.column = 0
+        self.saved = (0, 0)
+        self.scrolled = deque()
+        self.scrolled_lines = 0
+        self.dropped = 0
+        self.cleared = False
+        self.changed = False
+        self.renditions = {}
+
+    def feed(self, text):
+        '''
+        Interpret a chunk of output
+        '''
+        text = self.partial + text
+        self.partial = ''
+        escape = text.rfind('\x1b')
+        if escape >= 0:
+            if INCOMPLETE.match(text, escape):
+                self.partial = text[escape:]
+                text = text[:escape]
+            else:
+                # An operating system command can hold anything but BEL
+                osc = text.rfind('\x1b]')
+                if osc >= 0 and '\x07' not in text[osc:] and '\x1b\\' not in text[osc:]:
+                    self.partial = text[osc:]
+                    text = text[:osc]
+        if not text:
+            return
+        self.changed = True
+        if '\r' in text:
+            # A line feed returns the carriage anyway
+            text = text.replace('\r\n', '\n')
+        if text.replace('\n', ' ').isprintable():
+            # Plain output, much faster to check than to scan for tokens
+            self.styled(text)
+            return
+        position = 0
+        for match in TOKEN.finditer(text):
+            start = match.start()
+            if start > position:
+                self.styled(text[position:start])
+            position = match.end()
+            token = match.group()
+            final = match.group(2)
+            if token[0] != '\x1b':
+                self.control(token)
+            elif final is not None:
+                self.sequence(match.group(1), final)
+            elif token in ('\x1b7', '\x1b8'):
+                if token == '\x1b7':
+                    self.saved = (self.row, self.column)
+                else:
+                    self.move(*self.saved)
+            elif token == '\x1bc':
+                self.clear()
+        if position < len(text):
+            self.styled(text[position:])
+
+    def styled(self, text):
+        '''
+        Write text holding only line feeds and SGR sequences at the cursor
+        '''
+        pieces = RENDITION.split(text)
+        style = self.style
+        runs = [[pieces[0], style]] if pieces[0] else []
+        renditions = self.renditions
+        for i in range(1, len(pieces), 2):
+            key = (style, pieces[i])
+            style = renditions.get(key)
+            if style is None:
+                if len(renditions) > RENDITIONS:
+                    renditions.clear()
+                style = renditions[key] = select_graphic_rendition(*key)
+            if pieces[i + 1]:
+                runs.append([pieces[i + 1], style])
+        self.style = style
+        newlines = text.count('\n')
+        if newlines and not self.at_end():
+            # Finish the line being overwritten, the next ones may append
+            for i, (piece, style) in enumerate(runs):
+                cut = piece.find('\n') + 1
+                if not cut:
+                    self.text(piece, style)
+                    continue
+                self.text(piece[:cut], style)
+                runs = ([[piece[cut:], style]] if cut < len(piece) else []) + runs[i + 1:]
+                newlines -= 1
+                break
+        if self.at_end() and (newlines == 0 or newlines >= self.rows):
+            self.append(runs, newlines)
+        else:
+            for piece, style in runs:
+                self.text(piece, style)
+
+    def at_end(self):
+        '''
+        Return whether the cursor is at the end of the last line
+        '''
+        return (self.row == len(self.lines) - 1
+                and self.column == self.lines[self.row].length)
+
+    def append(self, runs, newlines):
+        '''
+        Add runs holding newlines line feeds after the end of the last line
+        '''
+        line = self.lines[-1]
+        if not newlines:
+            for run in runs:
+                if line.runs and line.runs[-1][1] == run[1]:
+                    line.runs[-1] = [line.runs[-1][0] + run[0], run[1]]
+                else:
+                    line.runs.append(run)
+                line.length += len(run[0])
+            self.column = line.length
+            return
+        flat = []
+        for i, line in enumerate(self.lines):
+            if i:
+                flat.append(['\n', DEFAULT])
+            flat.extend(line.runs)
+        flat.extend(runs)
+        # The rows last lines stay on the screen, cut at the line feed
+        # that ends the line before them
+        total = len(self.lines) + newlines
+        keep = min(self.rows, total)
+        rest = flat
+        seen = 0
+        for i in range(len(flat) - 1, -1, -1):
+            text, style = flat[i]
+            count = text.count('\n')
+            if seen + count >= keep:
+                position = len(text)
+                for _ in range(keep - seen):
+                    position = text.rindex('\n', 0, position)
+                self.store(flat[:i] + [[text[:position + 1], style]], total - keep)
+                rest = [[text[position + 1:], style]] + flat[i + 1:]
+                break
+            seen += count
+        lines = deque()
+        line = Line()
+        for text, style in rest:
+            for k, part in enumerate(text.split('\n')):
+                if k:
+                    lines.append(line)
+                    line = Line()
+                if part:
+                    line.write(line.length, part, style)
+        lines.append(line)
+        self.lines = lines
+        self.row = len(lines) - 1
+        self.column = line.length
+
+    def text(self, text, style):
+        '''
+        Write printable text and line feeds at the cursor
+        '''
+        if '\n' not in text:
+            self.lines[self.row].write(self.column, text, style)
+            self.column += len(text)
+            return
+        lines = text.split('\n')
+        self.lines[self.row].write(self.column, lines[0], style)
+        self.column += len(lines[0])
+        if len(lines) == 1:
+            return
+        middle = lines[1:-1]
+        if self.row == len(self.lines) - 1 and len(middle) > self.rows:
+            # Lines that would scroll out right away skip the screen
+            for line in self.lines:
+                self.scroll_out(line, 1)
+            bulk = '\n'.join(middle[:-self.rows]) + '\n'
+            self.store([[bulk, style]], len(middle) - self.rows)
+            middle = middle[-self.rows:]
+            self.lines = deque([Line()])
+            self.row = 0
+            self.lines[0].write(0, middle.pop(0), style)
+        for line in middle:
+            self.line_feed()
+            self.lines[self.row].write(0, line, style)
+        self.line_feed()
+        self.lines[self.row].write(0, lines[-1], style)
+        self.column = len(lines[-1])
+
+    def line_feed(self):
+        '''
+        Move to the start of the next line, scrolling the screen
+        '''
+        self.column = 0
+        self.row += 1
+        if self.row == len(self.lines):
+            self.lines.append(Line())
+            self.fit()
+
+    def fit(self):
+        '''
+        Scroll out the lines beyond the height of the screen
+        '''
+        while len(self.lines) > self.rows:
+            self.scroll_out(self.lines.popleft(), 1)
+            self.row = max(self.row - 1, 0)
+
+    def resize(self, rows):
+        '''
+        Change the height of the screen
+        '''
+        self.rows = max(rows, 1)
+        self.fit()
+        self.changed = True
+
+    def scroll_out(self, line, count):
+        '''
+        Store a line that left the top of the screen
+        '''
+        runs = line.runs
+        if runs and runs[-1][1] == DEFAULT:
+            runs[-1][0] += '\n'
+        else:
+            runs.append(['\n', DEFAULT])
+        self.store(runs, count)
+
+    def store(self, runs, count):
+        '''
+        Keep runs holding count line feeds, dropping the oldest beyond
+        scrollback
+        '''
+        self.scrolled.extend(runs)
+        self.scrolled_lines += count
+        # Trimming on every line would scan the runs every time
+        if self.scrolled_lines > 2 * self.scrollback:
+            self.trim()
+
+    def trim(self):
+        '''
+        Drop the scrolled lines beyond scrollback
+        '''
+        excess = self.scrolled_lines - self.scrollback
+        if excess <= 0:
+            return
+        self.dropped += excess
+        self.scrolled_lines -= excess
+        while excess:
+            text = self.scrolled[0][0]
+            count = text.count('\n')
+            if count < excess:
+                self.scrolled.popleft()
+                excess -= count
+                continue
+            self.scrolled[0] = [text.split('\n', excess)[excess], self.scrolled[0][1]]
+            excess = 0
+
+    def control(self, char):
+        '''
+        Handle a control character
+        '''
+        if char == '\r':
+            self.column = 0
+        elif char == '\b':
+            self.column = max(self.column - 1, 0)
+        elif char == '\t':
+            stop = (self.column // TAB + 1) * TAB
+            line = self.lines[self.row]
+            if stop > line.length:
+                line.write(self.column, ' ' * (stop - self.column), self.style)
+            self.column = stop
+
+    def sequence(self, parameters, final):
+        '''
+        Handle a control sequence, ignoring private and unknown ones
+        '''
+        if parameters[:1] in ('?', '>', '<', '='):
+            return
+        numbers = [int(value) if value.isdigit() else 0
+                   for value in parameters.split(';')]
+        count = max(numbers[0], 1)
+        if final == 'A':
+            self.move(self.row - count, self.column)
+        elif final == 'B':
+            self.move(self.row + count, self.column)
+        elif final == 'C':
+            self.column += count
+        elif final == 'D':
+            self.column = max(self.column - count, 0)
+        elif final == 'E':
+            self.move(self.row + count, 0)
+        elif final == 'F':
+            self.move(self.row - count, 0)
+        elif final == 'G':
+            self.column = count - 1
+        elif final in 'Hf':
+            column = numbers[1] if len(numbers) > 1 else 0
+            # Rows are counted from the top of a full screen
+            top = self.rows - len(self.lines)
+            self.move(count - 1 - top, max(column, 1) - 1)
+        elif final == 'K':
+            line = self.lines[self.row]
+            if numbers[0] == 0:
+                line.erase(self.column, None)
+            elif numbers[0] == 1:
+                line.erase(0, self.column + 1)
+            else:
+                line.erase(0, None)
+        elif final == 'J':
+            if numbers[0] in (2, 3):
+                self.clear()
+            elif numbers[0] == 0:
+                self.lines[self.row].erase(self.column, None)
+                for row in range(self.row + 1, len(self.lines)):
+                    self.lines[row] = Line()
+
+    def move(self, row, column):
+        '''
+        Move the cursor, within the lines on the screen
+        '''
+        self.row = min(max(row, 0), len(self.lines) - 1)
+        self.column = max(column, 0)
+
+    def clear(self):
+        '''
+        Forget everything, the view has to be cleared too
+        '''
+        self.lines = deque([Line()])
+        self.row = self.column = 0
+        self.scrolled = deque()
+        self.scrolled_lines = 0
+        self.cleared = True
+        self.changed = True
+
+    def take(self):
+        '''
+        Return (cleared, scrolled runs, lines on the screen as runs), runs
+        of the same style merged, and forget the scrolled runs
+        '''
+        self.trim()
+        scrolled = merge(self.scrolled)
+        cleared = self.cleared
+        self.scrolled = deque()
+        self.scrolled_lines = 0
+        self.cleared = False
+        self.changed = False
+        screen = []
+        for i, line in enumerate(self.lines):
+            if i:
+                screen.append(['\n', DEFAULT])
+            screen.extend(line.runs)
+        return cleared, scrolled, merge(screen)
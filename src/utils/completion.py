@@ -0,0 +1,241 @@
+'''
+Code completion served by jedi in a worker process
+'''
+
+import multiprocessing
+import queue
+from collections import OrderedDict
+from time import perf_counter
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from utils.profiler import Histogram, PROFILER
+
+# Completions sent back per request, the client only shows the first ones
+MAX_COMPLETIONS = 2000
+# Seconds between checks that the editor process is still alive
+PARENT_CHECK = 5
+
+
+def complete(projects, request):
+    '''
+    Return [(name, type)] of the completions at the position of a
+    request, with the jedi project of its folder kept in projects
+    '''
+    import jedi
+    _, root, path, text, line, column = request
+    project = projects.get(root)
+    if project is None and root is not None:
+        project = projects[root] = jedi.Project(root)
+    script = jedi.Script(text, path=path, project=project)
+    completions = script.complete(line, column)
+    return [(completion.name, completion.type)
+            for completion in completions[:MAX_COMPLETIONS]]
+
+
+def serve(requests, responses):
+    '''
+    Main loop of the worker process. Only the newest of the queued
+    requests is answered, the older ones are cancelled. Replies are
+    (id, completions, seconds, error), completions None for a cancelled
+    request, or with an error when jedi cannot be imported. A None
+    request ends the loop, as does the end of the editor process.
+    '''
+    parent = multiprocessing.parent_process()
+    projects = {}
+    error = None
+    try:
+        import jedi
+    except ImportError as e:
+        error = 'jedi is not installed: %s' % e
+    else:
+        try:
+            # Load the builtins before the first request
+            jedi.Script('').complete(1, 0)
+        except Exception:
+            pass
+    while True:
+        try:
+            request = requests.get(timeout=PARENT_CHECK)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():
+                return
+            continue
+        while request is not None:
+            try:
+                newer = requests.get_nowait()
+            except queue.Empty:
+                break
+            responses.put((request[0], None, 0, None))
+            request = newer
+        if request is None:
+            return
+        if error is not None:
+            responses.put((request[0], None, 0, error))
+            continue
+        start = perf_counter()
+        try:
+            completions = complete(projects, request)
+            failure = None
+        except Exception as e:
+            # jedi fails on some code, the request gets no completions
+            completions = []
+            failure = '%s: %s' % (type(e).__name__, e)
+        responses.put((request[0], completions, perf_counter() - start, failure))
+
+
+class ResponseReader(QThread):
+    '''
+    Wait for the replies of the worker process and emit them
+    '''
+    received = pyqtSignal(object)
+
+    def __init__(self, responses, parent=None):
+        super().__init__(parent)
+        self.responses = responses
+
+    def run(self):
+        '''
+        Emit every reply until a None one
+        '''
+        while True:
+            response = self.responses.get()
+            if response is None:
+                return
+            self.received.emit(response)
+
+
+class CompletionClient(QObject):
+    '''
+    Sends completion requests to the worker process, which keeps the jedi
+    state of every project warm, and never waits for it. Replies to
+    requests made before the newest one are stale: they are cached but
+    not shown. Completion lists are cached by (version, scope), see
+    Completer.
+
+    The latency from request to reply is counted in a histogram, and in
+    the completion histogram of the profiler while it records.
+    '''
+    CACHE_SIZE = 64
+
+    completed = pyqtSignal(object, list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.context = multiprocessing.get_context('spawn')
+        self.process = None
+        self.requests = None
+        self.responses = None
+        self.reader = None
+        self.next_id = 0
+        self.latest = None
+        # id -> (key, time sent)
+        self.pending = {}
+        self.cache = OrderedDict()
+        self.latency = Histogram()
+        self.jedi_time = Histogram()
+        self.counts = {'requests': 0, 'cancelled': 0, 'stale': 0,
+                       'cache_hits': 0, 'errors': 0, 'restarts': 0}
+        self.error = None
+
+    def start(self):
+        '''
+        Start the worker process and the thread reading its replies
+        '''
+        self.requests = self.context.Queue()
+        self.responses = self.context.Queue()
+        self.process = self.context.Process(
+            target=serve, args=(self.requests, self.responses), daemon=True)
+        self.process.start()
+        self.reader = ResponseReader(self.responses, self)
+        self.reader.received.connect(self.receive)
+        self.reader.start()
+
+    def close(self):
+        '''
+        Stop the worker process and the reader
+        '''
+        if self.process is None:
+            return
+        self.requests.put(None)
+        self.responses.put(None)
+        self.reader.wait()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+        self.reader = None
+        self.pending.clear()
+
+    def cached(self, key):
+        '''
+        Return the cached completions of a key, or None
+        '''
+        completions = self.cache.get(key)
+        if completions is not None:
+            self.cache.move_to_end(key)
+            self.counts['cache_hits'] += 1
+        return completions
+
+    def request(self, key, root, path, text, line, column):
+        '''
+        Ask for the completions at a 1-based line and 0-based column of
+        text, answered by completed(key, completions)
+        '''
+        if self.error is not None:
+            return
+        if self.process is not None and not self.process.is_alive():
+            # The worker died, start over
+            self.close()
+            self.counts['restarts'] += 1
+        if self.process is None:
+            self.start()
+        self.next_id += 1
+        self.latest = self.next_id
+        self.pending[self.next_id] = (key, perf_counter())
+        self.counts['requests'] += 1
+        self.requests.put((self.next_id, root, path, text, line, column))
+
+    def cancel(self):
+        '''
+        Make the pending requests stale
+        '''
+        self.latest = None
+
+    def receive(self, response):
+        '''
+        Cache the reply of the worker and emit it unless it is stale
+        '''
+        if self.sender() is not self.reader:
+            return
+        request_id, completions, seconds, error = response
+        key, sent = self.pending.pop(request_id, (None, None))
+        if key is None:
+            return
+        if completions is None:
+            if error is None:
+                self.counts['cancelled'] += 1
+            elif self.error is None:
+                self.error = error
+                self.failed.emit(error)
+            return
+        elapsed = perf_counter() - sent
+        self.latency.add(elapsed * 1000)
+        self.jedi_time.add(seconds * 1000)
+        if PROFILER.enabled:
+            PROFILER.add_time('completion', elapsed, histogram='completion')
+        if error is not None:
+            self.counts['errors'] += 1
+        self.cache[key] = completions
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+        if request_id != self.latest:
+            self.counts['stale'] += 1
+            return
+        self.completed.emit(key, completions)
+
+    def stats(self):
+        '''
+        Return the request counts and the latency percentiles
+        '''
+        return dict(self.counts, error=self.error, pending=len(self.pending),
+                    latency=self.latency.stats(), jedi=self.jedi_time.stats())
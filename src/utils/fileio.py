@@ -0,0 +1,323 @@
+'''
+Reading and writing files off the GUI thread
+'''
+
+import codecs
+import os
+import queue
+import shutil
+import tempfile
+from time import perf_counter
+from PyQt5.QtCore import QObject, QThread, QSemaphore, QTimer, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+
+# Permissions of newly created files follow the umask like open() does
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+# Longer BOMs first, the UTF-32 LE BOM starts with the UTF-16 LE one
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def detect_encoding(head):
+    '''
+    Guess the encoding of a file from its first bytes: a BOM, the NUL
+    pattern of BOM-less UTF-16, UTF-8, and Latin-1 as the fallback.
+    '''
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    if len(head) >= 2:
+        even_nuls = head[0::2].count(0)
+        odd_nuls = head[1::2].count(0)
+        half = len(head) // 2
+        if odd_nuls > half * 0.4 and even_nuls < half * 0.1:
+            return 'utf-16-le'
+        if even_nuls > half * 0.4 and odd_nuls < half * 0.1:
+            return 'utf-16-be'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def line_codec(encoding):
+    '''
+    Return the codec decoding any run of whole lines of a file in an
+    encoding, or None when its newlines are not the byte b'\n'
+    '''
+    codec = 'utf-8' if encoding == 'utf-8-sig' else encoding
+    return codec if '\n'.encode(codec) == b'\n' else None
+
+
+def decode_lines(data, codec):
+    '''
+    Decode whole lines, return the text with '\n' newlines and the newline
+    of the lines, b'\r\n' if any ends with it. Undecodable bytes are kept
+    as lone surrogates.
+    '''
+    newline = b'\r\n' if b'\r\n' in data else b'\n'
+    text = data.decode(codec, 'surrogateescape')
+    if newline != b'\n':
+        text = text.replace('\r\n', '\n')
+    return text, newline
+
+
+def encode_lines(text, codec, newline):
+    '''
+    Encode text decoded by decode_lines back to bytes, characters the
+    codec cannot encode become '?'
+    '''
+    while True:
+        try:
+            data = text.encode(codec, 'surrogateescape')
+            break
+        except UnicodeEncodeError as e:
+            text = text[:e.start] + '?' * (e.end - e.start) + text[e.end:]
+    if newline != b'\n':
+        data = data.replace(b'\n', newline)
+    return data
+
+
+class FileLoader(QThread):
+    '''
+    Decode a file in chunks on a worker thread and stream the text
+    to the GUI thread with universal newlines.
+    '''
+    CHUNK = 1 << 17
+    HEAD = 1 << 16
+
+    chunk = pyqtSignal(str)
+    progress = pyqtSignal(int)
+    restarted = pyqtSignal()
+    loaded = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        # Keep at most one chunk in flight so the GUI stays responsive
+        self.in_flight = QSemaphore(1)
+
+    def consumed(self):
+        '''
+        Called by the GUI thread once it has inserted a chunk
+        '''
+        self.in_flight.release()
+
+    def requestInterruption(self):
+        '''
+        Ask the loader to stop, waking it up if it waits for the GUI
+        '''
+        super().requestInterruption()
+        self.in_flight.release()
+
+    def run(self):
+        '''
+        Read the file, restarting as Latin-1 if UTF-8 turns out to be wrong
+        '''
+        try:
+            with open(self.path, 'rb') as file:
+                encoding = detect_encoding(file.read(self.HEAD))
+                try:
+                    self.stream(file, encoding)
+                except UnicodeDecodeError:
+                    if encoding != 'utf-8':
+                        raise
+                    encoding = 'latin-1'
+                    self.restarted.emit()
+                    self.stream(file, encoding)
+        except (OSError, UnicodeDecodeError) as e:
+            self.failed.emit(str(e))
+            return
+        if not self.isInterruptionRequested():
+            self.loaded.emit(encoding)
+
+    def stream(self, file, encoding):
+        '''
+        Decode the file from the start and emit it chunk by chunk
+        '''
+        file.seek(0, 2)
+        size = max(1, file.tell())
+        file.seek(0)
+        decoder = codecs.getincrementaldecoder(encoding)()
+        pending = ''
+        while not self.isInterruptionRequested():
+            data = file.read(self.CHUNK)
+            text = pending + decoder.decode(data, not data)
+            pending = ''
+            # A '\r' at the end may be the first half of a '\r\n'
+            if data and text.endswith('\r'):
+                text, pending = text[:-1], '\r'
+            if text:
+                while not self.in_flight.tryAcquire(1, 50):
+                    if self.isInterruptionRequested():
+                        return
+                self.chunk.emit(text.replace('\r\n', '\n').replace('\r', '\n'))
+            self.progress.emit(int(file.tell() * 100 / size))
+            if not data:
+                break
+
+
+def read_text(path, encoding):
+    '''
+    Read a whole file decoded with a known encoding and universal newlines
+    '''
+    with open(path, 'rb') as file:
+        text = file.read().decode(encoding)
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def write_atomic(path, chunks):
+    '''
+    Write bytes chunks to a temporary file next to path, flush it to disk
+    and rename it over path, so that path is never left half written.
+    '''
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(
+        prefix='.%s.' % os.path.basename(path), suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        else:
+            os.chmod(temp_path, 0o666 & ~UMASK)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def document_chunks(document, encoding, size=1 << 20):
+    '''
+    Yield the text of a QTextDocument encoded, size characters at a time
+    '''
+    encoder = codecs.getincrementalencoder(encoding)()
+    end = document.characterCount() - 1
+    if end <= size:
+        # Copying the raw text is much faster than selecting it
+        yield encoder.encode(document.toRawText().replace('\u2029', '\n'), True)
+        return
+    cursor = QTextCursor(document)
+    position = 0
+    while position < end:
+        stop = min(position + size, end)
+        # Do not split a surrogate pair between two chunks
+        if stop < end and '\ud800' <= document.characterAt(stop - 1) <= '\udbff':
+            stop -= 1
+        cursor.setPosition(position)
+        cursor.setPosition(stop, QTextCursor.KeepAnchor)
+        yield encoder.encode(cursor.selectedText().replace('\u2029', '\n'))
+        position = stop
+    yield encoder.encode('', True)
+
+
+class DocumentStreamer(QObject):
+    '''
+    Feed the encoded text of a document into a bounded queue in time slices
+    on the GUI thread, for a FileSaver to write on its own thread.
+    '''
+    SLICE = 0.008
+    CHUNK = 1 << 18
+
+    def __init__(self, document, encoding, parent=None):
+        super().__init__(parent)
+        self.source = document_chunks(document, encoding, self.CHUNK)
+        self.queue = queue.Queue(maxsize=16)
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.feed)
+
+    def chunks(self):
+        '''
+        Return an iterator over the queued chunks, for the writing thread
+        '''
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def start(self):
+        '''
+        Start feeding the queue
+        '''
+        self.timer.start()
+
+    def feed(self):
+        '''
+        Queue chunks until the slice is used up or the queue is full
+        '''
+        deadline = perf_counter() + self.SLICE
+        while perf_counter() < deadline and not self.queue.full():
+            if not self.put(block=False):
+                self.timer.stop()
+                return
+
+    def drain(self):
+        '''
+        Queue all remaining chunks, waiting for the writer when needed
+        '''
+        self.timer.stop()
+        while self.put(block=True):
+            pass
+
+    def put(self, block):
+        '''
+        Queue the next chunk, return False once the end was queued
+        '''
+        try:
+            item = next(self.source)
+        except StopIteration:
+            item = None
+        except UnicodeEncodeError as e:
+            item = e
+        self.queue.put(item, block=block)
+        return not (item is None or isinstance(item, Exception))
+
+
+class FileSaver(QThread):
+    '''
+    Write bytes chunks to a file atomically on a worker thread,
+    error holds the reason when it failed.
+    '''
+
+    def __init__(self, path, chunks, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.source = chunks
+        self.error = None
+
+    def run(self):
+        '''
+        Write the file
+        '''
+        try:
+            write_atomic(self.path, self.source)
+        except (OSError, UnicodeEncodeError) as e:
+            self.error = str(e)
+            # Keep consuming so that a producer waiting on us is released
+            try:
+                for _ in self.source:
+                    pass
+            except UnicodeEncodeError:
+                pass
@@ -0,0 +1,225 @@
+'''
+Searching the files of a folder in worker processes
+'''
+
+import mmap
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from time import perf_counter
+from PyQt5.QtCore import QThread, pyqtSignal
+from utils.ignore import walk
+from utils.utils import log
+
+# Files at least this big are mapped instead of read
+MMAP_SIZE = 1 << 20
+# A NUL byte in the first bytes of a file marks it as binary
+BINARY_PROBE = 8192
+MAX_MATCHES_PER_FILE = 1000
+MAX_PREVIEW = 300
+WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+
+_executor = None
+
+
+def compile_query(text, regex=False, case=False, word=False):
+    '''
+    Compile the query as a bytes pattern, raise re.error for an invalid regex
+    '''
+    pattern = text.encode('utf-8')
+    if not regex:
+        pattern = re.escape(pattern)
+    if word:
+        pattern = rb'\b(?:' + pattern + rb')\b'
+    flags = re.MULTILINE | (0 if case else re.IGNORECASE)
+    return re.compile(pattern, flags)
+
+
+def search_data(data, pattern):
+    '''
+    Return (line, column, line text) of the matches in data, 1-based
+    '''
+    results = []
+    line = 1
+    counted = 0
+    previous_line = None
+    for match in pattern.finditer(data):
+        start = match.start()
+        if start == match.end():
+            continue
+        # Mapped files have no count(), slicing gives bytes for both
+        line += data[counted:start].count(b'\n')
+        counted = start
+        line_start = data.rfind(b'\n', 0, start) + 1
+        line_end = data.find(b'\n', start)
+        if line_end < 0:
+            line_end = len(data)
+        column = len(data[line_start:start].decode('utf-8', 'replace')) + 1
+        if line != previous_line:
+            preview = data[line_start:min(line_end, line_start + MAX_PREVIEW * 4)]
+            preview = preview.decode('utf-8', 'replace').rstrip('\r')[:MAX_PREVIEW]
+            previous_line = line
+        results.append((line, column, preview))
+        if len(results) >= MAX_MATCHES_PER_FILE:
+            break
+    return results
+
+
+def search_file(path, pattern):
+    '''
+    Return the matches in a file, nothing for binary or unreadable files
+    '''
+    try:
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return []
+            if size < MMAP_SIZE:
+                data = file.read()
+                if b'\0' in data[:BINARY_PROBE]:
+                    return []
+                return search_data(data, pattern)
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data.find(b'\0', 0, BINARY_PROBE) >= 0:
+                    return []
+                return search_data(data, pattern)
+    except (OSError, ValueError):
+        return []
+
+
+def search_batch(paths, pattern):
+    '''
+    Search a batch of files, return [(path, matches)] for the files
+    that have matches
+    '''
+    found = []
+    for path in paths:
+        matches = search_file(path, pattern)
+        if matches:
+            found.append((path, matches))
+    return found
+
+
+def executor():
+    '''
+    Return the process pool shared by all searches, starting it on first
+    use. Workers are spawned rather than forked from the GUI process.
+    '''
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def reset_executor():
+    '''
+    Drop a pool whose workers died, the next search starts a new one
+    '''
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+class FolderSearch(QThread):
+    '''
+    Walk a folder and search its files in the process pool, emitting the
+    results batch by batch as they come in.
+    '''
+    BATCH_FILES = 64
+    BATCH_BYTES = 4 << 20
+    MAX_RESULTS = 20000
+
+    found = pyqtSignal(list)
+
+    def __init__(self, root, pattern, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.pattern = pattern
+        self.files = 0
+        self.bytes = 0
+        self.results = 0
+        self.truncated = False
+        self.error = None
+        self.skipped = 0
+        self.elapsed = 0
+        self.pending = set()
+        # Future -> number of files in its batch
+        self.batches = {}
+
+    def run(self):
+        '''
+        Submit batches while walking, then wait for the remaining ones
+        '''
+        start = perf_counter()
+        pool = executor()
+        limit = WORKERS * 4
+        batch = []
+        size = 0
+        for path, file_size in walk(self.root):
+            if self.isInterruptionRequested():
+                break
+            batch.append(path)
+            size += file_size
+            if len(batch) >= self.BATCH_FILES or size >= self.BATCH_BYTES:
+                self.submit(pool, batch, size)
+                batch = []
+                size = 0
+                # Do not run far ahead of the workers
+                self.collect(None if len(self.pending) >= limit else 0)
+        if batch and not self.isInterruptionRequested():
+            self.submit(pool, batch, size)
+        while self.pending and not self.isInterruptionRequested():
+            self.collect(0.05)
+        for future in self.pending:
+            future.cancel()
+        self.pending = set()
+        self.batches = {}
+        self.elapsed = perf_counter() - start
+
+    def submit(self, pool, batch, size):
+        '''
+        Queue a batch of files, stop when the pool is broken
+        '''
+        try:
+            future = pool.submit(search_batch, batch, self.pattern)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self.error = str(e)
+            reset_executor()
+            self.requestInterruption()
+            return
+        self.pending.add(future)
+        self.batches[future] = len(batch)
+        self.files += len(batch)
+        self.bytes += size
+
+    def collect(self, timeout):
+        '''
+        Emit the results of the finished batches, waiting up to timeout
+        seconds (forever for None) for one to finish. A batch that failed
+        in its worker is skipped, the others go on.
+        '''
+        done, self.pending = wait(self.pending, timeout, FIRST_COMPLETED)
+        for future in done:
+            files = self.batches.pop(future, 0)
+            try:
+                found = future.result()
+            except BrokenProcessPool as e:
+                self.error = str(e)
+                reset_executor()
+                self.requestInterruption()
+                return
+            except Exception as e:
+                log(f"Search of {files} files failed: {e}")
+                self.skipped += files
+                continue
+            if not found:
+                continue
+            self.results += sum(len(matches) for _, matches in found)
+            self.found.emit(found)
+            if self.results >= self.MAX_RESULTS:
+                self.truncated = True
+                self.requestInterruption()
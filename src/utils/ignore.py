@@ -0,0 +1,215 @@
+'''
+Walking a folder while honouring .gitignore files
+'''
+
+import os
+import re
+
+# Never descend into version control metadata
+DEFAULT_PATTERNS = ['.git/', '.hg/', '.svn/']
+
+
+def translate(pattern):
+    '''
+    Translate a gitignore glob, without its leading '/', to a regex
+    '''
+    parts = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif char == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif char == '?':
+            parts.append('[^/]')
+            i += 1
+        elif char == '[':
+            end = pattern.find(']', i + 2)
+            if end < 0:
+                parts.append(re.escape(char))
+                i += 1
+            else:
+                body = pattern[i + 1:end].replace('\\', '\\\\')
+                if body[0] in '!^':
+                    body = '^' + body[1:]
+                parts.append('[%s]' % body)
+                i = end + 1
+        elif char == '\\' and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(char))
+            i += 1
+    return ''.join(parts)
+
+
+class IgnoreRules:
+    '''
+    The patterns of one .gitignore file, matched against paths relative
+    to the directory that holds it
+    '''
+
+    def __init__(self, lines):
+        self.rules = []
+        for line in lines:
+            line = line.rstrip('\n').rstrip('\r')
+            if not line.endswith('\\ '):
+                line = line.rstrip(' ')
+            if not line or line.startswith('#'):
+                continue
+            negated = line.startswith('!')
+            if negated:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            # A pattern with a slash before its end is relative to the base
+            if '/' in line:
+                regex = translate(line.lstrip('/'))
+            else:
+                regex = '(?:.*/)?' + translate(line)
+            self.rules.append((re.compile(regex + r'\Z', re.DOTALL),
+                               negated, dir_only))
+
+    @classmethod
+    def from_file(cls, path):
+        '''
+        Read a .gitignore file, an unreadable one has no rules
+        '''
+        try:
+            with open(path, encoding='utf-8', errors='replace') as file:
+                return cls(file.readlines())
+        except OSError:
+            return cls([])
+
+    def match(self, relative_path, is_dir):
+        '''
+        Return True if the path is ignored, False if it is explicitly
+        re-included and None if no pattern applies
+        '''
+        result = None
+        for regex, negated, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relative_path):
+                result = not negated
+        return result
+
+
+class Ignore:
+    '''
+    The stack of rules that apply in a directory: the defaults, extra
+    patterns and every .gitignore from the root down to the directory.
+    Paths are given relative to the root, with '/' separators.
+    '''
+
+    def __init__(self, patterns=()):
+        self.levels = [('', IgnoreRules(DEFAULT_PATTERNS + list(patterns)))]
+
+    def enter(self, directory, relative):
+        '''
+        Return the stack for a subdirectory, adding its .gitignore if any
+        '''
+        gitignore = os.path.join(directory, '.gitignore')
+        if not os.path.isfile(gitignore):
+            return self
+        child = Ignore.__new__(Ignore)
+        base = relative + '/' if relative else ''
+        child.levels = self.levels + [(base, IgnoreRules.from_file(gitignore))]
+        return child
+
+    def ignored(self, relative, is_dir):
+        '''
+        Return whether a path relative to the root is ignored
+        '''
+        result = False
+        for base, rules in self.levels:
+            if not relative.startswith(base):
+                continue
+            match = rules.match(relative[len(base):], is_dir)
+            if match is not None:
+                result = match
+        return result
+
+
+def descend(base, path, patterns=()):
+    '''
+    Return the stack of rules that applies in a folder below base and the
+    path of the folder relative to base, or None when the folder or one
+    above it is ignored
+    '''
+    if os.path.relpath(path, base).startswith(os.pardir):
+        base = path
+    ignore = Ignore(patterns).enter(base, '')
+    directory = base
+    relative = ''
+    for name in os.path.relpath(path, base).split(os.sep):
+        if name == os.curdir:
+            continue
+        directory = os.path.join(directory, name)
+        relative = relative + '/' + name if relative else name
+        if ignore.ignored(relative, True):
+            return None
+        ignore = ignore.enter(directory, relative)
+    return ignore, relative
+
+
+def ignored(path, base, patterns=()):
+    '''
+    Return whether a file below base is ignored
+    '''
+    found = descend(base, os.path.dirname(path), patterns)
+    if found is None:
+        return True
+    ignore, relative = found
+    name = os.path.basename(path)
+    return ignore.ignored(relative + '/' + name if relative else name, False)
+
+
+def walk(root, patterns=(), base=None):
+    '''
+    Yield (path, size) for every file below root that is not ignored,
+    without following symbolic links to directories. With base, a folder
+    above root, the .gitignore files from base down to root apply too,
+    and an ignored root yields nothing.
+    '''
+    found = descend(root if base is None else base, root, patterns)
+    if found is None:
+        return
+    ignore, relative = found
+    stack = [(root, relative, ignore)]
+    while stack:
+        directory, relative, ignore = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        prefix = relative + '/' if relative else ''
+        subdirectories = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if ignore.ignored(prefix + entry.name, is_dir):
+                continue
+            if is_dir:
+                subdirectories.append((entry.path, prefix + entry.name))
+            else:
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                yield entry.path, size
+        for path, name in sorted(subdirectories, reverse=True):
+            stack.append((path, name, ignore.enter(path, name)))
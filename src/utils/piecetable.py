@@ -0,0 +1,205 @@
+'''
+Piece table over a memory-mapped file, with a line-offset index
+'''
+
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+ORIGINAL, ADDED = 0, 1
+
+# A run of bytes taken from the original file or from the add buffer
+Piece = namedtuple('Piece', ['buffer', 'start', 'length', 'newlines'])
+
+
+class LineIndex:
+    '''
+    Newline counts per fixed-size chunk of a read-only buffer, so that
+    counting and locating newlines never scans more than one chunk.
+    '''
+    CHUNK = 1 << 16
+
+    def __init__(self, data):
+        self.data = data
+        self.counts = array('q', [0])
+        total = 0
+        for offset in range(0, len(data), self.CHUNK):
+            total += data[offset:offset + self.CHUNK].count(b'\n')
+            self.counts.append(total)
+
+    def count(self, start, end):
+        '''
+        Return the number of newlines in data[start:end]
+        '''
+        first = -(-start // self.CHUNK)
+        last = end // self.CHUNK
+        if last <= first:
+            return self.data[start:end].count(b'\n')
+        return (self.data[start:first * self.CHUNK].count(b'\n')
+                + self.counts[last] - self.counts[first]
+                + self.data[last * self.CHUNK:end].count(b'\n'))
+
+    def after_newline(self, k):
+        '''
+        Return the offset just after the k-th (1-based) newline
+        '''
+        chunk = bisect_left(self.counts, k) - 1
+        position = chunk * self.CHUNK
+        for _ in range(k - self.counts[chunk]):
+            position = self.data.find(b'\n', position) + 1
+        return position
+
+
+class PieceTable:
+    '''
+    Text of a file as pieces of the memory-mapped original and of an
+    append-only add buffer. Edits only add pieces, never copy the file.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size:
+            self.original = mmap.mmap(
+                self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.original = b''
+        self.added = bytearray()
+        self.index = LineIndex(self.original)
+        self.pieces = []
+        if size:
+            self.pieces.append(
+                Piece(ORIGINAL, 0, size, self.index.count(0, size)))
+        self.modified = False
+
+    def close(self):
+        '''
+        Unmap and close the original file
+        '''
+        if isinstance(self.original, mmap.mmap):
+            self.original.close()
+        self.file.close()
+
+    def __len__(self):
+        return sum(piece.length for piece in self.pieces)
+
+    def line_count(self):
+        '''
+        Return the number of lines
+        '''
+        return sum(piece.newlines for piece in self.pieces) + 1
+
+    def make_piece(self, buffer, start, length):
+        '''
+        Return a piece with its newline count
+        '''
+        if buffer == ORIGINAL:
+            newlines = self.index.count(start, start + length)
+        else:
+            newlines = self.added.count(b'\n', start, start + length)
+        return Piece(buffer, start, length, newlines)
+
+    def line_offset(self, line):
+        '''
+        Return the byte offset at which a (0-based) line starts
+        '''
+        if line <= 0:
+            return 0
+        offset = 0
+        seen = 0
+        for piece in self.pieces:
+            if seen + piece.newlines >= line:
+                k = line - seen
+                if piece.buffer == ORIGINAL:
+                    before = self.index.count(0, piece.start)
+                    end = self.index.after_newline(before + k)
+                else:
+                    end = piece.start
+                    for _ in range(k):
+                        end = self.added.find(b'\n', end) + 1
+                return offset + end - piece.start
+            seen += piece.newlines
+            offset += piece.length
+        return offset
+
+    def line_at(self, offset):
+        '''
+        Return the (0-based) line containing a byte offset
+        '''
+        line = 0
+        position = 0
+        for piece in self.pieces:
+            if position + piece.length > offset:
+                end = piece.start + offset - position
+                if piece.buffer == ORIGINAL:
+                    return line + self.index.count(piece.start, end)
+                return line + self.added.count(b'\n', piece.start, end)
+            line += piece.newlines
+            position += piece.length
+        return line
+
+    def read(self, start, end):
+        '''
+        Return the bytes between two offsets
+        '''
+        parts = []
+        position = 0
+        for piece in self.pieces:
+            piece_end = position + piece.length
+            if piece_end > start and position < end:
+                data = self.original if piece.buffer == ORIGINAL else self.added
+                begin = piece.start + max(start, position) - position
+                stop = piece.start + min(end, piece_end) - position
+                parts.append(bytes(data[begin:stop]))
+            if piece_end >= end:
+                break
+            position = piece_end
+        return b''.join(parts)
+
+    def replace(self, start, end, data):
+        '''
+        Replace the bytes between two offsets with data
+        '''
+        inserted = None
+        if data:
+            self.added += data
+            inserted = self.make_piece(
+                ADDED, len(self.added) - len(data), len(data))
+        pieces = []
+        position = 0
+        for piece in self.pieces:
+            piece_end = position + piece.length
+            if piece_end <= start or position >= end:
+                if inserted and position >= end:
+                    pieces.append(inserted)
+                    inserted = None
+                pieces.append(piece)
+            else:
+                if position < start:
+                    pieces.append(self.make_piece(
+                        piece.buffer, piece.start, start - position))
+                if inserted:
+                    pieces.append(inserted)
+                    inserted = None
+                if piece_end > end:
+                    pieces.append(self.make_piece(
+                        piece.buffer, piece.start + end - position,
+                        piece_end - end))
+            position = piece_end
+        if inserted:
+            pieces.append(inserted)
+        self.pieces = pieces
+        self.modified = True
+
+    def chunks(self, size=1 << 20):
+        '''
+        Yield the whole text as bytes chunks of at most size bytes
+        '''
+        for piece in self.pieces:
+            data = self.original if piece.buffer == ORIGINAL else self.added
+            for offset in range(piece.start, piece.start + piece.length, size):
+                yield bytes(data[offset:min(offset + size,
+                                            piece.start + piece.length)])
@@ -0,0 +1,211 @@
+'''
+Timers, counters and latency histograms of the editor hot paths
+'''
+
+import json
+from functools import wraps
+from inspect import CO_VARARGS
+from time import perf_counter
+from PyQt5.QtCore import Qt, QTimer
+
+# Upper bounds of the histogram buckets in milliseconds, the last bucket
+# holds everything slower
+BUCKETS = (1, 2, 4, 8, 16, 33, 50, 100, 250, 500, 1000)
+
+
+class Histogram:
+    '''
+    Durations in milliseconds counted in fixed buckets
+    '''
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        '''
+        Count one duration
+        '''
+        index = 0
+        while index < len(BUCKETS) and ms > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        '''
+        Return the upper bound of the bucket holding the given fraction of
+        the durations, or the longest duration for the last bucket
+        '''
+        wanted = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted and count:
+                return BUCKETS[index] if index < len(BUCKETS) else round(self.max, 3)
+        return 0
+
+    def stats(self):
+        '''
+        Return the count, mean, longest and percentile durations and the
+        count of every bucket
+        '''
+        labels = ['<=%d' % bound for bound in BUCKETS] + ['>%d' % BUCKETS[-1]]
+        return {'count': self.count,
+                'mean_ms': round(self.total / self.count, 3) if self.count else 0,
+                'max_ms': round(self.max, 3),
+                'p50_ms': self.percentile(0.5),
+                'p99_ms': self.percentile(0.99),
+                'buckets': dict(zip(labels, self.counts))}
+
+
+class Profiler:
+    '''
+    Low-overhead instrumentation, off until enabled at runtime.
+
+    Functions decorated with timed add their run time to a named timer, and
+    to a histogram when given one. While disabled they only check a flag.
+    While enabled a timer also measures how late the event loop runs it,
+    into the event_loop histogram.
+    '''
+    # Period of the event loop latency probe in milliseconds
+    PROBE_INTERVAL = 50
+
+    def __init__(self):
+        self.enabled = False
+        self.timers = {}
+        self.counters = {}
+        self.histograms = {}
+        self.sources = {}
+        self.probe = None
+        self.last_probe = None
+
+    def set_enabled(self, enabled):
+        '''
+        Start or stop recording, the numbers so far are kept
+        '''
+        self.enabled = enabled
+        if self.probe is None:
+            self.probe = QTimer()
+            self.probe.setTimerType(Qt.PreciseTimer)
+            self.probe.setInterval(self.PROBE_INTERVAL)
+            self.probe.timeout.connect(self.probe_latency)
+        self.last_probe = None
+        if enabled:
+            self.probe.start()
+        else:
+            self.probe.stop()
+
+    def reset(self):
+        '''
+        Forget every number recorded
+        '''
+        self.timers.clear()
+        self.counters.clear()
+        self.histograms.clear()
+        self.last_probe = None
+
+    def add_source(self, name, stats):
+        '''
+        Include the dict returned by stats() under name in every report
+        '''
+        self.sources[name] = stats
+
+    def add_time(self, name, seconds, histogram=None):
+        '''
+        Add one run of seconds to a timer and to a histogram
+        '''
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0.0, 0.0]
+        timer[0] += 1
+        timer[1] += seconds
+        if seconds > timer[2]:
+            timer[2] = seconds
+        if histogram is not None:
+            self.record(histogram, seconds * 1000)
+
+    def count(self, name, amount=1):
+        '''
+        Add amount to a counter
+        '''
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, histogram, ms):
+        '''
+        Add a duration in milliseconds to a histogram
+        '''
+        if histogram not in self.histograms:
+            self.histograms[histogram] = Histogram()
+        self.histograms[histogram].add(ms)
+
+    def timed(self, name, histogram=None):
+        '''
+        Decorate a function to time it under name while enabled
+        '''
+        def decorate(function):
+            code = function.__code__
+            # Like PyQt, drop the signal arguments a slot does not take
+            accepted = None if code.co_flags & CO_VARARGS else code.co_argcount
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args[:accepted], **kwargs)
+                start = perf_counter()
+                try:
+                    return function(*args[:accepted], **kwargs)
+                finally:
+                    self.add_time(name, perf_counter() - start, histogram)
+            return wrapper
+        return decorate
+
+    def probe_latency(self):
+        '''
+        Record how much later than its interval the probe timer fired
+        '''
+        now = perf_counter()
+        if self.last_probe is not None:
+            late = (now - self.last_probe) * 1000 - self.PROBE_INTERVAL
+            self.record('event_loop', max(late, 0.0))
+        self.last_probe = now
+
+    def stats(self):
+        '''
+        Return every timer, counter and histogram and the reports of the
+        sources as a dict
+        '''
+        sources = {}
+        for name, stats in self.sources.items():
+            try:
+                sources[name] = stats()
+            except RuntimeError:
+                # The Qt object behind the source was deleted
+                continue
+        return {'enabled': self.enabled,
+                'timers': {name: {'count': count,
+                                  'total_ms': round(total * 1000, 3),
+                                  'mean_ms': round(total * 1000 / count, 3),
+                                  'max_ms': round(longest * 1000, 3)}
+                           for name, (count, total, longest) in sorted(self.timers.items())},
+                'counters': dict(sorted(self.counters.items())),
+                'histograms': {name: histogram.stats()
+                               for name, histogram in sorted(self.histograms.items())},
+                'sources': sources}
+
+    def dump(self, path):
+        '''
+        Write the statistics to a JSON file
+        '''
+        with open(path, 'w') as file:
+            json.dump(self.stats(), file, indent=4)
+            file.write('\n')
+
+
+PROFILER = Profiler()
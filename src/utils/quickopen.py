@@ -0,0 +1,272 @@
+'''
+Index of the paths of a project for fuzzy quick open
+'''
+
+import hashlib
+import itertools
+import os
+import pickle
+import re
+import tempfile
+from time import perf_counter
+from PyQt5.QtCore import QThread, pyqtSignal
+from utils.ignore import walk
+from utils.utils import DATA_DIR
+
+CACHE_VERSION = 1
+
+
+def cache_path(root):
+    '''
+    Return the file the index of a project is saved to
+    '''
+    digest = hashlib.sha1(os.path.abspath(root).encode('utf-8')).hexdigest()
+    return os.path.join(DATA_DIR, 'quickopen', digest + '.pickle')
+
+
+def char_masks(strings):
+    '''
+    Return {char: int} where bit i is set when strings[i] contains char
+    '''
+    size = len(strings) // 8 + 1
+    arrays = {}
+    for i, string in enumerate(strings):
+        byte = i >> 3
+        bit = 1 << (i & 7)
+        for char in set(string):
+            array = arrays.get(char)
+            if array is None:
+                array = arrays[char] = bytearray(size)
+            array[byte] |= bit
+    return {char: int.from_bytes(array, 'little')
+            for char, array in arrays.items()}
+
+
+def set_bits(mask):
+    '''
+    Yield the positions of the set bits of mask in increasing order
+    '''
+    bits = format(mask, 'b')[::-1]
+    i = bits.find('1')
+    while i >= 0:
+        yield i
+        i = bits.find('1', i + 1)
+
+
+class PathIndex:
+    '''
+    Relative paths of a project with, for each character, a bit set of the
+    paths and of the file names that contain it. A query only checks the
+    order of its characters in paths that contain all of them, file names
+    first, shortest paths first, and stops once it has enough matches.
+    '''
+    CANDIDATES = 300
+    BUDGET = 0.008
+
+    def __init__(self, root, paths=()):
+        self.root = root
+        paths = sorted(paths, key=lambda path: (len(path), path))
+        self.paths = paths
+        self.lower = [path.lower() for path in paths]
+        self.names = [os.path.basename(path) for path in self.lower]
+        self.positions = {path: i for i, path in enumerate(paths)}
+        self.path_masks = char_masks(self.lower)
+        self.name_masks = char_masks(self.names)
+        self.removed = 0
+        # Changed since it was built or loaded
+        self.changed = False
+
+    def __getstate__(self):
+        # The derived lists are cheaper to rebuild than to unpickle
+        return self.root, self.paths, self.path_masks, self.name_masks
+
+    def __setstate__(self, state):
+        self.root, self.paths, self.path_masks, self.name_masks = state
+        self.lower = [path.lower() for path in self.paths]
+        self.names = [os.path.basename(path) for path in self.lower]
+        self.positions = {path: i for i, path in enumerate(self.paths)}
+        self.removed = 0
+        self.changed = False
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, path):
+        '''
+        Add a relative path
+        '''
+        if path in self.positions:
+            return
+        i = len(self.paths)
+        lower = path.lower()
+        name = os.path.basename(lower)
+        self.paths.append(path)
+        self.lower.append(lower)
+        self.names.append(name)
+        self.positions[path] = i
+        self.changed = True
+        for masks, string in ((self.path_masks, lower), (self.name_masks, name)):
+            for char in set(string):
+                masks[char] = masks.get(char, 0) | (1 << i)
+
+    def remove(self, path):
+        '''
+        Remove a relative path, and every path below it for a folder
+        '''
+        prefix = path + '/'
+        for other in [p for p in self.positions if p == path or p.startswith(prefix)]:
+            i = self.positions.pop(other)
+            for masks, string in ((self.path_masks, self.lower[i]),
+                                  (self.name_masks, self.names[i])):
+                for char in set(string):
+                    masks[char] &= ~(1 << i)
+            self.paths[i] = None
+            self.removed += 1
+            self.changed = True
+
+    def candidates(self, masks, chars):
+        '''
+        Yield the positions of the paths whose masks have all chars
+        '''
+        mask = -1
+        for char in chars:
+            mask &= masks.get(char, 0)
+            if not mask:
+                return
+        yield from set_bits(mask)
+
+    def query(self, text, limit=50):
+        '''
+        Return up to limit paths matching text as a fuzzy subsequence,
+        best first
+        '''
+        query = text.lower().replace(' ', '')
+        if not query:
+            paths = (path for path in self.paths if path is not None)
+            return list(itertools.islice(paths, limit))
+        chars = set(query)
+        regex = re.compile('.*?'.join(map(re.escape, query)))
+        deadline = perf_counter() + self.BUDGET
+        found = {}
+        checked = 0
+        for masks, strings in ((self.name_masks, self.names),
+                               (self.path_masks, self.lower)):
+            for i in self.candidates(masks, chars):
+                if i in found:
+                    continue
+                match = regex.search(strings[i])
+                if match is not None:
+                    found[i] = self.score(query, i, match, strings is self.names)
+                    if len(found) >= self.CANDIDATES:
+                        break
+                checked += 1
+                if checked % 64 == 0 and perf_counter() > deadline:
+                    break
+            if len(found) >= self.CANDIDATES or perf_counter() > deadline:
+                break
+        ranked = sorted(found, key=lambda i: (-found[i], i))
+        return [self.paths[i] for i in ranked[:limit]]
+
+    def score(self, query, i, match, in_name):
+        '''
+        Score a match: contiguous and file name matches first, then compact
+        matches and short paths
+        '''
+        name = self.names[i]
+        score = -len(self.lower[i]) - (match.end() - match.start() - len(query)) * 4
+        if in_name:
+            score += 1000
+            position = name.find(query)
+            if position == 0:
+                score += 2000
+            elif position > 0:
+                score += 1500
+        elif query in self.lower[i]:
+            score += 500
+        return score
+
+    def save(self):
+        '''
+        Write the index to the cache directory atomically
+        '''
+        path = cache_path(self.root)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.removed:
+            self.__init__(self.root, self.positions)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump((CACHE_VERSION, self), file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    @staticmethod
+    def load(root):
+        '''
+        Return the saved index of a project, or None
+        '''
+        try:
+            with open(cache_path(root), 'rb') as file:
+                version, index = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError,
+                TypeError, AttributeError):
+            return None
+        if version != CACHE_VERSION or index.root != root:
+            return None
+        return index
+
+
+class IndexBuilder(QThread):
+    '''
+    Load the saved index of a project, then walk the project to build a
+    fresh one and save it. Both are emitted as they become ready.
+    '''
+    built = pyqtSignal(object)
+
+    def __init__(self, root, use_cache=True, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.use_cache = use_cache
+
+    def run(self):
+        '''
+        Emit the saved index, then the fresh one
+        '''
+        if self.use_cache:
+            index = PathIndex.load(self.root)
+            if index is not None:
+                self.built.emit(index)
+        paths = []
+        for path, _ in walk(self.root):
+            if self.isInterruptionRequested():
+                return
+            paths.append(os.path.relpath(path, self.root).replace(os.sep, '/'))
+        index = PathIndex(self.root, paths)
+        # Save before the GUI thread gets to modify the index
+        try:
+            index.save()
+        except OSError:
+            pass
+        if not self.isInterruptionRequested():
+            self.built.emit(index)
+
+
+class IndexSaver(QThread):
+    '''
+    Save an index that is no longer changed by the GUI thread
+    '''
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index = index
+
+    def run(self):
+        '''
+        Write the index to the cache
+        '''
+        try:
+            self.index.save()
+        except OSError:
+            pass
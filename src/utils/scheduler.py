@@ -0,0 +1,98 @@
+'''
+Coalesced UI updates
+'''
+
+import time
+from PyQt5.QtCore import QObject, QTimer
+
+
+class UpdateScheduler(QObject):
+    '''
+    Run registered UI update handlers at most once per event loop turn.
+
+    Signals mark handlers dirty instead of calling them. The dirty handlers
+    run together, in registration order, the next time the event loop is
+    idle, or interval milliseconds later when given a frame interval.
+    A handler marked while the handlers run is run in the same pass.
+    '''
+    # Passes of one flush before the rest is left to the next turn
+    MAX_PASSES = 8
+
+    def __init__(self, interval=0, parent=None):
+        super().__init__(parent)
+        self.handlers = {}
+        self.dirty = {}
+        self.timings = {}
+        self.flushing = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+
+    def register(self, name, handler):
+        '''
+        Add a handler, run whenever name is marked
+        '''
+        self.handlers[name] = handler
+        self.timings[name] = {'marks': 0, 'runs': 0, 'total': 0.0, 'max': 0.0}
+
+    def mark(self, *names):
+        '''
+        Schedule the handlers of names
+        '''
+        for name in names:
+            self.timings[name]['marks'] += 1
+            self.dirty[name] = True
+        if not self.flushing and not self.timer.isActive():
+            self.timer.start()
+
+    def marker(self, *names):
+        '''
+        Return a slot marking names, whatever the arguments of the signal
+        '''
+        return lambda *args: self.mark(*names)
+
+    def flush(self):
+        '''
+        Run the dirty handlers now
+        '''
+        if self.flushing:
+            return
+        self.timer.stop()
+        self.flushing = True
+        try:
+            for _ in range(self.MAX_PASSES):
+                if not self.dirty:
+                    break
+                for name, handler in self.handlers.items():
+                    if self.dirty.pop(name, False):
+                        self.run(name, handler)
+        finally:
+            self.flushing = False
+        if self.dirty:
+            self.timer.start()
+
+    def run(self, name, handler):
+        '''
+        Run one handler and record how long it took
+        '''
+        start = time.perf_counter()
+        try:
+            handler()
+        finally:
+            elapsed = time.perf_counter() - start
+            timing = self.timings[name]
+            timing['runs'] += 1
+            timing['total'] += elapsed
+            timing['max'] = max(timing['max'], elapsed)
+
+    def stats(self):
+        '''
+        Return the marks, runs, total and longest run time in milliseconds
+        of every handler
+        '''
+        return {name: {'marks': timing['marks'],
+                       'runs': timing['runs'],
+                       'total_ms': round(timing['total'] * 1000, 3),
+                       'max_ms': round(timing['max'] * 1000, 3)}
+                for name, timing in self.timings.items()}
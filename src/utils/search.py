@@ -0,0 +1,209 @@
+'''
+Incremental search index over a QTextDocument
+'''
+
+import re
+from bisect import bisect_left, bisect_right
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+
+ASTRAL = re.compile('[\U00010000-\U0010FFFF]')
+
+
+def compile_pattern(text, regex=False, case=False, word=False):
+    '''
+    Compile the find bar text, raise re.error for an invalid regex
+    '''
+    pattern = text if regex else re.escape(text)
+    if word:
+        pattern = r'\b(?:%s)\b' % pattern
+    flags = re.MULTILINE | (0 if case else re.IGNORECASE)
+    return re.compile(pattern, flags)
+
+
+def document_text(document, start, end):
+    '''
+    Return the text between two document positions with '\n' line breaks
+    '''
+    if start == 0 and end >= document.characterCount() - 1:
+        text = document.toRawText()
+    else:
+        cursor = QTextCursor(document)
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        text = cursor.selectedText()
+    return text.replace('\u2029', '\n')
+
+
+def single_line_matches(pattern, text):
+    '''
+    Yield the non-empty matches of pattern in text that stay on one line
+    '''
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        if start != end and '\n' not in match.group():
+            yield match
+
+
+def to_utf16(text, positions):
+    '''
+    Convert ascending code point positions in text to UTF-16 positions
+    '''
+    astral = [m.start() for m in ASTRAL.finditer(text)] if positions else []
+    if not astral:
+        return positions
+    return [p + bisect_left(astral, p) for p in positions]
+
+
+def find_matches(pattern, text, offset=0):
+    '''
+    Return the (starts, ends) of the non-empty single-line matches of
+    pattern in text, as document positions counted from offset.
+    '''
+    starts = []
+    ends = []
+    for match in single_line_matches(pattern, text):
+        starts.append(match.start())
+        ends.append(match.end())
+    # Qt counts positions in UTF-16 code units
+    starts = to_utf16(text, starts)
+    ends = to_utf16(text, ends)
+    if offset:
+        starts = [s + offset for s in starts]
+        ends = [e + offset for e in ends]
+    return starts, ends
+
+
+def replacements(pattern, text, template, regex=False):
+    '''
+    Return (start, end, replacement) for every match of pattern in text.
+    With regex, template may refer to groups like re.sub does, an invalid
+    reference raises re.error.
+    '''
+    matches = list(single_line_matches(pattern, text))
+    if regex and '\\' in template:
+        # Match.expand parses the template on every call, so expand each
+        # distinct set of groups only once
+        expanded = {}
+        texts = []
+        for match in matches:
+            key = (match.group(), match.groups())
+            if key not in expanded:
+                expanded[key] = match.expand(template)
+            texts.append(expanded[key])
+    else:
+        texts = [template] * len(matches)
+    starts = to_utf16(text, [match.start() for match in matches])
+    ends = to_utf16(text, [match.end() for match in matches])
+    return list(zip(starts, ends, texts))
+
+
+class SearchIndex(QObject):
+    '''
+    Sorted positions of every match of a pattern in a document, updated
+    from contentsChange by rescanning only the edited lines.
+    '''
+    changed = pyqtSignal()
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.pattern = None
+        self.starts = []
+        self.ends = []
+        self.document.contentsChange.connect(self.on_contents_change)
+
+    def set_document(self, document):
+        '''
+        Index the current pattern in another document
+        '''
+        self.document.contentsChange.disconnect(self.on_contents_change)
+        self.document = document
+        self.document.contentsChange.connect(self.on_contents_change)
+        self.set_pattern(self.pattern)
+
+    def set_pattern(self, pattern):
+        '''
+        Index a new pattern, None clears the index
+        '''
+        self.pattern = pattern
+        if pattern is None:
+            self.starts, self.ends = [], []
+        else:
+            end = self.document.characterCount() - 1
+            self.starts, self.ends = find_matches(
+                pattern, document_text(self.document, 0, end))
+        self.changed.emit()
+
+    def on_contents_change(self, position, removed, added):
+        '''
+        Drop the matches on the edited lines, shift the following ones
+        and rescan the edited lines
+        '''
+        if self.pattern is None:
+            return
+        first = self.document.findBlock(position)
+        last = self.document.findBlock(position + added)
+        if not last.isValid():
+            last = self.document.lastBlock()
+        start = first.position()
+        new_end = last.position() + last.length() - 1
+        old_end = new_end - added + removed
+
+        i = bisect_left(self.starts, start)
+        j = bisect_right(self.starts, old_end)
+        starts, ends = find_matches(
+            self.pattern, document_text(self.document, start, new_end), start)
+        delta = added - removed
+        self.starts[i:] = starts + [s + delta for s in self.starts[j:]]
+        self.ends[i:] = ends + [e + delta for e in self.ends[j:]]
+        self.changed.emit()
+
+    def count(self):
+        '''
+        Return the number of matches
+        '''
+        return len(self.starts)
+
+    def match(self, i):
+        '''
+        Return the (start, end) of the i-th match
+        '''
+        return self.starts[i], self.ends[i]
+
+    def index_of(self, start, end):
+        '''
+        Return the index of the match spanning start..end, or None
+        '''
+        i = bisect_left(self.starts, start)
+        if i < len(self.starts) and self.starts[i] == start and self.ends[i] == end:
+            return i
+        return None
+
+    def next_index(self, position):
+        '''
+        Return the index of the first match at or after position,
+        wrapping around, or None when there are no matches
+        '''
+        if not self.starts:
+            return None
+        i = bisect_left(self.starts, position)
+        return i if i < len(self.starts) else 0
+
+    def previous_index(self, position):
+        '''
+        Return the index of the last match starting before position,
+        wrapping around, or None when there are no matches
+        '''
+        if not self.starts:
+            return None
+        i = bisect_left(self.starts, position) - 1
+        return i if i >= 0 else len(self.starts) - 1
+
+    def between(self, start, end):
+        '''
+        Return the (start, end) of the matches starting in start..end
+        '''
+        i = bisect_left(self.starts, start)
+        j = bisect_right(self.starts, end)
+        return list(zip(self.starts[i:j], self.ends[i:j]))
@@ -0,0 +1,212 @@
+'''
+Long-lived shell on a pseudo-terminal
+'''
+
+import errno
+import os
+import signal
+import struct
+import subprocess
+import sys
+from time import monotonic
+from PyQt5.QtCore import QObject, QSocketNotifier, QTimer, pyqtSignal
+
+try:
+    import fcntl
+    import termios
+except ImportError:
+    fcntl = termios = None
+
+READ_SIZE = 65536
+
+# Makes standard input the controlling terminal of the new session, so
+# that the line discipline delivers Ctrl+C and SIGWINCH to its foreground
+# job, then runs the shell. A fresh interpreter does it because code run
+# between fork and exec can deadlock while other threads run.
+CONTROLLING_TERMINAL = ('import fcntl, os, sys, termios; '
+                        'fcntl.ioctl(0, termios.TIOCSCTTY, 0); '
+                        'os.execvp(sys.argv[1], sys.argv[1:])')
+
+
+def supported():
+    '''
+    Return whether this platform has pseudo-terminals
+    '''
+    return termios is not None and hasattr(os, 'openpty')
+
+
+class ShellSession(QObject):
+    '''
+    One shell process attached to the slave side of a pseudo-terminal.
+    The master side is non-blocking and read from the Qt event loop
+    whenever it becomes readable; the bytes read are emitted by output.
+    finished(status) is emitted once the shell has exited, which is
+    polled for after a hang up instead of waited for.
+    '''
+    # Milliseconds between checks that the shell exited after a hang up
+    REAP_INTERVAL = 20
+    # Seconds given to the shell to exit before it is killed
+    KILL_DELAY = 1
+
+    output = pyqtSignal(bytes)
+    finished = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.process = None
+        self.fd = None
+        self.reader = None
+        self.writer = None
+        self.pending = b''
+        self.deadline = None
+        self.reaper = QTimer(self)
+        self.reaper.setInterval(self.REAP_INTERVAL)
+        self.reaper.timeout.connect(self.reap)
+
+    def start(self, directory, rows=24, columns=80, program=None, env=None):
+        '''
+        Start the shell in directory on a terminal of the given size
+        '''
+        master, slave = os.openpty()
+        self.fd = master
+        self.resize(rows, columns)
+        environment = dict(os.environ if env is None else env)
+        environment['TERM'] = environment.get('YSCODE_TERM', 'xterm-256color')
+        program = program or os.environ.get('SHELL') or '/bin/sh'
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, '-I', '-S', '-c', CONTROLLING_TERMINAL, program, '-i'],
+                stdin=slave, stdout=slave, stderr=slave, cwd=directory,
+                env=environment, start_new_session=True, close_fds=True)
+        except OSError:
+            os.close(master)
+            self.fd = None
+            raise
+        finally:
+            os.close(slave)
+        os.set_blocking(master, False)
+        self.reader = QSocketNotifier(master, QSocketNotifier.Read, self)
+        self.reader.activated.connect(self.read_ready)
+        self.writer = QSocketNotifier(master, QSocketNotifier.Write, self)
+        self.writer.setEnabled(False)
+        self.writer.activated.connect(self.write_ready)
+
+    def running(self):
+        '''
+        Return whether the shell is alive
+        '''
+        return self.fd is not None
+
+    def idle(self):
+        '''
+        Return whether the shell itself, not a job, owns the terminal
+        '''
+        try:
+            return self.running() and os.tcgetpgrp(self.fd) == self.process.pid
+        except OSError:
+            return False
+
+    def read_ready(self):
+        '''
+        Emit everything that can be read without blocking
+        '''
+        chunks = []
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            except OSError as error:
+                # EIO once the last process holding the slave has exited
+                if error.errno != errno.EIO:
+                    raise
+                data = b''
+            if not data:
+                if chunks:
+                    self.output.emit(b''.join(chunks))
+                self.close()
+                return
+            chunks.append(data)
+            if len(data) < READ_SIZE:
+                break
+        if chunks:
+            self.output.emit(b''.join(chunks))
+
+    def write(self, data):
+        '''
+        Send bytes to the terminal, the rest is sent once it is writable
+        '''
+        if not self.running():
+            return
+        self.pending += data
+        self.write_ready()
+
+    def write_ready(self):
+        '''
+        Write as much of the pending input as the terminal accepts
+        '''
+        while self.pending:
+            try:
+                written = os.write(self.fd, self.pending)
+            except BlockingIOError:
+                break
+            except OSError:
+                self.pending = b''
+                break
+            self.pending = self.pending[written:]
+        self.writer.setEnabled(bool(self.pending))
+
+    def interrupt(self):
+        '''
+        Send Ctrl+C, which the terminal turns into SIGINT for the
+        foreground job
+        '''
+        self.write(b'\x03')
+
+    def end_of_file(self):
+        '''
+        Send Ctrl+D
+        '''
+        self.write(b'\x04')
+
+    def resize(self, rows, columns):
+        '''
+        Set the size of the terminal, the foreground job gets SIGWINCH
+        '''
+        if self.fd is not None:
+            fcntl.ioctl(self.fd, termios.TIOCSWINSZ,
+                        struct.pack('HHHH', rows, columns, 0, 0))
+
+    def close(self):
+        '''
+        Hang up the terminal, the shell is reaped once it exits
+        '''
+        if self.fd is None:
+            return
+        for notifier in (self.reader, self.writer):
+            notifier.setEnabled(False)
+            notifier.deleteLater()
+        self.reader = self.writer = None
+        os.close(self.fd)
+        self.fd = None
+        self.pending = b''
+        try:
+            os.killpg(self.process.pid, signal.SIGHUP)
+        except OSError:
+            pass
+        self.deadline = monotonic() + self.KILL_DELAY
+        self.reap()
+
+    def reap(self):
+        '''
+        Emit finished if the shell exited, kill it once it had its time
+        '''
+        status = self.process.poll()
+        if status is None:
+            if self.deadline is not None and monotonic() >= self.deadline:
+                self.process.kill()
+                self.deadline = None
+            self.reaper.start()
+            return
+        self.reaper.stop()
+        self.finished.emit(status)
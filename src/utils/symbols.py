@@ -0,0 +1,536 @@
+'''
+Index of the symbols defined in the Python files of a folder
+'''
+
+import ast
+import os
+import re
+import sqlite3
+from concurrent.futures import wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from time import perf_counter
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from utils.grep import executor, reset_executor, WORKERS
+from utils.ignore import ignored, walk
+from utils.utils import DATA_DIR
+
+DATABASE = os.path.join(DATA_DIR, 'symbols.sqlite3')
+SCHEMA_VERSION = 1
+# Bigger files are generated or data, their symbols are not indexed
+MAX_FILE_SIZE = 4 << 20
+# Definitions found by a scan of the lines when a file does not parse
+DEFINITION = re.compile(r'^([ \t]*)(?:async[ \t]+)?(def|class)[ \t]+(\w+)', re.MULTILINE)
+# Statements whose bodies are in the scope around them
+COMPOUND = (ast.If, ast.Try, ast.ExceptHandler, ast.With, ast.AsyncWith,
+            ast.For, ast.AsyncFor, ast.While) + ((ast.TryStar,) if hasattr(ast, 'TryStar') else ())
+
+
+def is_python(path):
+    '''
+    Return whether the symbols of a file are indexed
+    '''
+    return path.endswith(('.py', '.pyw', '.pyi'))
+
+
+def name_column(line, name, start):
+    '''
+    Return the 1-based column of name in a line, from the code point
+    where its statement starts
+    '''
+    column = line.find(name, start)
+    return (column if column >= 0 else start) + 1
+
+
+def extract_symbols(source):
+    '''
+    Return (name, kind, line, column, container) of the classes,
+    functions, methods and module variables defined in source. Lines and
+    columns are 1-based, container is the dotted path of the enclosing
+    classes and functions.
+    '''
+    lines = source.split('\n')
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return scan_symbols(source, lines)
+    symbols = []
+    stack = [(tree, '', False)]
+    while stack:
+        node, container, in_class = stack.pop()
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                line = lines[child.lineno - 1]
+                # col_offset counts UTF-8 bytes
+                start = len(line.encode('utf-8')[:child.col_offset].decode('utf-8', 'replace'))
+                if isinstance(child, ast.ClassDef):
+                    kind = 'class'
+                else:
+                    kind = 'method' if in_class else 'function'
+                symbols.append((child.name, kind, child.lineno,
+                                name_column(line, child.name, start), container))
+                inner = container + '.' + child.name if container else child.name
+                stack.append((child, inner, isinstance(child, ast.ClassDef)))
+            elif not container and isinstance(child, (ast.Assign, ast.AnnAssign)):
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    for name in ast.walk(target):
+                        if isinstance(name, ast.Name):
+                            line = lines[name.lineno - 1]
+                            symbols.append((name.id, 'variable', name.lineno,
+                                            name_column(line, name.id, 0), ''))
+            elif isinstance(child, COMPOUND):
+                # Definitions under a compound statement belong to its scope
+                stack.append((child, container, in_class))
+    symbols.sort(key=lambda symbol: (symbol[2], symbol[3]))
+    return symbols
+
+
+def scan_symbols(source, lines):
+    '''
+    Return the definitions of a source that does not parse, found by
+    their keyword, with the containers guessed from the indentation
+    '''
+    symbols = []
+    scopes = []
+    for match in DEFINITION.finditer(source):
+        indent = len(match.group(1).expandtabs(4))
+        while scopes and scopes[-1][0] >= indent:
+            scopes.pop()
+        keyword, name = match.group(2), match.group(3)
+        line = source.count('\n', 0, match.start()) + 1
+        in_class = bool(scopes) and scopes[-1][2]
+        if keyword == 'class':
+            kind = 'class'
+        else:
+            kind = 'method' if in_class else 'function'
+        container = '.'.join(scope[1] for scope in scopes)
+        symbols.append((name, kind, line,
+                        name_column(lines[line - 1], name, len(match.group(1))), container))
+        scopes.append((indent, name, keyword == 'class'))
+    return symbols
+
+
+def parse_file(path):
+    '''
+    Return (path, mtime, size, symbols) of a file, no symbols when it
+    cannot be read
+    '''
+    try:
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            data = file.read() if stat.st_size <= MAX_FILE_SIZE else b''
+    except OSError:
+        return path, 0, -1, []
+    if b'\0' in data:
+        return path, stat.st_mtime_ns, stat.st_size, []
+    source = data.decode('utf-8', 'replace').replace('\r\n', '\n')
+    return path, stat.st_mtime_ns, stat.st_size, extract_symbols(source)
+
+
+def parse_batch(paths):
+    '''
+    Parse a batch of files in a worker process
+    '''
+    return [parse_file(path) for path in paths]
+
+
+def path_range(root):
+    '''
+    Return the bounds of the paths below root in the order of SQLite
+    '''
+    prefix = os.path.join(root, '')
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class SymbolDatabase:
+    '''
+    SQLite cache of the symbols of every indexed file, one row of the
+    files table per file with the mtime and size it was parsed at.
+    Each thread opens its own connection; the write-ahead log lets the
+    GUI thread query while the indexer writes.
+    '''
+
+    def __init__(self, path=DATABASE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=10)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            with self.connection:
+                self.connection.execute('DROP TABLE IF EXISTS files')
+                self.connection.execute('DROP TABLE IF EXISTS symbols')
+                self.connection.execute(
+                    'CREATE TABLE files (path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER)')
+                self.connection.execute(
+                    'CREATE TABLE symbols (path TEXT, name TEXT, lower TEXT, kind TEXT,'
+                    ' line INTEGER, column INTEGER, container TEXT)')
+                self.connection.execute('CREATE INDEX symbols_lower ON symbols (lower)')
+                self.connection.execute('CREATE INDEX symbols_path ON symbols (path)')
+                self.connection.execute('PRAGMA user_version=%d' % SCHEMA_VERSION)
+
+    def close(self):
+        '''
+        Close the connection
+        '''
+        self.connection.close()
+
+    def stamps(self, root):
+        '''
+        Return {path: (mtime, size)} of the indexed files below root
+        '''
+        rows = self.connection.execute(
+            'SELECT path, mtime, size FROM files WHERE path >= ? AND path < ?',
+            path_range(root))
+        return {path: (mtime, size) for path, mtime, size in rows}
+
+    def store(self, parsed):
+        '''
+        Replace the symbols of parsed files, given as parse_file results
+        '''
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM symbols WHERE path = ?', ((path,) for path, *_ in parsed))
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO files VALUES (?, ?, ?)',
+                ((path, mtime, size) for path, mtime, size, _ in parsed))
+            self.connection.executemany(
+                'INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?)',
+                ((path, name, name.lower(), kind, line, column, container)
+                 for path, _, _, symbols in parsed
+                 for name, kind, line, column, container in symbols))
+
+    def remove(self, paths):
+        '''
+        Forget files, and every file below a removed folder
+        '''
+        with self.connection:
+            for path in paths:
+                low, high = path_range(path)
+                for table in ('files', 'symbols'):
+                    self.connection.execute(
+                        'DELETE FROM %s WHERE path = ? OR (path >= ? AND path < ?)' % table,
+                        (path, low, high))
+
+    def find(self, root, query, limit=100, budget=0.05):
+        '''
+        Return up to limit (name, kind, path, line, column, container) of
+        the symbols below root whose name starts with query, shortest
+        names first, then of those containing it. The scan for the latter
+        stops after budget seconds.
+        '''
+        low, high = path_range(root)
+        query = query.lower()
+        # The unary + keeps SQLite from using the index of the paths, the
+        # names narrow the rows down much more
+        select = ('SELECT name, kind, path, line, column, container FROM symbols'
+                  ' WHERE +path >= ? AND +path < ? AND ')
+        # A range of the indexed lower case names
+        found = self.connection.execute(
+            select + 'lower >= ? AND lower < ? ORDER BY length(name), lower LIMIT ?',
+            (low, high, query, query + '\uffff', limit)).fetchall()
+        if len(found) >= limit or not query:
+            return found
+        deadline = perf_counter() + budget
+        self.connection.set_progress_handler(lambda: perf_counter() > deadline, 10000)
+        try:
+            for row in self.connection.execute(
+                    select + 'instr(lower, ?) > 1 LIMIT ?',
+                    (low, high, query, limit - len(found))):
+                found.append(row)
+        except sqlite3.OperationalError:
+            # Interrupted by the budget, keep what was found
+            pass
+        finally:
+            self.connection.set_progress_handler(None, 0)
+        return found
+
+    def definitions(self, root, name):
+        '''
+        Return (name, kind, path, line, column, container) of the symbols
+        called name below root
+        '''
+        low, high = path_range(root)
+        return self.connection.execute(
+            'SELECT name, kind, path, line, column, container FROM symbols'
+            ' WHERE lower = ? AND name = ? AND +path >= ? AND +path < ?'
+            ' ORDER BY kind = \'variable\', path, line',
+            (name.lower(), name, low, high)).fetchall()
+
+    def count(self, root):
+        '''
+        Return the number of files and symbols indexed below root
+        '''
+        low, high = path_range(root)
+        files = self.connection.execute(
+            'SELECT count(*) FROM files WHERE path >= ? AND path < ?', (low, high)).fetchone()[0]
+        symbols = self.connection.execute(
+            'SELECT count(*) FROM symbols WHERE path >= ? AND path < ?', (low, high)).fetchone()[0]
+        return files, symbols
+
+
+class SymbolIndexer(QThread):
+    '''
+    Bring the database up to date with the Python files below root, or
+    only with the given files and the files below the given folders.
+    Files whose mtime and size match the database are skipped, the others
+    are parsed in the process pool and stored batch by batch; files that
+    are gone are forgotten.
+    '''
+    BATCH_FILES = 32
+
+    def __init__(self, root, paths=None, database=DATABASE, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.paths = [root] if paths is None else paths
+        self.database = database
+        self.files = 0
+        self.parsed = 0
+        self.removed = 0
+        self.error = None
+        self.elapsed = 0
+        self.pending = set()
+
+    def run(self):
+        '''
+        Walk the folders and stat the files, then parse the stale ones
+        '''
+        start = perf_counter()
+        try:
+            database = SymbolDatabase(self.database)
+        except (OSError, sqlite3.Error) as e:
+            self.error = str(e)
+            return
+        try:
+            self.update(database)
+        except sqlite3.Error as e:
+            self.error = str(e)
+        finally:
+            for future in self.pending:
+                future.cancel()
+            self.pending = set()
+            database.close()
+        self.elapsed = perf_counter() - start
+
+    def candidates(self, stamps, gone):
+        '''
+        Yield the Python files to check, adding the stored ones that are
+        gone to gone
+        '''
+        for path in self.paths:
+            if os.path.isdir(path):
+                low, high = path_range(path)
+                below = set(known for known in stamps if low <= known < high)
+                # The .gitignore files above the folder apply as in a full walk
+                for file, _ in walk(path, base=self.root):
+                    if is_python(file):
+                        below.discard(file)
+                        yield file
+                gone.update(below)
+            elif os.path.exists(path):
+                if is_python(path) and not ignored(path, self.root):
+                    yield path
+            else:
+                # A removed file or folder
+                gone.add(path)
+
+    def update(self, database):
+        '''
+        Parse the files that changed since they were stored, forget the
+        ones that are gone
+        '''
+        stamps = database.stamps(self.root)
+        gone = set()
+        stale = []
+        for path in self.candidates(stamps, gone):
+            if self.isInterruptionRequested():
+                return
+            try:
+                stat = os.stat(path)
+            except OSError:
+                gone.add(path)
+                continue
+            self.files += 1
+            if stamps.get(path) != (stat.st_mtime_ns, stat.st_size):
+                stale.append(path)
+        if gone:
+            database.remove(gone)
+            self.removed = len(gone)
+
+        pool = executor()
+        for first in range(0, len(stale), self.BATCH_FILES):
+            if self.isInterruptionRequested():
+                return
+            try:
+                self.pending.add(pool.submit(parse_batch, stale[first:first + self.BATCH_FILES]))
+            except (BrokenProcessPool, RuntimeError) as e:
+                self.error = str(e)
+                reset_executor()
+                return
+            # Do not run far ahead of the workers
+            if len(self.pending) >= WORKERS * 4:
+                self.collect(database, None)
+        while self.pending and not self.isInterruptionRequested():
+            self.collect(database, 0.05)
+
+    def collect(self, database, timeout):
+        '''
+        Store the finished batches, waiting up to timeout seconds (forever
+        for None) for one to finish
+        '''
+        done, self.pending = wait(self.pending, timeout, FIRST_COMPLETED)
+        for future in done:
+            try:
+                parsed = future.result()
+            except BrokenProcessPool as e:
+                self.error = str(e)
+                reset_executor()
+                self.requestInterruption()
+                return
+            database.store(parsed)
+            self.parsed += len(parsed)
+
+
+class SymbolIndex(QObject):
+    '''
+    Symbols of the Python files of the opened folder. Opening a folder
+    checks every file against the database and parses only the changed
+    ones; afterwards the folders reported changed by the file system
+    watcher and the saved files are checked. One indexer runs at a time,
+    the paths to check meanwhile are queued.
+    '''
+    updated = pyqtSignal()
+
+    def __init__(self, database=DATABASE, parent=None):
+        super().__init__(parent)
+        self.path = database
+        self.database = None
+        self.root = None
+        self.indexer = None
+        # None when nothing is queued, the root for everything
+        self.queued = None
+        self.error = None
+        self.last_update = {}
+
+    def set_root(self, root):
+        '''
+        Index another folder, None when no folder is open
+        '''
+        self.cancel()
+        self.root = os.path.abspath(root) if root is not None else None
+        self.queued = None
+        if self.root is None:
+            if self.database is not None:
+                self.database.close()
+                self.database = None
+            return
+        if self.database is None:
+            try:
+                self.database = SymbolDatabase(self.path)
+            except (OSError, sqlite3.Error) as e:
+                self.error = str(e)
+                return
+        self.update()
+
+    def update(self, paths=None):
+        '''
+        Check the given files and folders, all of the folder for None
+        '''
+        if self.root is None or self.database is None:
+            return
+        if paths is not None:
+            paths = [os.path.abspath(path) for path in paths]
+            prefix = os.path.join(self.root, '')
+            paths = [path for path in paths if path == self.root or path.startswith(prefix)]
+            if not paths:
+                return
+        if self.indexer is not None:
+            if paths is None or self.queued == [self.root]:
+                self.queued = [self.root]
+            else:
+                self.queued = sorted(set(self.queued or ()) | set(paths))
+            return
+        self.indexer = SymbolIndexer(self.root, paths, self.path, self)
+        self.indexer.finished.connect(self.indexer_finished)
+        self.indexer.start()
+
+    def indexer_finished(self):
+        '''
+        Report the finished indexer and start the queued one
+        '''
+        if self.sender() is not self.indexer:
+            return
+        indexer = self.indexer
+        self.indexer = None
+        self.error = indexer.error
+        self.last_update = {'files_checked': indexer.files, 'files_parsed': indexer.parsed,
+                            'files_removed': indexer.removed,
+                            'elapsed_ms': round(indexer.elapsed * 1000, 1)}
+        self.updated.emit()
+        queued, self.queued = self.queued, None
+        if queued is not None:
+            self.update(None if queued == [self.root] else queued)
+
+    def cancel(self):
+        '''
+        Stop the running indexer
+        '''
+        if self.indexer is not None:
+            self.indexer.requestInterruption()
+            self.indexer.wait()
+            self.indexer = None
+
+    def directory_changed(self, path):
+        '''
+        Check the files below a folder the watcher reported changed
+        '''
+        self.update([path])
+
+    def file_saved(self, path):
+        '''
+        Check a file written by the editor
+        '''
+        self.update([path])
+
+    def is_indexing(self):
+        '''
+        Return whether an indexer is running
+        '''
+        return self.indexer is not None
+
+    def find(self, query, limit=100):
+        '''
+        Return the symbols of the folder matching query, see
+        SymbolDatabase.find
+        '''
+        if self.root is None or self.database is None:
+            return []
+        try:
+            return self.database.find(self.root, query, limit)
+        except sqlite3.Error:
+            return []
+
+    def definitions(self, name):
+        '''
+        Return the symbols of the folder called name
+        '''
+        if self.root is None or self.database is None:
+            return []
+        try:
+            return self.database.definitions(self.root, name)
+        except sqlite3.Error:
+            return []
+
+    def stats(self):
+        '''
+        Return the size of the index of the folder and the outcome of the
+        last update
+        '''
+        if self.root is None or self.database is None:
+            return {'error': self.error} if self.error else {}
+        try:
+            files, symbols = self.database.count(self.root)
+        except sqlite3.Error as e:
+            return {'error': str(e)}
+        return dict(self.last_update, files=files, symbols=symbols,
+                    indexing=self.is_indexing())
@@ -2,6 +2,7 @@
 Utility variables and functions.
 '''
 
+import os
 import sys
 from PyQt5.QtGui import QColor, QTextCharFormat, QFont
 
@@ -15,6 +16,9 @@ welcome_text = \
     r'   __/ |                          ' + '\n' + \
     r'  |___/                           ' + '\n'
 
+# Per-user caches of the editor
+DATA_DIR = os.path.join(os.path.expanduser('~'), '.yscode')
+
 
 def log(msg):
     '''
@@ -25,6 +29,29 @@ def log(msg):
     print('File \"%s\", line %d, Msg:' % (fn, ln), msg)
 
 
+def utf16_index(text, index):
+    '''
+    Convert a code point index in text to a Qt (UTF-16) index.
+    '''
+    if text.isascii():
+        return index
+    return index + sum(1 for char in text[:index] if char > '\uffff')
+
+
+def utf16_spans(text, spans):
+    '''
+    Convert (start, length, ...) spans of text to Qt (UTF-16) indices.
+    '''
+    if text.isascii() or max(text) <= '\uffff':
+        return spans
+    converted = []
+    for start, length, *rest in spans:
+        begin = utf16_index(text, start)
+        converted.append(
+            (begin, utf16_index(text, start + length) - begin, *rest))
+    return converted
+
+
 def format(color, style=''):
     '''
     Return a QTextCharFormat with the given attributes.
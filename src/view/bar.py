@@ -3,18 +3,70 @@ All kinds of bars in the main window.
 '''
 
 from PyQt5.QtWidgets import QWidget, QToolBar, QAction
-from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QIcon, QStaticText
+from PyQt5.QtCore import Qt, QSize
 
 
 class LineNumberBar(QWidget):
     '''
     Line number bar class
+
+    Numbers are drawn from cached QStaticTexts, which keep their glyph
+    layout. Moving the cursor repaints only the lines losing and gaining
+    the current line colour; scrolling moves the painted pixels and only
+    the uncovered lines are painted.
     '''
+    CACHE_SIZE = 4096
 
     def __init__(self, editor):
         super().__init__(editor)
         self.editor = editor
+        self.current = 0
+        self.numbers = {}
+        self.cached_font = None
+        # Every paint fills its rectangle, which lets scroll() move pixels
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+    def number(self, text, font):
+        '''
+        Return the QStaticText of a line number
+        '''
+        if font != self.cached_font:
+            self.numbers.clear()
+            self.cached_font = font
+        static = self.numbers.get(text)
+        if static is None:
+            if len(self.numbers) >= self.CACHE_SIZE:
+                self.numbers.clear()
+            static = self.numbers[text] = QStaticText(text)
+            static.setTextFormat(Qt.PlainText)
+            static.prepare(font=font)
+        return static
+
+    def set_current(self, block_number):
+        '''
+        Repaint the numbers of the previous and the new current block
+        '''
+        if block_number == self.current:
+            return
+        previous = self.current
+        self.current = block_number
+        self.update_block(previous)
+        self.update_block(block_number)
+
+    def update_block(self, block_number):
+        '''
+        Repaint the number of a block if it is visible
+        '''
+        editor = self.editor
+        block = editor.document().findBlockByNumber(block_number)
+        if not block.isValid() or not block.isVisible():
+            return
+        top = editor.blockBoundingGeometry(block).translated(editor.contentOffset()).top()
+        if top > self.height():
+            return
+        height = editor.blockBoundingRect(block).height()
+        self.update(0, int(top), self.width(), int(height) + 1)
 
     def sizeHint(self):
         '''
@@ -28,6 +80,12 @@ class LineNumberBar(QWidget):
         '''
         self.editor.lineNumberBarPaintEvent(event)
 
+    def mousePressEvent(self, event):
+        '''
+        Fold or unfold on a click in the marker column
+        '''
+        self.editor.lineNumberBarMousePressEvent(event)
+
 
 class ToolBar(QToolBar):
     '''
@@ -45,7 +103,7 @@ class ToolBar(QToolBar):
         # file
         button_new = QAction(QIcon("./assets/icon/new"), "New File", self)
         button_new.setStatusTip("New File")
-        button_new.triggered.connect(wd.editor.keyPressEvent)
+        button_new.triggered.connect(wd.new_file)
         self.addAction(button_new)
 
         button_open_file = QAction(
@@ -138,6 +196,9 @@ class ToolBar(QToolBar):
 
         self.addAction(button_find)
         self.addWidget(wd.find_bar)
+        self.addAction(wd.case_action)
+        self.addAction(wd.word_action)
+        self.addAction(wd.regex_action)
         self.addAction(button_before)
         self.addAction(button_next)
         self.addWidget(wd.replace_bar)
@@ -0,0 +1,270 @@
+'''
+Completion popup of the editor
+'''
+
+from PyQt5.QtWidgets import QListWidget, QListWidgetItem, QAbstractItemView
+from PyQt5.QtCore import Qt, QObject
+from PyQt5.QtGui import QTextCursor
+from utils.completion import CompletionClient
+
+
+def is_word(char):
+    '''
+    Return whether a character can be part of an identifier
+    '''
+    return char == '_' or char.isalnum()
+
+
+def code_point_index(text, index):
+    '''
+    Convert a Qt (UTF-16) index in text to a code point index
+    '''
+    if text.isascii():
+        return index
+    return len(text.encode('utf-16-le')[:index * 2].decode('utf-16-le', 'ignore'))
+
+
+class Completer(QObject):
+    '''
+    Completion popup class
+
+    The word before the cursor is completed from the start of the word,
+    its prefix scope, so that the list can be filtered here as the word
+    grows. The version is bumped by every change outside the word being
+    completed and by a switch of document, which makes (version, line,
+    start of the word) a key of the completion lists the client caches.
+    '''
+    MAX_ITEMS = 200
+    VISIBLE_ROWS = 10
+
+    def __init__(self, editor, client=None):
+        super().__init__(editor)
+        self.editor = editor
+        self.client = client if client is not None else CompletionClient(self)
+        self.root = None
+        self.document = None
+        self.version = 0
+        # (version, block number, start of the word) being completed
+        self.key = None
+        self.dismissed = None
+        self.start = 0
+        self.prefix = ''
+        self.completions = None
+        self.popup = QListWidget(editor.viewport())
+        self.initUI()
+
+        self.client.completed.connect(self.show_completions)
+        self.popup.itemClicked.connect(self.accept)
+        self.editor.cursorPositionChanged.connect(self.cursor_moved)
+        self.set_document(editor.document())
+
+    def initUI(self):
+        '''
+        Initialize UI
+        '''
+        self.popup.hide()
+        self.popup.setFocusPolicy(Qt.NoFocus)
+        self.popup.setUniformItemSizes(True)
+        self.popup.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.popup.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.popup.setStyleSheet("background-color: rgb(34, 37, 42);\
+            color: rgb(171, 177, 189);\
+            border: 1px solid rgb(63, 68, 81);")
+
+    def set_document(self, document):
+        '''
+        Complete in another document
+        '''
+        if self.document is not None:
+            self.document.contentsChange.disconnect(self.on_contents_change)
+        self.document = document
+        document.contentsChange.connect(self.on_contents_change)
+        self.version += 1
+        self.key = None
+        self.hide()
+
+    def close(self):
+        '''
+        Stop the worker process
+        '''
+        self.client.close()
+
+    def on_contents_change(self, position, removed, added):
+        '''
+        Bump the version unless only the word being completed changed
+        '''
+        if self.key is not None:
+            block = self.document.findBlock(position)
+            text = block.text()
+            begin = code_point_index(text, position - block.position())
+            end = code_point_index(text, position + added - block.position())
+            if (block.blockNumber() == self.key[1] and begin >= self.start
+                    and all(is_word(char) for char in text[self.start:end])):
+                return
+        self.version += 1
+        self.key = None
+
+    def word(self):
+        '''
+        Return the block of the cursor, the start of the word before the
+        cursor and the word up to the cursor, columns in code points
+        '''
+        cursor = self.editor.textCursor()
+        block = cursor.block()
+        text = block.text()
+        column = code_point_index(text, cursor.positionInBlock())
+        start = column
+        while start > 0 and is_word(text[start - 1]):
+            start -= 1
+        return block, start, text[start:column]
+
+    def typed(self, text):
+        '''
+        Complete after a typed identifier character or dot, hide otherwise
+        '''
+        if text and (is_word(text[-1]) or text[-1] == '.'):
+            self.complete(explicit=False)
+        elif text:
+            self.hide()
+
+    def complete(self, explicit=True):
+        '''
+        Show the completions of the word before the cursor, from the cache
+        or once the worker replies. Typing only completes after a dot or
+        in a word, and not in a word dismissed with Escape.
+        '''
+        editor = self.editor
+        if editor.buffer is not None or editor.isReadOnly() or editor.textCursor().hasSelection():
+            self.hide()
+            return
+        block, start, prefix = self.word()
+        text = block.text()
+        after_dot = start > 0 and text[start - 1] == '.'
+        if not explicit and (prefix[:1].isdigit() or not (prefix or after_dot)):
+            self.hide()
+            return
+        key = (self.version, block.blockNumber(), start)
+        if explicit:
+            self.dismissed = None
+        elif key == self.dismissed:
+            return
+        self.prefix = prefix
+        self.start = start
+        if key == self.key:
+            if self.completions is not None:
+                self.filter()
+            return
+        self.key = key
+        self.completions = self.client.cached(key)
+        if self.completions is not None:
+            self.filter()
+            return
+        self.client.request(key, self.root, editor.path, editor.toPlainText(),
+                            block.blockNumber() + 1, start)
+
+    def show_completions(self, key, completions):
+        '''
+        Show the completions the worker sent for the current word
+        '''
+        if key != self.key:
+            return
+        self.completions = completions
+        self.filter()
+
+    def filter(self):
+        '''
+        List the completions starting with the word, ignoring case
+        '''
+        prefix = self.prefix.lower()
+        names = [(name, kind) for name, kind in self.completions
+                 if name.lower().startswith(prefix)]
+        if not names or (len(names) == 1 and names[0][0] == self.prefix):
+            self.hide()
+            return
+        names = names[:self.MAX_ITEMS]
+        popup = self.popup
+        popup.setUpdatesEnabled(False)
+        popup.clear()
+        for name, kind in names:
+            item = QListWidgetItem(name)
+            item.setToolTip(kind)
+            popup.addItem(item)
+        popup.setCurrentRow(0)
+        popup.setUpdatesEnabled(True)
+        self.place(len(names), max(len(name) for name, _ in names))
+        popup.show()
+        popup.raise_()
+
+    def place(self, rows, longest):
+        '''
+        Move the popup under the start of the word, sized to its items
+        '''
+        editor = self.editor
+        cursor = QTextCursor(editor.textCursor().block())
+        cursor.setPosition(cursor.block().position()
+                           + len(cursor.block().text()[:self.start].encode('utf-16-le')) // 2)
+        rect = editor.cursorRect(cursor)
+        metrics = editor.fontMetrics()
+        width = metrics.width('m') * (min(longest, 48) + 4)
+        height = self.popup.sizeHintForRow(0) * min(rows, self.VISIBLE_ROWS) + 4
+        viewport = editor.viewport().rect()
+        top = rect.bottom() + 1
+        if top + height > viewport.bottom() and rect.top() - height >= 0:
+            top = rect.top() - height
+        left = max(0, min(rect.left(), viewport.right() - width))
+        self.popup.setGeometry(left, top, width, height)
+
+    def hide(self):
+        '''
+        Hide the popup
+        '''
+        self.popup.hide()
+
+    def cursor_moved(self):
+        '''
+        Hide the popup when the cursor leaves the word being completed
+        '''
+        if not self.popup.isVisible():
+            return
+        block, start, _ = self.word()
+        if self.key is None or block.blockNumber() != self.key[1] or start != self.start:
+            self.hide()
+
+    def handle_key(self, event):
+        '''
+        Move through the popup and accept or dismiss it, return whether
+        the key was used
+        '''
+        if not self.popup.isVisible():
+            return False
+        key = event.key()
+        step = {Qt.Key_Up: -1, Qt.Key_Down: 1,
+                Qt.Key_PageUp: -self.VISIBLE_ROWS, Qt.Key_PageDown: self.VISIBLE_ROWS}.get(key)
+        if step is not None:
+            row = max(0, min(self.popup.count() - 1, self.popup.currentRow() + step))
+            self.popup.setCurrentRow(row)
+            return True
+        if key in (Qt.Key_Return, Qt.Key_Enter, Qt.Key_Tab):
+            self.accept(self.popup.currentItem())
+            return True
+        if key == Qt.Key_Escape:
+            self.dismissed = self.key
+            self.hide()
+            return True
+        return False
+
+    def accept(self, item):
+        '''
+        Replace the word before the cursor by a completion
+        '''
+        self.hide()
+        if item is None:
+            return
+        block, start, prefix = self.word()
+        cursor = self.editor.textCursor()
+        cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor,
+                            len(prefix.encode('utf-16-le')) // 2)
+        cursor.insertText(item.text())
+        self.editor.setTextCursor(cursor)
+        # The completed word does not pop up again
+        self.dismissed = self.key
@@ -2,29 +2,90 @@
 Editor class
 '''
 
-from PyQt5.QtWidgets import QPlainTextEdit, QTextEdit
-from PyQt5.QtCore import Qt, QRect
-from PyQt5.QtGui import QColor, QTextFormat, QPainter, QTextBlockFormat
+import codecs
+from PyQt5.QtWidgets import QPlainTextEdit, QTextEdit, QScrollBar
+from PyQt5.QtCore import Qt, QRect, QPoint, pyqtSignal
+from PyQt5.QtGui import QColor, QTextFormat, QPainter, QTextBlockFormat, QTextCursor
 from view.bar import LineNumberBar
+from utils.fileio import FileLoader, decode_lines, detect_encoding, encode_lines, line_codec
+from utils.piecetable import PieceTable
+from utils.profiler import PROFILER
+from utils.scheduler import UpdateScheduler
+from utils.search import to_utf16
 from utils.utils import log, welcome_text
 
+# Files at least this big are opened in large-file mode
+LARGE_FILE_SIZE = 32 * 1024 * 1024
+# Colour of the fold markers in the line number bar
+MARKER_COLOR = QColor(75, 81, 97)
+
+
+def shared_length(a, b):
+    '''
+    Return the length of the common prefix of two byte strings
+    '''
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
 
 class Editor(QPlainTextEdit):
     '''
     Editor class
+
+    In large-file mode the text lives in a piece table over the memory-mapped
+    file and only a window of lines starting at first_line is in the widget.
+    The window is decoded so that it encodes back to the same bytes, with
+    its line endings and undecodable bytes, and is read-only when it does
+    not.
+    Cursor-driven repaints go through the update scheduler shared with the
+    main window, so they run once per event loop turn.
     '''
+    WINDOW_LINES = 2000
+    WINDOW_MARGIN = 200
+
+    # Emitted when the welcome text gives way to a document
+    welcomeClosed = pyqtSignal()
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, updates=None):
         super().__init__(parent)
+        self.updates = updates if updates is not None else UpdateScheduler(parent=self)
         self.display_welcome = False
         self.path = None
+        self.encoding = 'utf-8'
         self.blockFormat = QTextBlockFormat()
+        self.buffer = None
+        self.first_line = 0
+        self.window_length = 0
+        self.window_newline = False
+        self.window_edited = False
+        # Bytes before the text of the window, line ending of its lines
+        self.window_prefix = b''
+        self.window_eol = b'\n'
+        self.window_locked = False
+        self.read_only = False
+        self.materializing = False
+        self.searchSelections = []
+        self.folds = None
+        self.completer = None
         self.initUI()
 
         self.lineNumberBar = LineNumberBar(self)
+        self.fileScrollBar = QScrollBar(Qt.Vertical, self)
+        self.fileScrollBar.hide()
         self.blockCountChanged.connect(self.updateLineNumberBarWidth)
         self.updateRequest.connect(self.updateLineNumberBar)
-        self.cursorPositionChanged.connect(self.highlightCurrentLine)
+        self.updates.register('current_line', self.highlightCurrentLine)
+        self.cursorPositionChanged.connect(self.updates.marker('current_line'))
+        self.cursorPositionChanged.connect(self.revealCursor)
+        self.document().contentsChanged.connect(self.markWindowEdited)
+        self.fileScrollBar.valueChanged.connect(self.scrollToLine)
+        self.verticalScrollBar().valueChanged.connect(self.syncFileScrollBar)
 
         self.welcome()
 
@@ -44,13 +105,39 @@ class Editor(QPlainTextEdit):
         self.display_welcome = True
         self.setReadOnly(True)
 
+    def closeWelcome(self):
+        '''
+        Mark the welcome text as gone, the caller replaces it
+        '''
+        if self.display_welcome:
+            self.display_welcome = False
+            self.welcomeClosed.emit()
+
+    def setReadOnly(self, read_only):
+        '''
+        Make the editor read-only, always while a window that cannot be
+        written back is shown
+        '''
+        self.read_only = read_only
+        super().setReadOnly(read_only or self.window_locked)
+
+    def lockWindow(self, locked):
+        '''
+        Refuse or allow edits to the window
+        '''
+        self.window_locked = locked
+        super().setReadOnly(self.read_only or locked)
+
     def lineNumberBarWidth(self):
         '''
         Set line number bar width
         '''
         digits = 1
         char_width = self.fontMetrics().width('9')
-        max_value = max(1, self.blockCount())
+        if self.buffer:
+            max_value = self.buffer.line_count()
+        else:
+            max_value = max(1, self.blockCount())
         while max_value >= 10:
             max_value /= 10
             digits += 1
@@ -61,7 +148,8 @@ class Editor(QPlainTextEdit):
         '''
         Update line number bar width
         '''
-        self.setViewportMargins(self.lineNumberBarWidth(), 0, 0, 0)
+        right = self.fileScrollBar.sizeHint().width() if self.buffer else 0
+        self.setViewportMargins(self.lineNumberBarWidth(), 0, right, 0)
 
     def updateLineNumberBar(self, rect, dy):
         '''
@@ -83,53 +171,422 @@ class Editor(QPlainTextEdit):
         cr = self.contentsRect()
         self.lineNumberBar.setGeometry(
             QRect(cr.left(), cr.top(), self.lineNumberBarWidth(), cr.height()))
+        width = self.fileScrollBar.sizeHint().width()
+        self.fileScrollBar.setGeometry(
+            QRect(cr.right() - width + 1, cr.top(), width, cr.height()))
+
+    @PROFILER.timed('editor.paint', histogram='frame')
+    def paintEvent(self, event):
+        '''
+        Paint the text, timed as the frame time of the editor
+        '''
+        super().paintEvent(event)
 
+    @PROFILER.timed('gutter.paint')
     def lineNumberBarPaintEvent(self, event):
         '''
-        Paint line number bar with line numbers
+        Paint line number bar with line numbers, only the blocks in the
+        damaged rectangle
         '''
-        painter = QPainter(self.lineNumberBar)
-        painter.fillRect(event.rect(), QColor(41, 44, 51))
+        bar = self.lineNumberBar
+        painter = QPainter(bar)
+        rect = event.rect()
+        painter.fillRect(rect, QColor(41, 44, 51))
+        font = self.font()
+        painter.setFont(font)
+        metrics = self.fontMetrics()
+        char_width = metrics.width('9')
+        right = bar.width() - 2 * char_width
+        current = bar.current
+        folds = self.folds if self.buffer is None else None
         block = self.firstVisibleBlock()
         blockNumber = block.blockNumber()
-        char_width = self.fontMetrics().width('9')
         top = self.blockBoundingGeometry(
             block).translated(self.contentOffset()).top()
         bottom = top + self.blockBoundingRect(block).height()
-        height = self.fontMetrics().height()
-
-        while block.isValid() and (top <= event.rect().bottom()):
-            if block.isVisible() and (bottom >= event.rect().top()):
-                number = str(blockNumber + 1)
-                if blockNumber == self.textCursor().blockNumber():
-                    painter.setPen(QColor(172, 178, 190))
-                else:
-                    painter.setPen(QColor(75, 81, 97))
-                painter.setFont(self.font())
-                painter.drawText(0, float(top), float(self.lineNumberBar.width() -
-                                 2*char_width), float(height), Qt.AlignRight, number)
+        pen = None
+
+        while block.isValid() and (top <= rect.bottom()):
+            if block.isVisible() and (bottom >= rect.top()):
+                static = bar.number(str(self.first_line + blockNumber + 1), font)
+                color = (QColor(172, 178, 190) if blockNumber == current
+                         else QColor(75, 81, 97))
+                if color != pen:
+                    painter.setPen(color)
+                    pen = color
+                painter.drawStaticText(int(right - static.size().width()),
+                                       int(top), static)
+                if folds is not None and folds.is_header(blockNumber):
+                    folded = folds.is_folded(blockNumber)
+                    marker = bar.number('\u25b8' if folded else '\u25be', font)
+                    if pen != MARKER_COLOR:
+                        painter.setPen(MARKER_COLOR)
+                        pen = MARKER_COLOR
+                    painter.drawStaticText(int(right + char_width // 2),
+                                           int(top), marker)
 
             block = block.next()
             top = bottom
             bottom = top + self.blockBoundingRect(block).height()
             blockNumber += 1
 
+    def lineNumberBarMousePressEvent(self, event):
+        '''
+        Fold or unfold the region under a line when its marker is clicked
+        '''
+        right = self.lineNumberBar.width() - 2 * self.fontMetrics().width('9')
+        if self.folds is None or self.buffer is not None or event.x() < right:
+            return
+        block = self.cursorForPosition(QPoint(0, event.y())).block()
+        self.toggleFold(block.blockNumber())
+
+    def setCompleter(self, completer):
+        '''
+        Use a completion popup
+        '''
+        self.completer = completer
+
+    def setFoldIndex(self, folds):
+        '''
+        Use a fold index of the document
+        '''
+        self.folds = folds
+
+    def toggleFold(self, line, fold=None):
+        '''
+        Fold or unfold the region under a line, or only one of them when
+        fold is given, return whether anything changed
+        '''
+        if self.folds is None or self.buffer is not None:
+            return False
+        if fold is None:
+            fold = not self.folds.is_folded(line)
+        changed = self.folds.fold(line) if fold else self.folds.unfold(line)
+        if changed:
+            self.foldsChanged()
+        return changed
+
+    def unfoldAll(self):
+        '''
+        Show every folded region
+        '''
+        if self.folds is not None and self.folds.folded:
+            self.folds.unfold_all()
+            self.foldsChanged()
+
+    def revealCursor(self):
+        '''
+        Unfold the regions hiding the cursor
+        '''
+        if self.folds is not None and self.folds.folded:
+            if self.folds.unfold_at(self.textCursor().blockNumber()):
+                self.foldsChanged()
+
+    def foldsChanged(self):
+        '''
+        Repaint the text and the line numbers after folding
+        '''
+        self.viewport().update()
+        self.lineNumberBar.update()
+
     def highlightCurrentLine(self):
         '''
         Highlight current line
         '''
         extraSelections = []
+        cursor = self.textCursor()
         if not self.isReadOnly():
             selection = QTextEdit.ExtraSelection()
             lineColor = QColor(45, 49, 59)
             selection.format.setBackground(lineColor)
             selection.format.setProperty(QTextFormat.FullWidthSelection, True)
-            selection.cursor = self.textCursor()
+            selection.cursor = cursor
             selection.cursor.clearSelection()
             extraSelections.append(selection)
+        self.lineNumberBar.set_current(cursor.blockNumber())
+        self.setExtraSelections(extraSelections + self.searchSelections)
 
-            self.lineNumberBar.update()
-        self.setExtraSelections(extraSelections)
+    def visibleRange(self):
+        '''
+        Return the document positions where the viewport starts and ends
+        '''
+        block = self.firstVisibleBlock()
+        start = block.position()
+        offset = self.contentOffset()
+        height = self.viewport().height()
+        while block.isValid():
+            if self.blockBoundingGeometry(block).translated(offset).bottom() >= height:
+                break
+            last = block
+            block = block.next()
+        else:
+            block = last
+        return start, block.position() + block.length() - 1
+
+    def setSearchMatches(self, matches):
+        '''
+        Highlight search matches given as (start, end) positions
+        '''
+        self.searchSelections = []
+        matchColor = QColor(92, 84, 48)
+        for start, end in matches:
+            selection = QTextEdit.ExtraSelection()
+            selection.format.setBackground(matchColor)
+            selection.cursor = QTextCursor(self.document())
+            selection.cursor.setPosition(start)
+            selection.cursor.setPosition(end, QTextCursor.KeepAnchor)
+            self.searchSelections.append(selection)
+        self.updates.mark('current_line')
+
+    def openLargeFile(self, path):
+        '''
+        Open a file in large-file mode
+        '''
+        self.closeLargeFile()
+        self.buffer = PieceTable(path)
+        self.encoding = detect_encoding(self.buffer.read(0, FileLoader.HEAD))
+        self.window_edited = False
+        self.closeWelcome()
+        self.setReadOnly(False)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.fileScrollBar.setRange(0, self.buffer.line_count() - 1)
+        self.fileScrollBar.setPageStep(self.visibleLines())
+        self.fileScrollBar.show()
+        self.materialize(0)
+        self.updateLineNumberBarWidth(0)
+
+    def switchDocument(self, document, buffer=None, first_line=0):
+        '''
+        Show another document, in large-file mode a window of the piece
+        table buffer starting at first_line
+        '''
+        self.commitWindow()
+        self.document().contentsChanged.disconnect(self.markWindowEdited)
+        self.searchSelections = []
+        self.setExtraSelections([])
+        if self.folds is not None:
+            self.folds.set_document(document)
+        if self.completer is not None:
+            self.completer.set_document(document)
+        self.setDocument(document)
+        document.contentsChanged.connect(self.markWindowEdited)
+        self.closeWelcome()
+        self.buffer = buffer
+        self.first_line = 0
+        self.window_edited = False
+        self.lockWindow(False)
+        if buffer is None:
+            self.fileScrollBar.hide()
+            self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        else:
+            self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+            self.fileScrollBar.setRange(0, buffer.line_count() - 1)
+            self.fileScrollBar.setPageStep(self.visibleLines())
+            self.fileScrollBar.show()
+            self.materialize(first_line)
+        self.updateLineNumberBarWidth(0)
+        self.lineNumberBar.update()
+
+    def closeLargeFile(self):
+        '''
+        Leave large-file mode and unmap the file
+        '''
+        if self.buffer is None:
+            return
+        self.buffer.close()
+        self.buffer = None
+        self.first_line = 0
+        self.lockWindow(False)
+        self.fileScrollBar.hide()
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.updateLineNumberBarWidth(0)
+
+    def remapLargeFile(self, path):
+        '''
+        Map the file the piece table was just saved to
+        '''
+        self.commitWindow()
+        self.buffer.close()
+        self.buffer = PieceTable(path)
+        self.materialize(self.first_line)
+
+    def visibleLines(self):
+        '''
+        Return the number of lines that fit in the viewport
+        '''
+        return max(1, self.viewport().height() // self.fontMetrics().height())
+
+    def markWindowEdited(self):
+        '''
+        Remember that the window differs from the piece table
+        '''
+        if not self.materializing:
+            self.window_edited = True
+
+    def windowBytes(self):
+        '''
+        Return the window encoded as in the file
+        '''
+        text = self.document().toRawText().replace('\u2029', '\n')
+        if self.window_newline:
+            text += '\n'
+        return self.window_prefix + encode_lines(
+            text, line_codec(self.encoding), self.window_eol)
+
+    def commitWindow(self):
+        '''
+        Write the bytes of the window that changed back into the piece table
+        '''
+        if self.buffer is None or not self.window_edited or self.window_locked:
+            return
+        self.window_edited = False
+        start = self.buffer.line_offset(self.first_line)
+        old = self.buffer.read(start, start + self.window_length)
+        data = self.windowBytes()
+        head = shared_length(old, data)
+        tail = shared_length(old[head:][::-1], data[head:][::-1])
+        if head == len(old) == len(data):
+            return
+        self.buffer.replace(start + head, start + len(old) - tail,
+                            data[head:len(data) - tail])
+        self.window_length = len(data)
+        self.fileScrollBar.setRange(0, self.buffer.line_count() - 1)
+
+    def materialize(self, first_line):
+        '''
+        Load the window of lines starting at first_line into the widget
+        '''
+        self.commitWindow()
+        total = self.buffer.line_count()
+        first_line = max(0, min(first_line, total - self.WINDOW_LINES))
+        start = self.buffer.line_offset(first_line)
+        end = self.buffer.line_offset(first_line + self.WINDOW_LINES)
+        data = self.buffer.read(start, end)
+        self.window_length = len(data)
+        self.window_newline = data.endswith(b'\n')
+        self.window_prefix = b''
+        if (first_line == 0 and self.encoding == 'utf-8-sig'
+                and data.startswith(codecs.BOM_UTF8)):
+            self.window_prefix = codecs.BOM_UTF8
+        codec = line_codec(self.encoding)
+        if codec is None:
+            # Lines of UTF-16 and UTF-32 are not split at b'\n' bytes
+            text = data.decode(self.encoding, 'replace')
+        else:
+            text, self.window_eol = decode_lines(data[len(self.window_prefix):], codec)
+        if self.window_newline:
+            text = text[:-1]
+
+        self.materializing = True
+        self.first_line = first_line
+        self.setPlainText(text)
+        self.lockWindow(codec is None or self.windowBytes() != data)
+        self.document().setModified(self.buffer.modified)
+        self.materializing = False
+        self.lineNumberBar.update()
+
+    def windowNeedsMove(self, line):
+        '''
+        Return whether a window line is too close to an edge of the window
+        that is not an edge of the file
+        '''
+        count = self.blockCount()
+        more_after = self.first_line + count < self.buffer.line_count()
+        return ((line < self.WINDOW_MARGIN and self.first_line > 0)
+                or (line >= count - self.WINDOW_MARGIN and more_after))
+
+    def scrollToLine(self, line):
+        '''
+        Scroll so that a file line is at the top of the viewport
+        '''
+        if self.buffer is None or self.materializing:
+            return
+        window_line = line - self.first_line
+        if (window_line < 0 or window_line >= self.blockCount()
+                or self.windowNeedsMove(window_line)):
+            self.recentre(line)
+        self.verticalScrollBar().setValue(line - self.first_line)
+
+    def syncFileScrollBar(self, value):
+        '''
+        Follow scrolling inside the window with the file scroll bar
+        '''
+        if self.buffer is None or self.materializing:
+            return
+        self.fileScrollBar.blockSignals(True)
+        self.fileScrollBar.setValue(self.first_line + value)
+        self.fileScrollBar.blockSignals(False)
+        if self.windowNeedsMove(value):
+            self.scrollToLine(self.first_line + value)
+
+    def recentre(self, line):
+        '''
+        Materialize a window centred on a file line,
+        keeping the cursor and the scroll position.
+        '''
+        cursor = self.textCursor()
+        cursor_line = self.first_line + cursor.blockNumber()
+        column = cursor.positionInBlock()
+        top_line = self.first_line + self.verticalScrollBar().value()
+        self.materialize(line - self.WINDOW_LINES // 2)
+
+        block = self.document().findBlockByNumber(cursor_line - self.first_line)
+        if block.isValid():
+            cursor = QTextCursor(block)
+            cursor.setPosition(block.position() + min(column, block.length() - 1))
+            self.setTextCursor(cursor)
+        self.materializing = True
+        self.verticalScrollBar().setValue(top_line - self.first_line)
+        self.materializing = False
+
+    def ensureCursorWindow(self):
+        '''
+        Move the window before the cursor runs into one of its edges
+        '''
+        line = self.textCursor().blockNumber()
+        if self.windowNeedsMove(line):
+            self.recentre(self.first_line + line)
+
+    def goToLine(self, line, column=1):
+        '''
+        Move the cursor to a (1-based) line and column of the file, the
+        column counted in characters
+        '''
+        line = max(1, line) - 1
+        if self.buffer is not None:
+            line = min(line, self.buffer.line_count() - 1)
+            window_line = line - self.first_line
+            if (window_line < 0 or window_line >= self.blockCount()
+                    or self.windowNeedsMove(window_line)):
+                self.recentre(line)
+        block = self.document().findBlockByNumber(line - self.first_line)
+        if not block.isValid():
+            block = self.document().lastBlock()
+        cursor = QTextCursor(block)
+        # Qt counts positions in UTF-16 code units
+        column = to_utf16(block.text(), [max(1, column) - 1])[0]
+        cursor.setPosition(block.position() + min(column, block.length() - 1))
+        self.setTextCursor(cursor)
+        self.centerCursor()
+
+    def goToOffset(self, offset):
+        '''
+        Move the cursor to a byte offset in large-file mode,
+        or to a character offset otherwise
+        '''
+        offset = max(0, offset)
+        if self.buffer is None:
+            cursor = self.textCursor()
+            cursor.setPosition(min(offset, self.document().characterCount() - 1))
+            self.setTextCursor(cursor)
+            self.centerCursor()
+            return
+        self.commitWindow()
+        offset = min(offset, len(self.buffer))
+        line = self.buffer.line_at(offset)
+        start = self.buffer.line_offset(line)
+        column = len(self.buffer.read(start, offset).decode(self.encoding, 'replace'))
+        self.goToLine(line + 1, column + 1)
 
     def indent(self):
         '''
@@ -146,9 +603,13 @@ class Editor(QPlainTextEdit):
         '''
         if self.display_welcome:
             self.setPlainText("")
-            self.display_welcome = False
+            self.closeWelcome()
             self.setReadOnly(False)
             return
+        if self.completer is not None and self.completer.handle_key(event):
+            return
+        if self.buffer:
+            self.ensureCursorWindow()
         if event.key() == Qt.Key_Tab:
             self.textCursor().insertText("    ")
             return
@@ -166,3 +627,5 @@ class Editor(QPlainTextEdit):
             cursor.insertText(previous_indent)
         else:
             super().keyPressEvent(event)
+            if self.completer is not None:
+                self.completer.typed(event.text())
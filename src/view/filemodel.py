@@ -0,0 +1,359 @@
+'''
+File tree model listing only the directories that are expanded
+'''
+
+import os
+import queue
+import shutil
+import sys
+from bisect import bisect_left
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QThread, QFileSystemWatcher, pyqtSignal
+from PyQt5.QtWidgets import QFileIconProvider
+from utils.ignore import Ignore
+
+# Hidden from the tree on top of the version control folders
+TREE_IGNORE = ['node_modules/', '__pycache__/', 'build/', 'dist/',
+               '.venv/', '.mypy_cache/', '.pytest_cache/', '.DS_Store']
+
+
+class Node:
+    '''
+    A file or directory of the tree, children is None until listed
+    '''
+    __slots__ = ('name', 'parent', 'is_dir', 'children', 'row', 'watched')
+
+    def __init__(self, name, parent, is_dir):
+        self.name = name
+        self.parent = parent
+        self.is_dir = is_dir
+        self.children = None
+        self.row = 0
+        self.watched = False
+
+    def path(self):
+        '''
+        Return the absolute path of the node
+        '''
+        parts = []
+        node = self
+        while node is not None:
+            parts.append(node.name)
+            node = node.parent
+        return os.path.join(*reversed(parts))
+
+    def key(self):
+        '''
+        Directories first, then case-insensitive names
+        '''
+        return (not self.is_dir, self.name.lower(), self.name)
+
+
+class DirectoryLister(QThread):
+    '''
+    List directories on a worker thread, one request at a time
+    '''
+    listed = pyqtSignal(str, list)
+
+    def __init__(self, patterns=(), parent=None):
+        super().__init__(parent)
+        self.ignore = Ignore(patterns)
+        self.requests = queue.Queue()
+
+    def request(self, root, path):
+        '''
+        Queue the listing of a directory below root
+        '''
+        self.requests.put((root, path))
+
+    def stop(self):
+        '''
+        Finish the current listing and end the thread
+        '''
+        self.requests.put(None)
+        self.wait()
+
+    def run(self):
+        '''
+        Emit (path, sorted [(name, is_dir)]) for every request
+        '''
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            root, path = item
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            prefix = '' if relative == '.' else relative + '/'
+            entries = []
+            try:
+                with os.scandir(path) as iterator:
+                    for entry in iterator:
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        if not self.ignore.ignored(prefix + entry.name, is_dir):
+                            entries.append((entry.name, is_dir))
+            except OSError:
+                pass
+            entries.sort(key=lambda entry: (not entry[1], entry[0].lower(), entry[0]))
+            self.listed.emit(path, entries)
+
+
+class FileTreeModel(QAbstractItemModel):
+    '''
+    Tree of the opened folder. A directory is listed in the background the
+    first time it is expanded and watched only while it is expanded.
+    entries_changed reports the (name, is_dir) entries added to and removed
+    from a directory when it is listed again.
+    '''
+    entries_changed = pyqtSignal(str, list, list)
+
+    def __init__(self, patterns=TREE_IGNORE, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self.directories = {}
+        self.icons = QFileIconProvider()
+        self.folder_icon = self.icons.icon(QFileIconProvider.Folder)
+        self.file_icon = self.icons.icon(QFileIconProvider.File)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.directory_changed)
+        self.lister = DirectoryLister(patterns, self)
+        self.lister.listed.connect(self.apply_listing)
+        self.lister.start()
+
+    def close(self):
+        '''
+        Stop the lister thread
+        '''
+        self.lister.stop()
+
+    def setRootPath(self, path):
+        '''
+        Show the content of a folder, None shows nothing
+        '''
+        self.beginResetModel()
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.directories = {}
+        self.root = None
+        if path is not None:
+            self.root = Node(os.path.abspath(path), None, True)
+            self.directories[self.root.name] = self.root
+        self.endResetModel()
+        if self.root is not None:
+            self.watch(QModelIndex())
+
+    def node(self, index):
+        '''
+        Return the node of an index, the root for the invalid index
+        '''
+        return index.internalPointer() if index.isValid() else self.root
+
+    def filePath(self, index):
+        '''
+        Return the path of an index
+        '''
+        node = self.node(index)
+        return node.path() if node is not None else ''
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+        if node is None or node.children is None or not 0 <= row < len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        node = self.node(parent)
+        if node is None or node.children is None:
+            return 0
+        return len(node.children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        if node is None:
+            return False
+        return node.is_dir if node.children is None else bool(node.children)
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return node is not None and node.is_dir and node.children is None
+
+    def fetchMore(self, parent):
+        self.watch(parent)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.name
+        if role == Qt.DecorationRole:
+            return self.folder_icon if node.is_dir else self.file_icon
+        if role == Qt.ToolTipRole:
+            return node.path()
+        return None
+
+    def watch(self, index):
+        '''
+        Watch an expanded directory and bring its listing up to date
+        '''
+        node = self.node(index)
+        if node is None or not node.is_dir or node.watched:
+            return
+        path = node.path()
+        node.watched = True
+        self.directories[path] = node
+        self.watcher.addPath(path)
+        self.lister.request(self.root.name, path)
+
+    def unwatch(self, index):
+        '''
+        Stop watching a collapsed directory and the directories below it
+        '''
+        node = self.node(index)
+        if node is None or node is self.root:
+            return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.watched:
+                node.watched = False
+                self.watcher.removePath(node.path())
+            if node.children:
+                stack.extend(child for child in node.children if child.is_dir)
+
+    def directory_changed(self, path):
+        '''
+        List a watched directory again after it changed on disk
+        '''
+        node = self.directories.get(path)
+        if node is not None and node.watched:
+            self.lister.request(self.root.name, path)
+
+    def apply_listing(self, path, entries):
+        '''
+        Merge a fresh listing into the children of a directory
+        '''
+        node = self.directories.get(path)
+        if node is None or self.root is None:
+            return
+        parent = self.index_of(node)
+        if node.children is None:
+            children = [Node(name, node, is_dir) for name, is_dir in entries]
+            if not children:
+                node.children = []
+                return
+            self.beginInsertRows(parent, 0, len(children) - 1)
+            node.children = children
+            self.renumber(node)
+            self.endInsertRows()
+            return
+
+        fresh = set(entries)
+        removed = []
+        added = []
+        for row in range(len(node.children) - 1, -1, -1):
+            child = node.children[row]
+            if (child.name, child.is_dir) not in fresh:
+                removed.append((child.name, child.is_dir))
+                self.beginRemoveRows(parent, row, row)
+                del node.children[row]
+                self.forget(child)
+                self.endRemoveRows()
+        self.renumber(node)
+        existing = set((child.name, child.is_dir) for child in node.children)
+        keys = [child.key() for child in node.children]
+        for name, is_dir in entries:
+            if (name, is_dir) in existing:
+                continue
+            added.append((name, is_dir))
+            child = Node(name, node, is_dir)
+            row = bisect_left(keys, child.key())
+            self.beginInsertRows(parent, row, row)
+            node.children.insert(row, child)
+            keys.insert(row, child.key())
+            self.renumber(node, row)
+            self.endInsertRows()
+        if added or removed:
+            self.entries_changed.emit(path, added, removed)
+
+    def index_of(self, node):
+        '''
+        Return the index of a node, invalid for the root
+        '''
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    @staticmethod
+    def renumber(node, start=0):
+        '''
+        Store the row of every child from start on
+        '''
+        for row in range(start, len(node.children)):
+            node.children[row].row = row
+
+    def forget(self, node):
+        '''
+        Stop watching a removed node and everything below it
+        '''
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.is_dir:
+                path = node.path()
+                if node.watched:
+                    self.watcher.removePath(path)
+                self.directories.pop(path, None)
+            if node.children:
+                stack.extend(node.children)
+
+    def remove(self, index):
+        '''
+        Delete a file or folder from disk and from the tree
+        '''
+        node = self.node(index)
+        path = node.path()
+        try:
+            if node.is_dir and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError:
+            return False
+        parent = node.parent
+        self.beginRemoveRows(self.index_of(parent), node.row, node.row)
+        del parent.children[node.row]
+        self.forget(node)
+        self.renumber(parent)
+        self.endRemoveRows()
+        return True
+
+    def stats(self):
+        '''
+        Return the number of nodes, watched directories and an estimate
+        of the memory used by the nodes
+        '''
+        nodes = 0
+        memory = 0
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            nodes += 1
+            memory += sys.getsizeof(node) + sys.getsizeof(node.name)
+            if node.children:
+                memory += sys.getsizeof(node.children)
+                stack.extend(node.children)
+        return {'nodes': nodes, 'watched': len(self.watcher.directories()),
+                'memory_bytes': memory}
@@ -0,0 +1,176 @@
+'''
+Find in the files of the opened folder
+'''
+
+import os
+import re
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QToolButton, QLabel, QTreeWidget, QTreeWidgetItem
+from PyQt5.QtCore import Qt, pyqtSignal
+from utils.grep import FolderSearch, compile_query
+
+
+class FindPanel(QWidget):
+    '''
+    Find in folder panel class
+
+    Results are streamed in from a FolderSearch while it runs,
+    double clicking a match asks to open its file at its line.
+    '''
+    open_requested = pyqtSignal(str, int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self.search = None
+        self.matches = 0
+        self.query_input = QLineEdit()
+        self.case_button = QToolButton()
+        self.word_button = QToolButton()
+        self.regex_button = QToolButton()
+        self.stop_button = QToolButton()
+        self.status = QLabel()
+        self.results = QTreeWidget()
+
+        input_layout = QHBoxLayout()
+        input_layout.addWidget(self.query_input)
+        input_layout.addWidget(self.case_button)
+        input_layout.addWidget(self.word_button)
+        input_layout.addWidget(self.regex_button)
+        input_layout.addWidget(self.stop_button)
+
+        main_layout = QVBoxLayout()
+        main_layout.addLayout(input_layout)
+        main_layout.addWidget(self.status)
+        main_layout.addWidget(self.results)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(main_layout)
+        self.initUI()
+
+        self.query_input.returnPressed.connect(self.start)
+        self.stop_button.clicked.connect(self.cancel)
+        self.results.itemDoubleClicked.connect(self.open_item)
+
+    def initUI(self):
+        '''
+        Initialize UI
+        '''
+        self.query_input.setPlaceholderText("Enter to find in folder")
+        self.query_input.setStyleSheet("background-color: rgb(29, 31, 35);\
+            color: rgb(171, 177, 189);\
+            border: 1px solid rgb(34, 37, 42);")
+        for button, text, tip in ((self.case_button, "Aa", "Match Case"),
+                                  (self.word_button, "ab", "Match Whole Word"),
+                                  (self.regex_button, ".*", "Use Regular Expression")):
+            button.setText(text)
+            button.setToolTip(tip)
+            button.setCheckable(True)
+        self.stop_button.setText("Stop")
+        self.stop_button.setEnabled(False)
+        self.status.setStyleSheet("color: rgb(143, 149, 162);")
+        self.results.setHeaderHidden(True)
+        self.results.setUniformRowHeights(True)
+        self.results.setStyleSheet("background-color: rgb(34, 37, 42);\
+            color: rgb(154, 159, 170);")
+
+    def set_root(self, root):
+        '''
+        Search in another folder, None when no folder is open
+        '''
+        self.cancel()
+        self.root = root
+        self.results.clear()
+        self.status.clear()
+
+    def start(self):
+        '''
+        Start a search for the query in the folder
+        '''
+        self.cancel()
+        if self.root is None:
+            self.status.setText("Open a folder first")
+            return
+        if self.query_input.text() == "":
+            return
+        try:
+            pattern = compile_query(self.query_input.text(),
+                                    regex=self.regex_button.isChecked(),
+                                    case=self.case_button.isChecked(),
+                                    word=self.word_button.isChecked())
+        except re.error as e:
+            self.status.setText("Invalid pattern: %s" % e)
+            return
+        self.results.clear()
+        self.matches = 0
+        self.status.setText("Searching...")
+        self.search = FolderSearch(self.root, pattern, self)
+        self.search.found.connect(self.add_results)
+        self.search.finished.connect(self.search_finished)
+        self.stop_button.setEnabled(True)
+        self.search.start()
+
+    def cancel(self):
+        '''
+        Stop the running search
+        '''
+        if self.search is None:
+            return
+        self.search.requestInterruption()
+        self.search.wait()
+        self.end_search(stopped=True)
+
+    def add_results(self, found):
+        '''
+        Add a batch of (path, matches) to the results
+        '''
+        if self.sender() is not self.search:
+            return
+        self.results.setUpdatesEnabled(False)
+        for path, matches in found:
+            file_item = QTreeWidgetItem(
+                ["%s (%d)" % (os.path.relpath(path, self.root), len(matches))])
+            file_item.setData(0, Qt.UserRole, (path, 1, 1))
+            for line, column, text in matches:
+                item = QTreeWidgetItem(file_item, ["%d: %s" % (line, text.strip())])
+                item.setData(0, Qt.UserRole, (path, line, column))
+            self.results.addTopLevelItem(file_item)
+            file_item.setExpanded(True)
+            self.matches += len(matches)
+        self.results.setUpdatesEnabled(True)
+        self.status.setText("%d matches in %d files..." % (
+            self.matches, self.results.topLevelItemCount()))
+
+    def search_finished(self):
+        '''
+        Report the outcome of the finished search
+        '''
+        if self.sender() is self.search:
+            self.end_search()
+
+    def end_search(self, stopped=False):
+        '''
+        Show the statistics of the search and release it
+        '''
+        search = self.search
+        self.search = None
+        self.stop_button.setEnabled(False)
+        if search.error is not None:
+            self.status.setText("Search failed: %s" % search.error)
+            return
+        if search.truncated:
+            note = " (stopped at %d matches)" % search.MAX_RESULTS
+        elif stopped:
+            note = " (stopped)"
+        else:
+            note = ""
+        if search.skipped:
+            note += ", %d files could not be searched" % search.skipped
+        self.status.setText("%d matches in %d files, %d files searched in %.2f s%s" % (
+            self.matches, self.results.topLevelItemCount(), search.files,
+            search.elapsed, note))
+
+    def open_item(self, item, column):
+        '''
+        Ask to open the file of a result at its line
+        '''
+        path, line, column = item.data(0, Qt.UserRole)
+        self.open_requested.emit(path, line, column)
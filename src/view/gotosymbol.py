@@ -0,0 +1,157 @@
+'''
+Go to symbol palette
+'''
+
+import os
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem, QLabel
+from PyQt5.QtCore import Qt, QEvent, pyqtSignal
+
+
+class GoToSymbol(QWidget):
+    '''
+    Go to symbol palette class
+
+    Matches the typed text against the names in the symbol index of the
+    opened folder. It also lists the definitions found by go to
+    definition when there is more than one.
+    '''
+    LIMIT = 100
+
+    open_requested = pyqtSignal(str, int, int)
+
+    def __init__(self, index, parent):
+        super().__init__(parent, Qt.Popup)
+        self.index = index
+        self.query_input = QLineEdit()
+        self.results = QListWidget()
+        self.status = QLabel()
+
+        main_layout = QVBoxLayout()
+        main_layout.addWidget(self.query_input)
+        main_layout.addWidget(self.results)
+        main_layout.addWidget(self.status)
+        char_width = self.fontMetrics().averageCharWidth()
+        main_layout.setContentsMargins(char_width, char_width, char_width, char_width)
+        self.setLayout(main_layout)
+        self.initUI()
+
+        self.query_input.textChanged.connect(self.update_results)
+        self.query_input.returnPressed.connect(self.open_current)
+        self.query_input.installEventFilter(self)
+        self.results.itemActivated.connect(self.open_item)
+        self.index.updated.connect(self.index_updated)
+
+    def initUI(self):
+        '''
+        Initialize UI
+        '''
+        self.setStyleSheet("background-color: rgb(34, 37, 42);\
+            color: rgb(154, 159, 170);")
+        self.query_input.setStyleSheet("background-color: rgb(29, 31, 35);\
+            color: rgb(171, 177, 189);\
+            border: 1px solid rgb(63, 68, 81);")
+        self.query_input.setPlaceholderText("Search symbols by name")
+        self.results.setUniformItemSizes(True)
+        self.status.setStyleSheet("color: rgb(143, 149, 162);")
+
+    def place(self):
+        '''
+        Move the palette to the top of the parent window
+        '''
+        parent = self.parentWidget()
+        width = min(700, parent.width() - 40)
+        top_left = parent.mapToGlobal(parent.rect().topLeft())
+        self.setGeometry(top_left.x() + (parent.width() - width) // 2,
+                         top_left.y() + 60, width, 360)
+
+    def popup(self):
+        '''
+        Show the palette to search the symbols of the folder
+        '''
+        if self.index.root is None:
+            return
+        self.place()
+        self.query_input.show()
+        self.query_input.selectAll()
+        self.show()
+        self.query_input.setFocus()
+        self.update_results()
+
+    def show_definitions(self, name, found):
+        '''
+        Show the palette listing the definitions of a name to choose from
+        '''
+        self.place()
+        self.query_input.hide()
+        self.fill(found)
+        self.status.setText("%d definitions of %s" % (len(found), name))
+        self.show()
+        self.results.setFocus()
+
+    def fill(self, found):
+        '''
+        List symbols given as (name, kind, path, line, column, container)
+        '''
+        self.results.clear()
+        root = self.index.root
+        for name, kind, path, line, column, container in found:
+            if path is None:
+                location = "%d" % line
+            else:
+                relative = os.path.relpath(path, root) if root is not None else path
+                location = "%s:%d" % (relative, line)
+            qualified = container + '.' + name if container else name
+            item = QListWidgetItem("%s  (%s)  %s" % (qualified, kind, location))
+            item.setData(Qt.UserRole, (path, line, column))
+            self.results.addItem(item)
+        self.results.setCurrentRow(0)
+
+    def update_results(self):
+        '''
+        List the best matches of the query
+        '''
+        if self.query_input.isHidden():
+            return
+        found = self.index.find(self.query_input.text(), self.LIMIT)
+        self.fill(found)
+        note = ", indexing..." if self.index.is_indexing() else ""
+        self.status.setText("%d symbols%s" % (len(found), note))
+
+    def index_updated(self):
+        '''
+        Search again with the updated index
+        '''
+        if self.isVisible():
+            self.update_results()
+
+    def eventFilter(self, obj, event):
+        '''
+        Move through the results with the arrow keys while typing
+        '''
+        if obj is self.query_input and event.type() == QEvent.KeyPress:
+            step = {Qt.Key_Up: -1, Qt.Key_Down: 1}.get(event.key())
+            if step is not None and self.results.count():
+                row = (self.results.currentRow() + step) % self.results.count()
+                self.results.setCurrentRow(row)
+                return True
+            if event.key() == Qt.Key_Escape:
+                self.hide()
+                return True
+        return super().eventFilter(obj, event)
+
+    def open_current(self):
+        '''
+        Open the selected result
+        '''
+        item = self.results.currentItem()
+        if item is not None:
+            self.open_item(item)
+
+    def open_item(self, item):
+        '''
+        Ask to open the file of a result at its symbol, an empty path for
+        the current file
+        '''
+        self.hide()
+        path, line, column = item.data(Qt.UserRole)
+        self.open_requested.emit(path or "", line, column)
@@ -2,17 +2,27 @@
 Main Window
 '''
 
+import json
 import os
-from PyQt5.QtWidgets import QMainWindow, QFileDialog, QAction, QMessageBox, QLineEdit, QFileSystemModel, QTreeView, QSplitter, QMenu, QInputDialog
-from PyQt5.QtGui import QFont, QIcon, QTextDocument, QTextCursor
+import re
+from time import perf_counter
+from PyQt5.QtWidgets import QMainWindow, QFileDialog, QAction, QMessageBox, QLineEdit, QTreeView, QSplitter, QMenu, QInputDialog, QProgressBar, QPushButton, QTabBar, QWidget, QVBoxLayout
+from PyQt5.QtGui import QFont, QIcon, QTextCursor
 from PyQt5.QtCore import Qt, QFileInfo, QDir
 import shutil
-from view.editor import Editor
+from view.editor import Editor, LARGE_FILE_SIZE
 from view.bar import ToolBar
-from view.terminal import Terminal
+from view.workspace import Workspace, DocumentTab
+from utils.fileio import FileLoader, FileSaver, DocumentStreamer, write_atomic, document_chunks
+from utils.search import SearchIndex, compile_pattern, document_text, replacements
+from utils.scheduler import UpdateScheduler
+from utils.profiler import PROFILER
 from utils.utils import log
 from syntax.py import Highlighter as PythonHighlighter
 
+# Documents with at least this many characters are saved on a worker thread
+ASYNC_SAVE_SIZE = 8 * 1024 * 1024
+
 
 class MainWindow(QMainWindow):
     '''
@@ -22,33 +32,76 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.splitter = QSplitter()
-        self.editor = Editor()
-        self.terminal = Terminal()
-        self.hightlighter = PythonHighlighter(self.editor.document())
+        self.updates = UpdateScheduler(parent=self)
+        # Ahead of the editor's current line, which the matches repaint
+        self.updates.register('matches', self.update_search_matches)
+        self.editor = Editor(updates=self.updates)
+        self.workspace = Workspace(parent=self)
+        self.tab_bar = QTabBar()
+        self.workspace.add(DocumentTab(self.workspace.new_document()))
+        self.workspace.active = 0
+        self.editor.switchDocument(self.workspace.current().document)
+        self.editor.welcome()
+        # Built on first use, see ensure_terminal and the like
+        self.terminal = None
+        self.hightlighter = PythonHighlighter(self.editor, semantic=False)
         self.dir = None
         self.find_bar = QLineEdit(self)
         self.replace_bar = QLineEdit(self)
         self.jump_bar = QLineEdit(self)
-        self.model = QFileSystemModel()
-        self.model.setRootPath(QDir.rootPath())
-        self.tree = QTreeView()
+        self.case_action = QAction("Aa", self)
+        self.word_action = QAction("ab", self)
+        self.regex_action = QAction(".*", self)
+        self.search = SearchIndex(self.editor.document(), self)
+        self.model = None
+        self.tree = None
+        self.find_panel = None
+        self.quick_open = None
+        self.symbols = None
+        self.go_to_symbol = None
+        self.outline = None
+        self.sidebar = QSplitter()
+        self.editor_splitter = QSplitter()
         self.fnd = False
+        self.fnd_selection = None
+        self.pending_jump = None
+        self.loader = None
+        self.loading_tab = None
+        self.load_started = None
+        self.saver = None
+        self.streamer = None
+        self.save_started = None
+        self.progress_bar = QProgressBar(self)
+        self.cancel_button = QPushButton("Cancel", self)
 
         self.initUI()
         self.update_title()
         self.update_status_bar()
 
-        self.editor.cursorPositionChanged.connect(self.update_status_bar)
-        self.editor.cursorPositionChanged.connect(self.reset_fnd)
-        self.editor.textChanged.connect(self.update_title)
+        self.updates.register('find_mode', self.reset_fnd)
+        self.updates.register('title', self.update_title)
+        self.updates.register('status', self.update_status_bar)
+        self.editor.cursorPositionChanged.connect(
+            self.updates.marker('find_mode', 'status'))
+        self.editor.textChanged.connect(self.updates.marker('title'))
+        self.editor.welcomeClosed.connect(self.ensure_editing)
         self.find_bar.returnPressed.connect(self.fnd_next)
+        self.find_bar.textChanged.connect(self.update_search)
+        self.case_action.toggled.connect(self.update_search)
+        self.word_action.toggled.connect(self.update_search)
+        self.regex_action.toggled.connect(self.update_search)
+        self.search.changed.connect(self.updates.marker('matches', 'status'))
+        self.editor.verticalScrollBar().valueChanged.connect(
+            self.updates.marker('matches'))
         self.jump_bar.returnPressed.connect(self.jump)
         self.replace_bar.returnPressed.connect(self.rpl)
-        self.tree.doubleClicked.connect(self.open_file_from_tree)
-        self.tree.doubleClicked.connect(self.update_title)
-        self.tree.doubleClicked.connect(self.update_status_bar)
-        self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.tree.customContextMenuRequested.connect(self.show_tree_menu)
+        self.tab_bar.currentChanged.connect(self.activate_tab)
+        self.tab_bar.tabCloseRequested.connect(self.close_tab)
+        self.tab_bar.tabMoved.connect(self.workspace.move)
+
+        PROFILER.add_source('updates', self.updates.stats)
+        PROFILER.add_source('workspace', self.workspace.stats)
+        PROFILER.add_source('highlight_cache', self.hightlighter.cache_info)
 
     def initUI(self):
         '''
@@ -68,38 +121,178 @@ class MainWindow(QMainWindow):
         self.addToolBar(toolbar)
         self.find_bar.setPlaceholderText("Enter to find")
         self.replace_bar.setPlaceholderText("Enter to replace")
-        self.jump_bar.setPlaceholderText("Enter line number")
+        self.jump_bar.setPlaceholderText("Line[:Column] or @Offset")
         self.find_bar.setFixedWidth(150)
         self.replace_bar.setFixedWidth(150)
         self.jump_bar.setFixedWidth(150)
+        self.case_action.setCheckable(True)
+        self.case_action.setStatusTip("Match Case")
+        self.word_action.setCheckable(True)
+        self.word_action.setStatusTip("Match Whole Word")
+        self.regex_action.setCheckable(True)
+        self.regex_action.setStatusTip("Use Regular Expression")
+        self.progress_bar.setFixedWidth(150)
+        self.progress_bar.setMaximum(100)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.statusBar().addPermanentWidget(self.cancel_button)
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+        self.cancel_button.clicked.connect(self.cancel_loading)
+
+        self.sidebar.setOrientation(Qt.Vertical)
+        self.tab_bar.setTabsClosable(True)
+        self.tab_bar.setMovable(True)
+        self.tab_bar.setExpanding(False)
+        self.tab_bar.setElideMode(Qt.ElideMiddle)
+        self.tab_bar.setDocumentMode(True)
+        self.tab_bar.setStyleSheet("QTabBar::tab {background-color: rgb(34, 37, 42);\
+            color: rgb(143, 149, 162); padding: 4px 10px;}\
+            QTabBar::tab:selected {background-color: rgb(41, 44, 51);\
+            color: rgb(171, 177, 189);}")
+        self.tab_bar.addTab(self.workspace.current().title())
+        editor_area = QWidget()
+        editor_layout = QVBoxLayout(editor_area)
+        editor_layout.setContentsMargins(0, 0, 0, 0)
+        editor_layout.setSpacing(0)
+        editor_layout.addWidget(self.tab_bar)
+        editor_layout.addWidget(self.editor)
+        self.editor_splitter.addWidget(editor_area)
+        self.editor_splitter.setOrientation(Qt.Vertical)
+
+        self.splitter.addWidget(self.sidebar)
+        self.splitter.addWidget(self.editor_splitter)
+        self.splitter.setSizes(
+            [int(self.width() * 0.2), self.width() - int(self.width() * 0.2)])
 
+    def ensure_tree(self):
+        '''
+        Create the File Tree the First Time It Is Needed
+        '''
+        if self.tree is not None:
+            return self.tree
+        from view.filemodel import FileTreeModel
+        self.model = FileTreeModel()
+        self.tree = QTreeView()
+        self.tree.hide()
         self.tree.setModel(self.model)
         self.tree.setAnimated(False)
         self.tree.setIndentation(20)
-        self.tree.setSortingEnabled(True)
+        self.tree.setUniformRowHeights(True)
         self.tree.setStyleSheet("background-color: rgb(34, 37, 42);\
             color: rgb(154, 159, 170);\
             QTreeView::branch:selected {background-color: rgb(255, 0, 0);}")
         self.tree.setHeaderHidden(True)
-        self.tree.setColumnHidden(1, True)
-        self.tree.setColumnHidden(2, True)
-        self.tree.setColumnHidden(3, True)
-
-        splitter1 = QSplitter()
-        splitter1.addWidget(self.tree)
-        splitter2 = QSplitter()
-        splitter2.addWidget(self.editor)
-        splitter2.addWidget(self.terminal)
-        splitter2.setOrientation(Qt.Vertical)
-        splitter2.setSizes([int(self.height() * (2/3)),
-                           self.height() - int(self.height() * (2/3))])
-
-        self.splitter.addWidget(splitter1)
-        self.splitter.addWidget(splitter2)
-        self.splitter.setSizes(
-            [int(self.width() * 0.2), self.width() - int(self.width() * 0.2)])
-        self.tree.hide()
+        self.sidebar.insertWidget(0, self.tree)
+
+        self.tree.doubleClicked.connect(self.open_file_from_tree)
+        self.tree.doubleClicked.connect(self.updates.marker('title', 'status'))
+        self.tree.expanded.connect(self.tree_expanded)
+        self.tree.collapsed.connect(self.model.unwatch)
+        self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.tree.customContextMenuRequested.connect(self.show_tree_menu)
+        if self.quick_open is not None:
+            self.model.entries_changed.connect(self.quick_open.directory_changed)
+        if self.symbols is not None:
+            self.model.watcher.directoryChanged.connect(self.symbols.directory_changed)
+        return self.tree
+
+    def ensure_find_panel(self):
+        '''
+        Create the Find in Folder Panel the First Time It Is Needed
+        '''
+        if self.find_panel is not None:
+            return self.find_panel
+        from view.findpanel import FindPanel
+        self.find_panel = FindPanel()
+        self.find_panel.hide()
+        self.find_panel.set_root(self.dir)
+        self.sidebar.addWidget(self.find_panel)
+        self.find_panel.open_requested.connect(self.open_file_at)
+        return self.find_panel
+
+    def ensure_quick_open(self):
+        '''
+        Create the Quick Open Palette the First Time It Is Needed
+        '''
+        if self.quick_open is not None:
+            return self.quick_open
+        from view.quickopen import QuickOpen
+        self.quick_open = QuickOpen(self)
+        self.quick_open.set_root(self.dir)
+        self.quick_open.open_requested.connect(self.open_file_at)
+        if self.model is not None:
+            self.model.entries_changed.connect(self.quick_open.directory_changed)
+        return self.quick_open
+
+    def ensure_editing(self):
+        '''
+        Add Folding, Completion and Semantic Highlighting Once the Welcome Text Is Gone
+        '''
+        if self.editor.completer is not None:
+            return
+        from syntax.folding import FoldIndex
+        from view.completer import Completer
+        self.hightlighter.enable_semantic()
+        self.editor.setFoldIndex(FoldIndex(self.editor.document(), self.editor))
+        self.editor.setCompleter(Completer(self.editor))
+        self.editor.completer.root = self.dir
+        PROFILER.add_source('completion', self.editor.completer.client.stats)
+
+    def ensure_symbols(self):
+        '''
+        Create the Symbol Index the First Time It Is Needed
+        '''
+        if self.symbols is not None:
+            return self.symbols
+        from utils.symbols import SymbolIndex
+        self.symbols = SymbolIndex(parent=self)
+        self.symbols.set_root(self.dir)
+        # Folders changed on disk, as long as they are expanded in the tree
+        if self.model is not None:
+            self.model.watcher.directoryChanged.connect(self.symbols.directory_changed)
+        PROFILER.add_source('symbols', self.symbols.stats)
+        return self.symbols
+
+    def ensure_go_to_symbol(self):
+        '''
+        Create the Go to Symbol Palette the First Time It Is Needed
+        '''
+        if self.go_to_symbol is not None:
+            return self.go_to_symbol
+        from view.gotosymbol import GoToSymbol
+        self.go_to_symbol = GoToSymbol(self.ensure_symbols(), self)
+        self.go_to_symbol.open_requested.connect(self.open_symbol)
+        return self.go_to_symbol
+
+    def ensure_outline(self):
+        '''
+        Create the Outline Panel the First Time It Is Needed
+        '''
+        if self.outline is not None:
+            return self.outline
+        from view.outline import OutlinePanel
+        self.outline = OutlinePanel(self.editor)
+        self.outline.hide()
+        self.sidebar.addWidget(self.outline)
+        self.outline.jump_requested.connect(self.open_symbol_here)
+        return self.outline
+
+    def ensure_terminal(self):
+        '''
+        Create the Terminal the First Time It Is Needed
+        '''
+        if self.terminal is not None:
+            return self.terminal
+        from view.terminal import Terminal
+        self.terminal = Terminal()
         self.terminal.hide()
+        if self.dir is not None:
+            self.terminal.set_directory(self.dir)
+        self.editor_splitter.addWidget(self.terminal)
+        height = self.editor_splitter.height()
+        self.editor_splitter.setSizes([int(height * (2/3)),
+                                       height - int(height * (2/3))])
+        return self.terminal
 
     def set_menu(self):
         '''
@@ -113,6 +306,10 @@ class MainWindow(QMainWindow):
         help_menu = menu.addMenu("Help")
 
         # File Menu
+        new_file_action = QAction("New File", self)
+        new_file_action.setShortcut("Ctrl+N")
+        file_menu.addAction(new_file_action)
+
         open_file_action = QAction("Open File", self)
         open_file_action.setShortcut("Ctrl+O")
         file_menu.addAction(open_file_action)
@@ -121,6 +318,18 @@ class MainWindow(QMainWindow):
         open_folder_action.setShortcut("Ctrl+Shift+O")
         file_menu.addAction(open_folder_action)
 
+        quick_open_action = QAction("Go to File", self)
+        quick_open_action.setShortcut("Ctrl+P")
+        file_menu.addAction(quick_open_action)
+
+        go_to_symbol_action = QAction("Go to Symbol", self)
+        go_to_symbol_action.setShortcut("Ctrl+Shift+R")
+        file_menu.addAction(go_to_symbol_action)
+
+        go_to_definition_action = QAction("Go to Definition", self)
+        go_to_definition_action.setShortcut("F12")
+        file_menu.addAction(go_to_definition_action)
+
         save_action = QAction("Save", self)
         save_action.setShortcut("Ctrl+S")
         file_menu.addAction(save_action)
@@ -137,8 +346,12 @@ class MainWindow(QMainWindow):
         quit_action.setShortcut("Ctrl+Q")
         file_menu.addAction(quit_action)
 
+        new_file_action.triggered.connect(self.new_file)
         open_file_action.triggered.connect(self.open_file)
         open_folder_action.triggered.connect(self.open_folder)
+        quick_open_action.triggered.connect(self.show_quick_open)
+        go_to_symbol_action.triggered.connect(self.show_go_to_symbol)
+        go_to_definition_action.triggered.connect(self.go_to_definition)
         save_action.triggered.connect(self.save_file)
         save_as_action.triggered.connect(self.save_as)
         close_action.triggered.connect(self.close_file)
@@ -165,11 +378,16 @@ class MainWindow(QMainWindow):
         redo_action.setShortcut("Ctrl+Y")
         edit_menu.addAction(redo_action)
 
+        complete_action = QAction("Complete", self)
+        complete_action.setShortcut("Ctrl+Space")
+        edit_menu.addAction(complete_action)
+
         cut_action.triggered.connect(self.editor.cut)
         copy_action.triggered.connect(self.editor.copy)
         paste_action.triggered.connect(self.editor.paste)
         undo_action.triggered.connect(self.editor.undo)
         redo_action.triggered.connect(self.editor.redo)
+        complete_action.triggered.connect(self.complete)
 
         # View Menu
         toggle_sidebar_action = QAction("Toggle Sidebar", self)
@@ -182,6 +400,48 @@ class MainWindow(QMainWindow):
         view_menu.addAction(toggle_terminal_action)
         toggle_terminal_action.triggered.connect(self.toggle_terminal)
 
+        find_in_folder_action = QAction("Find in Folder", self)
+        find_in_folder_action.setShortcut("Ctrl+Shift+F")
+        view_menu.addAction(find_in_folder_action)
+        find_in_folder_action.triggered.connect(self.toggle_find_panel)
+
+        outline_action = QAction("Toggle Outline", self)
+        outline_action.setShortcut("Ctrl+Shift+L")
+        view_menu.addAction(outline_action)
+        outline_action.triggered.connect(self.toggle_outline)
+
+        tree_stats_action = QAction("File Tree Statistics", self)
+        view_menu.addAction(tree_stats_action)
+        tree_stats_action.triggered.connect(self.show_tree_stats)
+
+        budget_action = QAction("Document Memory Budget", self)
+        view_menu.addAction(budget_action)
+        budget_action.triggered.connect(self.set_memory_budget)
+
+        profiling_action = QAction("Record Performance", self)
+        profiling_action.setCheckable(True)
+        profiling_action.setChecked(PROFILER.enabled)
+        view_menu.addAction(profiling_action)
+        profiling_action.toggled.connect(PROFILER.set_enabled)
+
+        performance_action = QAction("Performance Statistics", self)
+        view_menu.addAction(performance_action)
+        performance_action.triggered.connect(self.show_performance)
+
+        fold_action = QAction("Fold", self)
+        fold_action.setShortcut("Ctrl+Shift+[")
+        view_menu.addAction(fold_action)
+        fold_action.triggered.connect(lambda: self.fold_at_cursor(True))
+
+        unfold_action = QAction("Unfold", self)
+        unfold_action.setShortcut("Ctrl+Shift+]")
+        view_menu.addAction(unfold_action)
+        unfold_action.triggered.connect(lambda: self.fold_at_cursor(False))
+
+        unfold_all_action = QAction("Unfold All", self)
+        view_menu.addAction(unfold_all_action)
+        unfold_all_action.triggered.connect(self.editor.unfoldAll)
+
         zoom_in_action = QAction("Zoom In", self)
         zoom_in_action.setShortcut("Ctrl++")
         view_menu.addAction(zoom_in_action)
@@ -218,20 +478,24 @@ class MainWindow(QMainWindow):
         font.setFixedPitch(True)
         self.editor.setFont(font)
 
+    def new_file(self):
+        '''
+        Open an Empty Untitled Tab
+        '''
+        if self.is_pristine():
+            if self.editor.display_welcome:
+                self.editor.setPlainText("")
+                self.editor.closeWelcome()
+                self.editor.setReadOnly(False)
+        else:
+            self.add_tab()
+        self.editor.setFocus()
+
     def open_file(self):
         '''
         Open File
         '''
-        if self.editor.document().isModified():
-            reply = QMessageBox.question(self, "Save?", "Do you want to save before closing?",
-                                         QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
-            if reply == QMessageBox.Yes:
-                self.save_file()
-                self.open_file_helper()
-            elif reply == QMessageBox.No:
-                self.open_file_helper()
-        else:
-            self.open_file_helper()
+        self.open_file_helper()
 
     def open_folder(self):
         '''
@@ -239,17 +503,39 @@ class MainWindow(QMainWindow):
         '''
         dir_path = QFileDialog.getExistingDirectory(self, 'Open Folder')
         if dir_path:
+            self.ensure_tree()
             self.model.setRootPath(dir_path)
-            self.tree.setRootIndex(self.model.index(dir_path))
-            self.tree.sortByColumn(0, Qt.AscendingOrder)
             self.dir = dir_path
-            self.update_title()
+            self.updates.mark('title')
             self.tree.show()
-            self.terminal.current_directory = dir_path
+            if self.find_panel is not None:
+                self.find_panel.set_root(dir_path)
+            # Index right away so that Ctrl+P finds files on first use, a
+            # new palette starts with the folder as its root
+            if self.quick_open is None:
+                self.ensure_quick_open()
+            else:
+                self.quick_open.set_root(dir_path)
+            if self.symbols is None:
+                self.ensure_symbols()
+            else:
+                self.symbols.set_root(dir_path)
+            if self.editor.completer is not None:
+                self.editor.completer.root = dir_path
+            if self.terminal is not None:
+                self.terminal.set_directory(dir_path)
         if self.editor.display_welcome:
-            self.editor.display_welcome = False
+            self.editor.closeWelcome()
             self.editor.setReadOnly(False)
 
+    def open_file_helper(self):
+        '''
+        Choose a File and Open It
+        '''
+        file_path, _ = QFileDialog.getOpenFileName(self, 'Open File')
+        if file_path:
+            self.open_tab(file_path)
+
     def open_file_from_tree(self, index):
         '''
         Open File From File Tree
@@ -257,15 +543,328 @@ class MainWindow(QMainWindow):
         file_path = self.model.filePath(index)
         if QFileInfo(file_path).isDir():
             return
-        try:
-            self.close_file()
-            with open(file_path, 'r') as file:
-                self.editor.setPlainText(file.read())
-            self.editor.path = file_path
-            self.update_title()
-        except UnicodeDecodeError:
-            QMessageBox.warning(
-                self, "Warning", "Cannot open non-UTF-8 text files")
+        self.open_tab(file_path)
+
+    def open_file_at(self, file_path, line=None, column=1):
+        '''
+        Open File, at a Line and Column Once It Is Loaded If Given
+        '''
+        self.open_tab(file_path)
+        if line is None:
+            pass
+        elif self.loading_tab is self.workspace.current():
+            self.pending_jump = (line, column)
+        else:
+            self.editor.goToLine(line, column)
+        self.editor.setFocus()
+
+    def open_tab(self, file_path):
+        '''
+        Show the Tab of a File, Loading It in a New Tab If It Is Not Open
+        '''
+        index = self.workspace.index_of(file_path)
+        if index is not None:
+            self.tab_bar.setCurrentIndex(index)
+            return
+        if not self.is_pristine():
+            self.add_tab()
+        self.load_file(file_path)
+
+    def is_pristine(self):
+        '''
+        Return Whether the Active Tab Is an Untouched Untitled Document
+        '''
+        tab = self.workspace.current()
+        return (tab.path is None and self.editor.path is None
+                and tab is not self.loading_tab
+                and not self.editor.document().isModified()
+                and (self.editor.display_welcome or self.editor.document().isEmpty()))
+
+    def add_tab(self):
+        '''
+        Open an Untitled Tab Next to the Active One and Show It
+        '''
+        index = self.workspace.add(DocumentTab(self.workspace.new_document()),
+                                   self.workspace.active + 1)
+        self.tab_bar.insertTab(index, "Untitled")
+        self.tab_bar.setCurrentIndex(index)
+        return index
+
+    def store_tab(self):
+        '''
+        Copy the Editor State into the Active Tab
+        '''
+        tab = self.workspace.current()
+        if tab is None:
+            return
+        cursor = self.editor.textCursor()
+        tab.path = self.editor.path
+        tab.encoding = self.editor.encoding
+        tab.buffer = self.editor.buffer
+        tab.first_line = self.editor.first_line
+        tab.anchor = cursor.anchor()
+        tab.position = cursor.position()
+        tab.scroll = self.editor.verticalScrollBar().value()
+        if tab.buffer is not None:
+            tab.modified = self.editor.document().isModified()
+
+    def fold_at_cursor(self, fold):
+        '''
+        Fold or Unfold the Innermost Region Around the Cursor
+        '''
+        folds = self.editor.folds
+        if folds is None:
+            return
+        line = self.editor.textCursor().blockNumber()
+        if not fold:
+            self.editor.toggleFold(line, False)
+            return
+        # The region starting at the cursor line, else the closest one
+        # containing it
+        header = line
+        while header >= 0:
+            end = folds.region(header)
+            if end is not None and end >= line and not folds.is_folded(header):
+                break
+            header -= 1
+        if header < 0:
+            return
+        if header != line:
+            cursor = self.editor.textCursor()
+            cursor.setPosition(self.editor.document().findBlockByNumber(header).position())
+            self.editor.setTextCursor(cursor)
+        self.editor.toggleFold(header, True)
+
+    def activate_tab(self, index):
+        '''
+        Show the Document of a Tab, Reading It Again If It Was Evicted
+        '''
+        if index < 0 or index == self.workspace.active:
+            return
+        self.wait_saving()
+        self.store_tab()
+        previous = self.workspace.current()
+        tab = self.workspace.tabs[index]
+        error = self.workspace.materialize(tab)
+        self.workspace.active = index
+        self.workspace.touch(tab)
+        # The window of a large file is decoded with the encoding of its tab
+        self.editor.encoding = tab.encoding
+        self.editor.switchDocument(tab.document, tab.buffer, tab.first_line)
+        self.editor.path = tab.path
+        self.editor.setReadOnly(tab is self.loading_tab)
+        self.hightlighter.set_document(tab.document)
+        self.search.set_document(tab.document)
+        if self.outline is not None:
+            self.outline.schedule()
+        end = tab.document.characterCount() - 1
+        cursor = QTextCursor(tab.document)
+        cursor.setPosition(min(tab.anchor, end))
+        cursor.setPosition(min(tab.position, end), QTextCursor.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.verticalScrollBar().setValue(tab.scroll)
+        # The window of a large file is read again from its piece table
+        if previous is not None and previous.buffer is not None:
+            self.workspace.drop(previous)
+        self.workspace.evict(keep=(self.loading_tab,))
+        self.updates.mark('title', 'status')
+        if error is not None:
+            # Its empty document must not be saved over the file
+            self.remove_tab(index)
+            QMessageBox.warning(self, "Warning", f"Cannot open file: {error}")
+
+    def update_tab(self, index):
+        '''
+        Show the Name and Modified State of a Tab
+        '''
+        tab = self.workspace.tabs[index]
+        self.tab_bar.setTabText(index, tab.title())
+        self.tab_bar.setTabToolTip(index, tab.path or "")
+
+    def close_tab(self, index):
+        '''
+        Close a Tab, Asking to Save It First, Return Whether It Was Closed
+        '''
+        self.store_tab()
+        if self.workspace.tabs[index].is_modified():
+            self.tab_bar.setCurrentIndex(index)
+            reply = QMessageBox.question(self, "Save?", "Do you want to save before closing?",
+                                         QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+            if reply == QMessageBox.Cancel:
+                return False
+            if reply == QMessageBox.Yes:
+                self.save_and_wait()
+                if self.editor.document().isModified():
+                    return False
+        self.remove_tab(index)
+        return True
+
+    def remove_tab(self, index):
+        '''
+        Close a Tab Without Saving, the Last One Is Emptied Instead
+        '''
+        if self.workspace.tabs[index] is self.loading_tab:
+            self.cancel_loading()
+            return
+        self.wait_saving()
+        if index == self.workspace.active:
+            self.editor.closeLargeFile()
+            self.workspace.tabs[index].buffer = None
+        if len(self.workspace.tabs) == 1:
+            tab = self.workspace.tabs[0]
+            tab.path = self.editor.path = None
+            tab.encoding = self.editor.encoding = 'utf-8'
+            self.editor.setPlainText("")
+            self.update_tab(0)
+            self.updates.mark('title', 'status')
+            return
+        self.workspace.remove(index)
+        self.tab_bar.removeTab(index)
+        self.activate_tab(self.tab_bar.currentIndex())
+
+    def tabs_under(self, path):
+        '''
+        Return the Indexes of the Tabs of a File or of the Files in a Folder
+        '''
+        self.store_tab()
+        path = os.path.abspath(path)
+        return [index for index, tab in enumerate(self.workspace.tabs)
+                if tab.path is not None and (os.path.abspath(tab.path) == path
+                or os.path.abspath(tab.path).startswith(path + os.sep))]
+
+    def retarget_tabs(self, path, new_path):
+        '''
+        Point the Tabs of a Moved or Renamed File or Folder at Its New Path
+        '''
+        for index in self.tabs_under(path):
+            tab = self.workspace.tabs[index]
+            tab.path = new_path + os.path.abspath(tab.path)[len(os.path.abspath(path)):]
+            self.update_tab(index)
+        self.editor.path = self.workspace.current().path
+        self.updates.mark('title', 'status')
+
+    def set_memory_budget(self):
+        '''
+        Ask for the Memory Budget of the Inactive Documents
+        '''
+        megabytes, ok_pressed = QInputDialog.getInt(
+            self, "Document Memory Budget", "Megabytes kept in memory:",
+            self.workspace.budget >> 20, 16, 1 << 20)
+        if ok_pressed:
+            self.workspace.budget = megabytes << 20
+            self.workspace.evict(keep=(self.loading_tab,))
+
+    @PROFILER.timed('file.open')
+    def load_file(self, file_path):
+        '''
+        Load a File into the Active Tab on a Worker Thread, or Map It in
+        Large-File Mode
+        '''
+        self.wait_saving()
+        self.cancel_loading()
+        self.pending_jump = None
+        tab = self.workspace.current()
+        tab.path = self.editor.path = file_path
+        self.update_tab(self.workspace.active)
+        if os.path.getsize(file_path) >= LARGE_FILE_SIZE:
+            self.editor.openLargeFile(file_path)
+            tab.encoding = self.editor.encoding
+            self.updates.mark('title')
+            return
+        self.editor.setPlainText("")
+        self.editor.closeWelcome()
+        self.editor.setReadOnly(True)
+        self.editor.document().setUndoRedoEnabled(False)
+        self.loading_tab = tab
+        self.load_started = perf_counter()
+        self.loader = FileLoader(file_path, self)
+        self.loader.chunk.connect(self.append_loaded_text)
+        self.loader.progress.connect(self.progress_bar.setValue)
+        self.loader.restarted.connect(self.restart_loading)
+        self.loader.loaded.connect(self.finish_loading)
+        self.loader.failed.connect(self.fail_loading)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_button.show()
+        self.loader.start()
+        self.updates.mark('title')
+
+    def append_loaded_text(self, text):
+        '''
+        Append a Chunk of the Loading File
+        '''
+        if self.sender() is not self.loader:
+            return
+        document = self.loading_tab.document
+        first = document.isEmpty()
+        cursor = QTextCursor(document)
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        if first and self.loading_tab is self.workspace.current():
+            self.editor.moveCursor(QTextCursor.Start)
+        self.loader.consumed()
+
+    def restart_loading(self):
+        '''
+        Drop the Text Loaded with the Wrong Encoding
+        '''
+        if self.sender() is self.loader:
+            self.loading_tab.document.setPlainText("")
+
+    def finish_loading(self, encoding):
+        '''
+        Make the Loaded File Editable
+        '''
+        if self.sender() is not self.loader:
+            return
+        tab = self.loading_tab
+        if PROFILER.enabled:
+            PROFILER.add_time('file.load', perf_counter() - self.load_started)
+        self.end_loading()
+        tab.encoding = encoding
+        tab.document.setModified(False)
+        if tab is self.workspace.current():
+            self.editor.encoding = encoding
+            if self.pending_jump is not None:
+                self.editor.goToLine(*self.pending_jump)
+        self.pending_jump = None
+        self.update_tab(self.workspace.tabs.index(tab))
+        self.updates.mark('title', 'status')
+
+    def fail_loading(self, message):
+        '''
+        Report a File That Could Not Be Read
+        '''
+        if self.sender() is not self.loader:
+            return
+        tab = self.loading_tab
+        self.end_loading()
+        self.remove_tab(self.workspace.tabs.index(tab))
+        QMessageBox.warning(self, "Warning", f"Cannot open file: {message}")
+
+    def cancel_loading(self):
+        '''
+        Stop Loading and Close the Partially Loaded File
+        '''
+        if self.loader is None:
+            return
+        self.loader.requestInterruption()
+        self.loader.wait()
+        tab = self.loading_tab
+        self.end_loading()
+        self.remove_tab(self.workspace.tabs.index(tab))
+
+    def end_loading(self):
+        '''
+        Hide the Progress Bar and Release the Loader
+        '''
+        if self.loading_tab is self.workspace.current():
+            self.editor.setReadOnly(False)
+        self.loading_tab.document.setUndoRedoEnabled(True)
+        self.loader = None
+        self.loading_tab = None
+        self.progress_bar.hide()
+        self.cancel_button.hide()
 
     def save_file(self):
         '''
@@ -274,10 +873,7 @@ class MainWindow(QMainWindow):
         if self.editor.path is None:
             self.save_as()
         else:
-            with open(self.editor.path, 'w') as file:
-                file.write(self.editor.toPlainText())
-        self.editor.document().setModified(False)
-        self.update_title()
+            self.write_file(self.editor.path)
 
     def save_as(self):
         '''
@@ -285,59 +881,177 @@ class MainWindow(QMainWindow):
         '''
         file_path, _ = QFileDialog.getSaveFileName(self, 'Save File')
         if file_path:
-            with open(file_path, 'w') as file:
-                file.write(self.editor.toPlainText())
             self.editor.path = file_path
-            self.update_title()
+            self.write_file(file_path)
 
-    def close_file(self):
+    def save_and_wait(self):
         '''
-        Close File
+        Save File and Wait Until It Is on Disk
         '''
-        if self.editor.document().isModified():
-            reply = QMessageBox.question(self, "Save?", "Do you want to save before closing?",
-                                         QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
-            if reply == QMessageBox.Yes:
-                self.save_file()
-                self.close_file_helper()
-            elif reply == QMessageBox.No:
-                self.close_file_helper()
+        self.save_file()
+        self.wait_saving()
+
+    @PROFILER.timed('file.save')
+    def write_file(self, file_path):
+        '''
+        Write the Editor to a File, on a Worker Thread for Large Documents
+        '''
+        self.wait_saving()
+        document = self.editor.document()
+        if self.editor.buffer:
+            self.editor.commitWindow()
+            self.start_saving(file_path, self.editor.buffer.chunks())
+        elif document.characterCount() >= ASYNC_SAVE_SIZE:
+            self.streamer = DocumentStreamer(document, self.editor.encoding, self)
+            self.start_saving(file_path, self.streamer.chunks())
+            self.streamer.start()
         else:
-            self.close_file_helper()
+            try:
+                write_atomic(file_path, document_chunks(
+                    document, self.editor.encoding, ASYNC_SAVE_SIZE))
+            except (OSError, UnicodeEncodeError) as e:
+                QMessageBox.warning(self, "Warning", f"Cannot save file: {e}")
+                return
+            document.setModified(False)
+            self.updates.mark('title')
+            if self.symbols is not None:
+                self.symbols.file_saved(file_path)
 
-    def close_file_helper(self):
+    def start_saving(self, file_path, chunks):
         '''
-        Remove File Path, Clear Editor, and Update Title
+        Start a Saver Thread and Lock the Editor Until It Is Done
         '''
-        self.editor.path = None
-        self.editor.setPlainText("")
-        self.update_title()
+        self.save_started = perf_counter()
+        self.saver = FileSaver(file_path, chunks, self)
+        self.saver.finished.connect(self.saver_finished)
+        self.editor.setReadOnly(True)
+        self.show_message("Saving %s..." % file_path)
+        self.saver.start()
+
+    def saver_finished(self):
+        '''
+        Handle the End of the Current Saver Thread
+        '''
+        if self.sender() is self.saver:
+            self.end_saving()
+
+    def wait_saving(self):
+        '''
+        Block Until a Background Save Has Finished
+        '''
+        if self.saver is None:
+            return
+        if self.streamer is not None:
+            self.streamer.drain()
+        self.saver.wait()
+        self.end_saving()
+
+    def end_saving(self):
+        '''
+        Unlock the Editor and Report the Outcome of the Save
+        '''
+        saver = self.saver
+        self.saver = None
+        self.streamer = None
+        if PROFILER.enabled:
+            PROFILER.add_time('file.save_background', perf_counter() - self.save_started)
+        self.editor.setReadOnly(False)
+        if saver.error is not None:
+            QMessageBox.warning(
+                self, "Warning", f"Cannot save file: {saver.error}")
+            return
+        if self.editor.buffer:
+            self.editor.remapLargeFile(saver.path)
+        self.editor.document().setModified(False)
+        self.updates.mark('title', 'status')
+        if self.symbols is not None:
+            self.symbols.file_saved(saver.path)
+
+    def close_file(self):
+        '''
+        Close File
+        '''
+        self.close_tab(self.workspace.active)
 
     def close_folder(self):
         '''
-        Close Folder
+        Close Folder and the Tabs of Its Files
         '''
+        if self.dir is not None:
+            for index in reversed(self.tabs_under(self.dir)):
+                if not self.close_tab(index):
+                    return
+        self.wait_saving()
+        if self.find_panel is not None:
+            self.find_panel.set_root(None)
+        if self.model is not None:
+            self.model.setRootPath(None)
+            self.tree.hide()
+        if self.quick_open is not None:
+            self.quick_open.set_root(None)
+        if self.symbols is not None:
+            self.symbols.set_root(None)
+        if self.editor.completer is not None:
+            self.editor.completer.root = None
         self.dir = None
-        self.editor.path = None
-        self.editor.setPlainText("")
-        self.tree.hide()
-        self.update_title()
+        self.updates.mark('title')
+
+    def save_all(self):
+        '''
+        Save Every Modified Tab, Return Whether All of Them Were Saved
+        '''
+        self.store_tab()
+        for index, tab in enumerate(self.workspace.tabs):
+            if tab.is_modified():
+                self.tab_bar.setCurrentIndex(index)
+                self.save_and_wait()
+                if self.editor.document().isModified():
+                    return False
+        return True
 
     def quit_app(self):
         '''
         Quit Application
         '''
-        if self.editor.document().isModified():
+        self.store_tab()
+        if any(tab.is_modified() for tab in self.workspace.tabs):
             reply = QMessageBox.question(self, "Save?", "Do you want to save before quitting?",
                                          QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
             if reply == QMessageBox.Yes:
-                self.save_file()
-                self.close()
+                if self.save_all():
+                    self.close()
             elif reply == QMessageBox.No:
                 self.close()
         else:
             self.close()
 
+    def closeEvent(self, event):
+        '''
+        Finish Saving and Stop Loading Before the Window Closes
+        '''
+        self.wait_saving()
+        if self.find_panel is not None:
+            self.find_panel.cancel()
+        if self.quick_open is not None:
+            self.quick_open.set_root(None)
+            self.quick_open.wait_saved()
+        if self.symbols is not None:
+            self.symbols.set_root(None)
+        if self.model is not None:
+            self.model.close()
+        if self.terminal is not None:
+            self.terminal.close_session()
+        if self.loader is not None:
+            self.loader.requestInterruption()
+            self.loader.wait()
+        if self.hightlighter.semantic is not None:
+            self.hightlighter.semantic.cancel()
+        if self.editor.completer is not None:
+            self.editor.completer.close()
+        self.editor.closeLargeFile()
+        self.workspace.close()
+        super().closeEvent(event)
+
     def update_title(self):
         '''
         Update Title
@@ -345,15 +1059,34 @@ class MainWindow(QMainWindow):
         is_modified = "*" if self.editor.document().isModified() else ""
         self.setWindowTitle("%s%s - YSCODE" % (os.path.basename(self.editor.path)
                             if self.editor.path else "Untitled", is_modified))
+        if self.workspace.active is not None:
+            self.store_tab()
+            self.update_tab(self.workspace.active)
 
     def update_status_bar(self):
         '''
         Update Status Bar
         '''
-        self.statusBar().showMessage("%s | Line %d, Column %d" % (
+        message = "%s | Line %d, Column %d | %s" % (
             self.editor.path if self.editor.path else "Untitled",
-            self.editor.textCursor().blockNumber() + 1,
-            self.editor.textCursor().columnNumber() + 1))
+            self.editor.first_line + self.editor.textCursor().blockNumber() + 1,
+            self.editor.textCursor().columnNumber() + 1,
+            self.editor.encoding.upper())
+        if self.editor.window_locked:
+            message += " | Read-only: these lines do not encode back to the file"
+        if self.search.pattern is not None:
+            index = self.current_match()
+            message += " | %s of %d" % (
+                "?" if index is None else index + 1, self.search.count())
+        self.statusBar().showMessage(message)
+
+    def show_message(self, message):
+        '''
+        Show a Message in the Status Bar, After the Pending Updates So
+        That They Do Not Overwrite It
+        '''
+        self.updates.flush()
+        self.statusBar().showMessage(message)
 
     def show_info(self):
         '''
@@ -364,65 +1097,178 @@ class MainWindow(QMainWindow):
 
     def reset_fnd(self):
         '''
-        Set Find mode to False
+        Set Find mode to False once the cursor has left the found match
         '''
-        self.fnd = False
+        cursor = self.editor.textCursor()
+        if (cursor.selectionStart(), cursor.selectionEnd()) != self.fnd_selection:
+            self.fnd = False
+
+    @PROFILER.timed('find.index')
+    def update_search(self):
+        '''
+        Index the find bar text with the selected search modes
+        '''
+        pattern = None
+        if self.find_bar.text() != "":
+            try:
+                pattern = compile_pattern(self.find_bar.text(),
+                                          regex=self.regex_action.isChecked(),
+                                          case=self.case_action.isChecked(),
+                                          word=self.word_action.isChecked())
+            except re.error as e:
+                self.search.set_pattern(None)
+                self.show_message("Invalid pattern: %s" % e)
+                return
+        self.search.set_pattern(pattern)
+
+    def update_search_matches(self):
+        '''
+        Highlight the matches in the viewport
+        '''
+        self.editor.setSearchMatches(
+            self.search.between(*self.editor.visibleRange()))
+
+    def current_match(self):
+        '''
+        Return the index of the match selected in the editor, or None
+        '''
+        cursor = self.editor.textCursor()
+        return self.search.index_of(cursor.selectionStart(), cursor.selectionEnd())
+
+    def select_match(self, index):
+        '''
+        Select a match in the editor, return whether there was one
+        '''
+        if index is None:
+            return False
+        start, end = self.search.match(index)
+        cursor = self.editor.textCursor()
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.fnd_selection = (start, end)
+        return True
 
+    @PROFILER.timed('find.previous')
     def fnd_before(self):
         '''
         Find the previous text
         '''
-        if self.find_bar.text() != "":
-            if not self.editor.find(self.find_bar.text(), QTextDocument.FindBackward):
-                self.editor.moveCursor(QTextCursor.End)
-                if self.editor.find(self.find_bar.text(), QTextDocument.FindBackward):
-                    self.fnd = True
-                else:
-                    self.fnd = False
-            else:
-                self.fnd = True
+        cursor = self.editor.textCursor()
+        self.fnd = self.select_match(
+            self.search.previous_index(cursor.selectionStart()))
         return self.fnd
 
+    @PROFILER.timed('find.next')
     def fnd_next(self):
         '''
         Find the next text
         '''
-        if self.find_bar.text() != "":
-            if not self.editor.find(self.find_bar.text()):
-                self.editor.moveCursor(QTextCursor.Start)
-                if self.editor.find(self.find_bar.text()):
-                    self.fnd = True
-                else:
-                    self.fnd = False
-            else:
-                self.fnd = True
+        cursor = self.editor.textCursor()
+        self.fnd = self.select_match(
+            self.search.next_index(cursor.selectionEnd()))
         return self.fnd
 
+    @PROFILER.timed('replace.next')
     def rpl(self):
         '''
         Replace the text
         '''
-        if self.find_bar.text() != "" and self.fnd:
+        if self.editor.isReadOnly():
+            return
+        if self.fnd and self.current_match() is not None:
             self.editor.textCursor().insertText(self.replace_bar.text())
         self.fnd_next()
 
+    @PROFILER.timed('replace.all')
     def rpl_all(self):
         '''
-        Replace all the text
+        Replace all the text in a single edit block
         '''
-        if self.find_bar.text() != "":
-            while self.fnd_next():
-                self.editor.textCursor().insertText(self.replace_bar.text())
+        if self.search.pattern is None or self.editor.isReadOnly():
+            return
+        document = self.editor.document()
+        try:
+            edits = replacements(
+                self.search.pattern,
+                document_text(document, 0, document.characterCount() - 1),
+                self.replace_bar.text(), self.regex_action.isChecked())
+        except re.error as e:
+            self.show_message("Invalid replacement: %s" % e)
+            return
+        if not edits:
+            return
+        # Going backwards keeps the positions of the remaining matches valid
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        for start, end, text in reversed(edits):
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.KeepAnchor)
+            cursor.insertText(text)
+        cursor.endEditBlock()
+        self.show_message("Replaced %d occurrences" % len(edits))
+
+    def complete(self):
+        '''
+        Show the Completions at the Cursor
+        '''
+        if self.editor.completer is not None:
+            self.editor.completer.complete()
 
     def jump(self):
         '''
-        Jump to the line
+        Jump to the line, accepting line, line:column and @offset
         '''
-        if self.jump_bar.text() != "" and self.jump_bar.text().isdigit():
-            self.editor.moveCursor(QTextCursor.Start)
-            for _ in range(int(self.jump_bar.text()) - 1):
-                self.editor.moveCursor(QTextCursor.Down)
-            self.editor.moveCursor(QTextCursor.StartOfLine)
+        text = self.jump_bar.text().strip()
+        if text.startswith("@") and text[1:].isdigit():
+            self.editor.goToOffset(int(text[1:]))
+            return
+        line, _, column = text.partition(":")
+        if line.isdigit() and (column == "" or column.isdigit()):
+            self.editor.goToLine(int(line), int(column) if column else 1)
+
+    def tree_expanded(self, index):
+        '''
+        Watch an Expanded Folder and Its Subfolders That Are Still Expanded
+        '''
+        stack = [index]
+        while stack:
+            index = stack.pop()
+            self.model.watch(index)
+            for row in range(self.model.rowCount(index)):
+                child = self.model.index(row, 0, index)
+                if self.tree.isExpanded(child):
+                    stack.append(child)
+
+    def show_tree_stats(self):
+        '''
+        Show the Number of Listed Files and Watched Folders
+        '''
+        self.ensure_tree()
+        stats = self.model.stats()
+        QMessageBox.information(
+            self, "File Tree", "%d files and folders listed<br>%d folders watched<br>%.1f KB of memory" % (
+                stats['nodes'], stats['watched'], stats['memory_bytes'] / 1024))
+
+    def show_performance(self):
+        '''
+        Show the Slowest Hot Paths and the Latency Histograms, with Every
+        Number as JSON in the Details
+        '''
+        stats = PROFILER.stats()
+        lines = []
+        if not stats['enabled']:
+            lines.append("Recording is off, turn on View > Record Performance")
+        timers = sorted(stats['timers'].items(), key=lambda item: -item[1]['total_ms'])
+        for name, timer in timers[:8]:
+            lines.append("%s: %d runs, %.1f ms total, %.2f ms max" % (
+                name, timer['count'], timer['total_ms'], timer['max_ms']))
+        for name, histogram in stats['histograms'].items():
+            lines.append("%s: p50 %s ms, p99 %s ms over %d" % (
+                name, histogram['p50_ms'], histogram['p99_ms'], histogram['count']))
+        box = QMessageBox(QMessageBox.Information, "Performance", "<br>".join(lines), parent=self)
+        box.setDetailedText(json.dumps(stats, indent=4))
+        box.exec_()
 
     def show_tree_menu(self, pos):
         '''
@@ -481,19 +1327,13 @@ class MainWindow(QMainWindow):
         '''
         Move File or Folder in Tree Menu
         '''
-        is_open = False
-        sub_path = None
         dir_path = QFileDialog.getExistingDirectory(self, 'Open Folder')
 
         if dir_path:
             file_path = self.model.filePath(index)
-            is_folder = QFileInfo(file_path).isDir()
-
-            if self.editor.path == file_path or self.editor.path.startswith(file_path + os.sep):
-                is_open = True
-                sub_path = self.editor.path[len(file_path):]
+            if self.workspace.active in self.tabs_under(file_path):
                 if self.editor.document().isModified():
-                    self.save_file()
+                    self.save_and_wait()
             
             file_name = os.path.basename(file_path)
             new_file_path = os.path.join(dir_path, file_name)
@@ -502,45 +1342,30 @@ class MainWindow(QMainWindow):
                     self, 'Warning', 'Name already exists!', QMessageBox.Ok)
             else:
                 shutil.move(file_path, new_file_path)
-                if is_open:
-                    if is_folder:
-                        self.editor.path = new_file_path + sub_path
-                    else:
-                        self.editor.path = new_file_path
-                    self.update_title()
-                    self.update_status_bar()
+                self.retarget_tabs(file_path, new_file_path)
 
     def delete_file_or_folder(self, index):
         '''
         Delete File or Folder in Tree Menu
         '''
-        is_open = False
         reply = QMessageBox.question(
             self, 'Delete', 'Are you sure to delete the selected file/folder?', QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
             file_path = self.model.filePath(index)
-            if self.editor.path == file_path or self.editor.path.startswith(file_path + os.sep):
-                is_open = True
+            open_tabs = self.tabs_under(file_path)
             
             self.model.remove(index)
-            if is_open:
-                self.editor.path = None
-                self.editor.setPlainText('')
-                self.update_title()
-                self.update_status_bar()
+            for tab_index in reversed(open_tabs):
+                self.remove_tab(tab_index)
 
     def rename_file_or_folder(self, index):
         '''
         Rename File or Folder in Tree Menu
         '''
-        is_open = False
-        sub_path = None
         file_path = self.model.filePath(index)
-        if self.editor.path == file_path or self.editor.path.startswith(file_path + os.sep):
-            is_open = True
-            sub_path = self.editor.path[len(file_path):]
+        if self.workspace.active in self.tabs_under(file_path):
             if self.editor.document().isModified():
-                self.save_file()
+                self.save_and_wait()
         
         is_folder = QFileInfo(file_path).isDir()
         fn = os.path.basename(file_path)
@@ -556,15 +1381,9 @@ class MainWindow(QMainWindow):
             try:
                 if is_folder:
                     os.rename(file_path, new_file_path)
-                    if is_open:
-                        self.editor.path = new_file_path + sub_path
                 else:
                     shutil.move(file_path, new_file_path)
-                    if is_open:
-                        self.editor.path = new_file_path
-                if is_open:
-                    self.update_title()
-                    self.update_status_bar()
+                self.retarget_tabs(file_path, new_file_path)
 
             except OSError as e:
                 QMessageBox.warning(self, "Error", f"Failed to rename: {e}")
@@ -573,16 +1392,102 @@ class MainWindow(QMainWindow):
         '''
         Display or hide the sidebar
         '''
-        if self.tree.isVisible():
-            self.tree.hide()
+        tree = self.ensure_tree()
+        if tree.isVisible():
+            tree.hide()
         else:
-            self.tree.show()
+            tree.show()
 
     def toggle_terminal(self):
         '''
         Display or hide the terminal
         '''
-        if self.terminal.isVisible():
-            self.terminal.hide()
+        terminal = self.ensure_terminal()
+        if terminal.isVisible():
+            terminal.hide()
+        else:
+            terminal.show()
+
+    def toggle_find_panel(self):
+        '''
+        Display or hide the find in folder panel
+        '''
+        find_panel = self.ensure_find_panel()
+        if find_panel.isVisible():
+            find_panel.hide()
+        else:
+            find_panel.show()
+            find_panel.query_input.setFocus()
+
+    def show_quick_open(self):
+        '''
+        Show the Quick Open Palette
+        '''
+        self.ensure_quick_open().popup()
+
+    def toggle_outline(self):
+        '''
+        Display or hide the outline of the current file
+        '''
+        outline = self.ensure_outline()
+        if outline.isVisible():
+            outline.hide()
+        else:
+            outline.show()
+
+    def show_go_to_symbol(self):
+        '''
+        Show the Go to Symbol Palette
+        '''
+        self.ensure_go_to_symbol().popup()
+
+    def open_symbol(self, file_path, line, column):
+        '''
+        Open the File of a Symbol at Its Line, the Current File for No Path
+        '''
+        if file_path:
+            self.open_file_at(file_path, line, column)
+        else:
+            self.open_symbol_here(line, column)
+
+    def open_symbol_here(self, line, column):
+        '''
+        Move the Cursor to a Symbol of the Current File
+        '''
+        self.editor.goToLine(line, column)
+        self.editor.setFocus()
+
+    def current_symbols(self):
+        '''
+        Return the Symbols of the Current File, From the Outline When It Is Up to Date
+        '''
+        if self.editor.buffer is not None or self.editor.display_welcome:
+            return []
+        if self.outline is not None and self.outline.is_current():
+            return self.outline.symbols
+        from utils.symbols import extract_symbols
+        return extract_symbols(self.editor.toPlainText())
+
+    def go_to_definition(self):
+        '''
+        Go to the Definition of the Name Under the Cursor, in the Current File First
+        '''
+        cursor = self.editor.textCursor()
+        cursor.select(QTextCursor.WordUnderCursor)
+        name = cursor.selectedText()
+        if not name.isidentifier():
+            return
+        path = os.path.abspath(self.editor.path) if self.editor.path else None
+        found = [(symbol, kind, None, line, column, container)
+                 for symbol, kind, line, column, container in self.current_symbols()
+                 if symbol == name]
+        if self.dir is not None:
+            found += [symbol for symbol in self.ensure_symbols().definitions(name)
+                      if symbol[2] != path]
+        if not found:
+            self.show_message("No definition of %s found" % name)
+        elif len(found) == 1:
+            _, _, file_path, line, column, _ = found[0]
+            self.open_symbol(file_path, line, column)
         else:
-            self.terminal.show()
+            self.ensure_go_to_symbol().show_definitions(name, found)
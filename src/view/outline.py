@@ -0,0 +1,151 @@
+'''
+Outline of the symbols of the current file
+'''
+
+from concurrent.futures.process import BrokenProcessPool
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from utils.grep import executor, reset_executor
+from utils.symbols import extract_symbols
+
+
+class OutlinePanel(QWidget):
+    '''
+    Outline panel class
+
+    The text of the editor is parsed in the process pool shortly after
+    it stops changing, while the panel is shown. A result is dropped when
+    the text changed again in the meantime.
+    '''
+    DELAY = 500
+
+    jump_requested = pyqtSignal(int, int)
+    parsed = pyqtSignal(int, list)
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.revision = 0
+        self.symbols = []
+        self.symbols_revision = -1
+        self.future = None
+        self.status = QLabel()
+        self.tree = QTreeWidget()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DELAY)
+
+        main_layout = QVBoxLayout()
+        main_layout.addWidget(self.status)
+        main_layout.addWidget(self.tree)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(main_layout)
+        self.initUI()
+
+        self.timer.timeout.connect(self.start)
+        self.parsed.connect(self.show_symbols)
+        self.editor.textChanged.connect(self.schedule)
+        self.tree.itemActivated.connect(self.open_item)
+
+    def initUI(self):
+        '''
+        Initialize UI
+        '''
+        self.status.setStyleSheet("color: rgb(143, 149, 162);")
+        self.tree.setHeaderHidden(True)
+        self.tree.setUniformRowHeights(True)
+        self.tree.setStyleSheet("background-color: rgb(34, 37, 42);\
+            color: rgb(154, 159, 170);")
+
+    def schedule(self):
+        '''
+        Parse the text again once it stops changing
+        '''
+        self.revision += 1
+        if self.isVisible():
+            self.timer.start()
+
+    def showEvent(self, event):
+        '''
+        Catch up with the changes made while hidden
+        '''
+        super().showEvent(event)
+        if self.symbols_revision != self.revision:
+            self.timer.start(0)
+
+    def is_current(self):
+        '''
+        Return whether the symbols are those of the current text
+        '''
+        return self.symbols_revision == self.revision
+
+    def start(self):
+        '''
+        Send the text to the process pool
+        '''
+        if self.editor.buffer is not None:
+            self.status.setText("No outline in large-file mode")
+            self.tree.clear()
+            return
+        if self.future is not None and not self.future.done():
+            # Parsed again once the running parse is done
+            return
+        revision = self.revision
+        try:
+            self.future = executor().submit(extract_symbols, self.editor.toPlainText())
+        except (BrokenProcessPool, RuntimeError):
+            reset_executor()
+            self.status.setText("Cannot parse in the background")
+            return
+        # Runs on a thread of the pool, the signal is queued to the panel
+        self.future.add_done_callback(lambda future: self.finish(future, revision))
+
+    def finish(self, future, revision):
+        '''
+        Hand the result of a parse over to the GUI thread
+        '''
+        try:
+            symbols = future.result()
+        except BrokenProcessPool:
+            reset_executor()
+            symbols = []
+        except Exception:
+            # Such as a RecursionError on deeply nested code
+            symbols = []
+        self.parsed.emit(revision, symbols)
+
+    def show_symbols(self, revision, symbols):
+        '''
+        Fill the tree with the symbols of the parsed revision
+        '''
+        if revision != self.revision:
+            if self.isVisible():
+                self.timer.start()
+            return
+        self.symbols = symbols
+        self.symbols_revision = revision
+        self.tree.setUpdatesEnabled(False)
+        self.tree.clear()
+        items = {}
+        for name, kind, line, column, container in symbols:
+            if kind == 'variable':
+                text = name
+            else:
+                text = "%s %s" % ('class' if kind == 'class' else 'def', name)
+            parent = items.get(container)
+            item = QTreeWidgetItem([text]) if parent is None else QTreeWidgetItem(parent, [text])
+            item.setData(0, Qt.UserRole, (line, column))
+            item.setToolTip(0, "%s, line %d" % (kind, line))
+            if parent is None:
+                self.tree.addTopLevelItem(item)
+            items[container + '.' + name if container else name] = item
+        self.tree.expandAll()
+        self.tree.setUpdatesEnabled(True)
+        self.status.setText("%d symbols" % len(symbols))
+
+    def open_item(self, item, column):
+        '''
+        Ask to move the cursor to a symbol
+        '''
+        line, column = item.data(0, Qt.UserRole)
+        self.jump_requested.emit(line, column)
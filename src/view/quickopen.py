@@ -0,0 +1,207 @@
+'''
+Quick open palette
+'''
+
+import os
+from time import monotonic
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QListWidget, QLabel
+from PyQt5.QtCore import Qt, QEvent, pyqtSignal
+from utils.quickopen import IndexBuilder, IndexSaver
+
+
+class QuickOpen(QWidget):
+    '''
+    Quick open palette class
+
+    Matches the typed text against the path index of the opened folder.
+    The index is loaded from the cache when the folder is opened, rebuilt
+    in the background and kept current from the file tree's watch events.
+    '''
+    LIMIT = 50
+    REFRESH_AFTER = 60
+
+    open_requested = pyqtSignal(str)
+
+    def __init__(self, parent):
+        super().__init__(parent, Qt.Popup)
+        self.root = None
+        self.index = None
+        self.builder = None
+        self.saver = None
+        self.built_at = 0
+        self.query_input = QLineEdit()
+        self.results = QListWidget()
+        self.status = QLabel()
+
+        main_layout = QVBoxLayout()
+        main_layout.addWidget(self.query_input)
+        main_layout.addWidget(self.results)
+        main_layout.addWidget(self.status)
+        char_width = self.fontMetrics().averageCharWidth()
+        main_layout.setContentsMargins(char_width, char_width, char_width, char_width)
+        self.setLayout(main_layout)
+        self.initUI()
+
+        self.query_input.textChanged.connect(self.update_results)
+        self.query_input.returnPressed.connect(self.open_current)
+        self.query_input.installEventFilter(self)
+        self.results.itemActivated.connect(self.open_item)
+
+    def initUI(self):
+        '''
+        Initialize UI
+        '''
+        self.setStyleSheet("background-color: rgb(34, 37, 42);\
+            color: rgb(154, 159, 170);")
+        self.query_input.setStyleSheet("background-color: rgb(29, 31, 35);\
+            color: rgb(171, 177, 189);\
+            border: 1px solid rgb(63, 68, 81);")
+        self.query_input.setPlaceholderText("Search files by name")
+        self.results.setUniformItemSizes(True)
+        self.status.setStyleSheet("color: rgb(143, 149, 162);")
+
+    def set_root(self, root):
+        '''
+        Index another folder, None when no folder is open
+        '''
+        self.cancel()
+        self.save()
+        self.root = root
+        self.index = None
+        self.built_at = 0
+        if root is not None:
+            self.rebuild(use_cache=True)
+
+    def rebuild(self, use_cache=False):
+        '''
+        Walk the folder again in the background
+        '''
+        if self.builder is not None or self.root is None:
+            return
+        self.builder = IndexBuilder(self.root, use_cache, self)
+        self.builder.built.connect(self.set_index)
+        self.builder.finished.connect(self.builder_finished)
+        self.builder.start()
+
+    def set_index(self, index):
+        '''
+        Use a loaded or freshly built index
+        '''
+        if self.sender() is not self.builder:
+            return
+        self.index = index
+        self.built_at = monotonic()
+        if self.isVisible():
+            self.update_results()
+
+    def builder_finished(self):
+        '''
+        Release the finished builder
+        '''
+        if self.sender() is self.builder:
+            self.builder = None
+
+    def cancel(self):
+        '''
+        Stop building the index
+        '''
+        if self.builder is not None:
+            self.builder.requestInterruption()
+            self.builder.wait()
+            self.builder = None
+
+    def save(self):
+        '''
+        Save the index in the background when the watcher changed it after
+        it was built, which the builder saved. It must not change any more.
+        '''
+        if self.index is None or not self.index.changed:
+            return
+        self.wait_saved()
+        self.saver = IndexSaver(self.index, self)
+        self.saver.start()
+
+    def wait_saved(self):
+        '''
+        Wait until the index is saved
+        '''
+        if self.saver is not None:
+            self.saver.wait()
+            self.saver = None
+
+    def popup(self):
+        '''
+        Show the palette at the top of the parent window
+        '''
+        if self.root is None:
+            return
+        parent = self.parentWidget()
+        width = min(600, parent.width() - 40)
+        top_left = parent.mapToGlobal(parent.rect().topLeft())
+        self.setGeometry(top_left.x() + (parent.width() - width) // 2,
+                         top_left.y() + 60, width, 360)
+        self.query_input.selectAll()
+        self.show()
+        self.query_input.setFocus()
+        if monotonic() - self.built_at > self.REFRESH_AFTER:
+            self.rebuild()
+        self.update_results()
+
+    def update_results(self):
+        '''
+        List the best matches of the query
+        '''
+        self.results.clear()
+        if self.index is None:
+            self.status.setText("Indexing %s..." % self.root)
+            return
+        self.results.addItems(self.index.query(self.query_input.text(), self.LIMIT))
+        self.results.setCurrentRow(0)
+        self.status.setText("%d files indexed" % len(self.index))
+
+    def eventFilter(self, obj, event):
+        '''
+        Move through the results with the arrow keys while typing
+        '''
+        if obj is self.query_input and event.type() == QEvent.KeyPress:
+            step = {Qt.Key_Up: -1, Qt.Key_Down: 1}.get(event.key())
+            if step is not None and self.results.count():
+                row = (self.results.currentRow() + step) % self.results.count()
+                self.results.setCurrentRow(row)
+                return True
+            if event.key() == Qt.Key_Escape:
+                self.hide()
+                return True
+        return super().eventFilter(obj, event)
+
+    def open_current(self):
+        '''
+        Open the selected result
+        '''
+        item = self.results.currentItem()
+        if item is not None:
+            self.open_item(item)
+
+    def open_item(self, item):
+        '''
+        Ask to open the file of a result
+        '''
+        self.hide()
+        self.open_requested.emit(os.path.join(self.root, item.text()))
+
+    def directory_changed(self, path, added, removed):
+        '''
+        Apply the entries added to and removed from a folder of the project
+        '''
+        if self.index is None or self.root is None:
+            return
+        relative = os.path.relpath(path, self.root).replace(os.sep, '/')
+        prefix = '' if relative == '.' else relative + '/'
+        for name, _ in removed:
+            self.index.remove(prefix + name)
+        for name, is_dir in added:
+            if is_dir:
+                # The new folder may already hold files
+                self.rebuild()
+            else:
+                self.index.add(prefix + name)
@@ -2,23 +2,74 @@
 Simulate a terminal in a widget
 '''
 
+import codecs
 import os
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QTextEdit
-from PyQt5.QtGui import QFont, QTextCursor
-from PyQt5.QtCore import QProcess
+import shlex
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPlainTextEdit
+from PyQt5.QtGui import QFont, QTextCursor, QTextCharFormat, QColor
+from PyQt5.QtCore import Qt, QEvent, QProcess, QTimer
+from utils import shell
+from utils.ansi import Screen
+from utils.profiler import PROFILER
+from utils.shell import ShellSession
+
+# Lines of output kept by default
+SCROLLBACK = 10000
+# Milliseconds between two flushes of the output to the widget
+FRAME = 16
+FOREGROUND = (171, 177, 189)
+BACKGROUND = (29, 31, 35)
+# The 16 basic colours, normal then bright
+ANSI_COLOURS = [(40, 44, 52), (224, 108, 117), (152, 195, 121), (229, 192, 123),
+                (97, 175, 239), (198, 120, 221), (86, 182, 194), (171, 177, 189),
+                (92, 99, 112), (240, 135, 143), (179, 221, 145), (240, 210, 150),
+                (130, 195, 250), (220, 150, 240), (120, 210, 220), (220, 223, 228)]
+
+
+def palette_colour(index):
+    '''
+    Return the QColor of an entry of the 256 colour palette
+    '''
+    if index < 16:
+        return QColor(*ANSI_COLOURS[index])
+    if index < 232:
+        index -= 16
+        levels = [0 if value == 0 else 55 + value * 40
+                  for value in (index // 36, index // 6 % 6, index % 6)]
+        return QColor(*levels)
+    grey = 8 + (index - 232) * 10
+    return QColor(grey, grey, grey)
 
 
 class Terminal(QWidget):
     '''
     Simulate terminal class
+
+    Commands run in one long-lived shell on a pseudo-terminal, started the
+    first time the terminal is shown; without pseudo-terminals every
+    command runs in a process of its own.
+    Command output goes through a Screen, which interprets the escape
+    sequences and keeps at most scrollback lines, and is written to the
+    widget at most once per frame, which keeps the same number of lines.
+    The last lines, where the cursor can still move, are written again on
+    every flush.
     '''
 
-    def __init__(self):
+    def __init__(self, scrollback=SCROLLBACK):
         super().__init__()
         self.command_input = QLineEdit()
-        self.output_text = QTextEdit()
+        self.output_text = QPlainTextEdit()
         self.output_text.setReadOnly(True)
+        self.screen = Screen(scrollback=scrollback)
+        self.screen_start = 0
+        self.formats = {}
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FRAME)
+        self.set_scrollback(scrollback)
         self.current_directory = os.path.expanduser('~')
+        self.session = None
+        self.decoder = None
 
         input_layout = QHBoxLayout()
         input_layout.addWidget(self.command_input)
@@ -34,6 +85,9 @@ class Terminal(QWidget):
         self.initUI()
 
         self.command_input.returnPressed.connect(self.run_command)
+        self.command_input.installEventFilter(self)
+        self.output_text.viewport().installEventFilter(self)
+        self.flush_timer.timeout.connect(self.flush_output)
 
     def initUI(self):
         '''
@@ -44,15 +98,118 @@ class Terminal(QWidget):
         font.setFixedPitch(True)
         self.command_input.setFont(font)
         self.output_text.setFont(font)
-        self.output_text.setLineWrapMode(QTextEdit.NoWrap)
+        self.output_text.setLineWrapMode(QPlainTextEdit.NoWrap)
         self.command_input.setStyleSheet("background-color: rgb(29, 31, 35);\
             color: rgb(171, 177, 189);\
             border: 1px solid rgb(34, 37, 42);")
         self.output_text.setStyleSheet("background-color: rgb(29, 31, 35);\
             color: rgb(171, 177, 189);")
         self.command_input.setPlaceholderText(
-            "Enter command here... (Press Enter to run)")
+            "Enter command here... (Press Enter to run, Ctrl+C to interrupt)")
         self.output_text.setReadOnly(True)
+        self.output_text.setUndoRedoEnabled(False)
+
+    def set_scrollback(self, lines):
+        '''
+        Set the number of lines of output kept
+        '''
+        self.screen.scrollback = lines
+        self.output_text.setMaximumBlockCount(lines)
+
+    def start_session(self):
+        '''
+        Start the shell if it is not running, return whether it runs
+        '''
+        if self.session is not None and self.session.running():
+            return True
+        if not shell.supported():
+            return False
+        self.session = ShellSession(self)
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.session.output.connect(self.handle_shell_output)
+        self.session.finished.connect(self.session_finished)
+        rows, columns = self.terminal_size()
+        self.screen.resize(rows)
+        try:
+            self.session.start(self.current_directory, rows, columns)
+        except OSError as error:
+            self.session = None
+            self.write_output(f'Cannot start the shell: {error}\n')
+            return False
+        return True
+
+    def close_session(self):
+        '''
+        End the shell
+        '''
+        if self.session is not None:
+            self.session.close()
+
+    def session_finished(self, status):
+        '''
+        Forget the shell once it has exited, the next command starts another
+        '''
+        if self.sender() is not self.session:
+            return
+        self.write_output(self.decoder.decode(b'', True))
+        self.write_output(f'\n[Shell exited with status {status}]\n')
+        self.session = None
+
+    @PROFILER.timed('terminal.output')
+    def handle_shell_output(self, data):
+        '''
+        Queue the output of the shell
+        '''
+        PROFILER.count('terminal.bytes', len(data))
+        self.write_output(self.decoder.decode(data))
+
+    def terminal_size(self):
+        '''
+        Return the (rows, columns) of text the output box can show
+        '''
+        metrics = self.output_text.fontMetrics()
+        viewport = self.output_text.viewport()
+        return (max(viewport.height() // max(metrics.lineSpacing(), 1), 1),
+                max(viewport.width() // max(metrics.averageCharWidth(), 1), 1))
+
+    def set_directory(self, path):
+        '''
+        Change the working directory, of the shell too when it is waiting
+        for a command
+        '''
+        self.current_directory = path
+        if self.session is not None and self.session.idle():
+            self.session.write(f' cd -- {shlex.quote(path)}\n'.encode())
+
+    def showEvent(self, event):
+        '''
+        Start the shell when the terminal is first shown
+        '''
+        super().showEvent(event)
+        self.start_session()
+
+    def eventFilter(self, obj, event):
+        '''
+        Send Ctrl+C and Ctrl+D typed in the command line to the shell and
+        tell it the new size of the output box
+        '''
+        if obj is self.output_text.viewport() and event.type() == QEvent.Resize:
+            rows, columns = self.terminal_size()
+            self.screen.resize(rows)
+            if self.session is not None:
+                self.session.resize(rows, columns)
+            self.schedule_flush()
+            return False
+        if (obj is self.command_input and event.type() == QEvent.KeyPress
+                and event.modifiers() == Qt.ControlModifier
+                and self.session is not None):
+            if event.key() == Qt.Key_C and not self.command_input.hasSelectedText():
+                self.session.interrupt()
+                return True
+            if event.key() == Qt.Key_D and not self.command_input.text():
+                self.session.end_of_file()
+                return True
+        return super().eventFilter(obj, event)
 
     def run_command(self):
         '''
@@ -61,10 +218,15 @@ class Terminal(QWidget):
         command = self.command_input.text()
         self.command_input.clear()
         if command == "clear":
-            self.output_text.clear()
+            self.screen.clear()
+            self.schedule_flush()
+            return
+        if self.start_session():
+            # The terminal echoes the line itself
+            self.session.write((command + '\n').encode('utf-8'))
             return
-        self.output_text.append(
-            f'$ {os.path.basename(self.current_directory)}> {command}\n')
+        self.write_output(
+            f'$ {os.path.basename(self.current_directory)}> {command}\n\n')
 
         if command.startswith('cd'):
             self.handle_cd(command)
@@ -79,18 +241,17 @@ class Terminal(QWidget):
             os.chdir(command[3:])
             self.current_directory = os.getcwd()
         except FileNotFoundError:
-            self.output_text.append(
-                f'No such file or directory: {command[3:]}\n')
+            self.write_output(
+                f'No such file or directory: {command[3:]}\n\n')
         except NotADirectoryError:
-            self.output_text.append(f'Not a directory: {command[3:]}\n')
+            self.write_output(f'Not a directory: {command[3:]}\n\n')
         except PermissionError:
-            self.output_text.append(f'Permission denied: {command[3:]}\n')
+            self.write_output(f'Permission denied: {command[3:]}\n\n')
         except:
-            self.output_text.append(f'Error: {command[3:]}\n')
+            self.write_output(f'Error: {command[3:]}\n\n')
         finally:
-            self.output_text.append(
-                f'Current directory: {self.current_directory}\n')
-        self.output_text.moveCursor(QTextCursor.End)
+            self.write_output(
+                f'Current directory: {self.current_directory}\n\n')
 
     def handle_command(self, command):
         '''
@@ -104,23 +265,108 @@ class Terminal(QWidget):
             process.setProgram('/bin/bash')
             process.setArguments(['-c', command])
         process.setWorkingDirectory(self.current_directory)
+        # Characters split between two reads are completed by the next one
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
         process.readyReadStandardOutput.connect(
-            lambda: self.handle_output(process))
+            lambda: self.handle_output(process, decoder))
         process.readyReadStandardError.connect(
-            lambda: self.handle_output(process))
+            lambda: self.handle_output(process, decoder))
+        process.finished.connect(
+            lambda: self.write_output(decoder.decode(b'', True)))
         process.finished.connect(lambda: process.deleteLater())
         process.start()
+        return process
 
-    def handle_output(self, process):
+    @PROFILER.timed('terminal.output')
+    def handle_output(self, process, decoder):
         '''
-        Print output on text box
+        Queue the output of a process
         '''
         data = process.readAllStandardOutput()
         data += process.readAllStandardError()
-        output = str(data, encoding='utf-8')
-        self.output_text.insertPlainText(output)
-        self.output_text.moveCursor(QTextCursor.End)
+        PROFILER.count('terminal.bytes', len(data))
+        self.write_output(decoder.decode(bytes(data)))
 
+    def write_output(self, text):
+        '''
+        Interpret text, it is shown by the next flush
+        '''
+        self.screen.feed(text)
+        self.schedule_flush()
+
+    def schedule_flush(self):
+        '''
+        Flush the screen at the next frame if it changed
+        '''
+        if self.screen.changed and not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def char_format(self, style):
+        '''
+        Return the QTextCharFormat of a Style
+        '''
+        text_format = self.formats.get(style)
+        if text_format is not None:
+            return text_format
+        text_format = QTextCharFormat()
+        foreground, background = style.foreground, style.background
+        if isinstance(foreground, int) and foreground < 8 and style.bold:
+            foreground += 8
+        if style.inverse:
+            foreground, background = (BACKGROUND if background is None else background,
+                                      FOREGROUND if foreground is None else foreground)
+        for colour, setter in ((foreground, text_format.setForeground),
+                               (background, text_format.setBackground)):
+            if isinstance(colour, int):
+                setter(palette_colour(colour))
+            elif colour is not None:
+                setter(QColor(*colour))
+        if style.bold:
+            text_format.setFontWeight(QFont.Bold)
+        text_format.setFontItalic(style.italic)
+        text_format.setFontUnderline(style.underline)
+        self.formats[style] = text_format
+        return text_format
+
+    @PROFILER.timed('terminal.flush')
+    def flush_output(self):
+        '''
+        Append the lines scrolled out of the screen and write the screen
+        again, one insertion per run of the same style
+        '''
+        if not self.screen.changed:
+            return
+        cleared, scrolled, lines = self.screen.take()
+        scrollbar = self.output_text.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        document = self.output_text.document()
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        if not cleared:
+            cursor.setPosition(min(self.screen_start, document.characterCount() - 1))
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        # Dropping the oldest lines in one removal before inserting is much
+        # cheaper than letting the maximum block count drop them one by one
+        added = sum(text.count('\n') for text, _ in scrolled + lines)
+        excess = document.blockCount() + added - self.screen.scrollback
+        if excess > 0:
+            if excess >= document.blockCount():
+                cursor.select(QTextCursor.Document)
+            else:
+                cursor.setPosition(0)
+                cursor.setPosition(document.findBlockByNumber(excess).position(),
+                                   QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+            cursor.movePosition(QTextCursor.End)
+        for text, style in scrolled:
+            cursor.insertText(text, self.char_format(style))
+        self.screen_start = cursor.position()
+        for text, style in lines:
+            cursor.insertText(text, self.char_format(style))
+        cursor.endEditBlock()
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
 
 if __name__ == "__main__":
     app = QApplication([])
@@ -0,0 +1,299 @@
+'''
+Open documents of the main window, within a memory budget
+'''
+
+import os
+import tempfile
+from PyQt5.QtCore import QObject
+from PyQt5.QtGui import QTextDocument
+from PyQt5.QtWidgets import QPlainTextDocumentLayout
+from utils.fileio import FileLoader, detect_encoding, document_chunks, read_text
+from utils.utils import DATA_DIR
+
+SWAP_DIR = os.path.join(DATA_DIR, 'swap')
+
+
+class DocumentTab:
+    '''
+    One open document
+
+    document is None while the tab is evicted. Its text is then in the
+    swap file when it had unsaved changes, and in the file at path
+    otherwise. Large files keep their piece table in buffer, and their
+    window is read again from it on activation.
+    '''
+    __slots__ = ('path', 'encoding', 'document', 'swap', 'modified',
+                 'buffer', 'first_line', 'anchor', 'position', 'scroll',
+                 'used')
+
+    def __init__(self, document=None, path=None):
+        self.path = path
+        self.encoding = 'utf-8'
+        self.document = document
+        self.swap = None
+        self.modified = False
+        self.buffer = None
+        self.first_line = 0
+        self.anchor = 0
+        self.position = 0
+        self.scroll = 0
+        self.used = 0
+
+    def title(self):
+        '''
+        Return the text of the tab
+        '''
+        name = os.path.basename(self.path) if self.path else "Untitled"
+        return name + ("*" if self.is_modified() else "")
+
+    def is_modified(self):
+        '''
+        Return whether the tab has unsaved changes
+        '''
+        if self.document is not None and self.buffer is None:
+            return self.document.isModified()
+        return self.modified
+
+
+class Workspace(QObject):
+    '''
+    The tabs of the main window and their documents
+
+    All documents share one editor and one highlighter, only the active
+    one is shown. When the estimated size of the documents exceeds the
+    budget, the least recently used inactive ones are dropped together
+    with their highlighting, and read again when they are activated.
+    '''
+    BUDGET = 256 << 20
+    # Estimated from a highlighted 20k line document: UTF-16 text plus
+    # the block, its layout and its format ranges
+    CHAR_COST = 2
+    BLOCK_COST = 640
+
+    def __init__(self, budget=BUDGET, parent=None):
+        super().__init__(parent)
+        self.budget = budget
+        self.tabs = []
+        self.active = None
+        self.clock = 0
+        self.evictions = 0
+        self.restores = 0
+
+    def new_document(self, text=''):
+        '''
+        Return an empty plain text document owned by the workspace
+        '''
+        document = QTextDocument(self)
+        document.setDocumentLayout(QPlainTextDocumentLayout(document))
+        if text:
+            document.setPlainText(text)
+        return document
+
+    def add(self, tab, index=None):
+        '''
+        Insert a tab, at the end by default, return its index
+        '''
+        if index is None:
+            index = len(self.tabs)
+        self.tabs.insert(index, tab)
+        if self.active is not None and index <= self.active:
+            self.active += 1
+        return index
+
+    def remove(self, index):
+        '''
+        Close a tab and free its document, its piece table and its swap file
+        '''
+        tab = self.tabs.pop(index)
+        if self.active == index:
+            self.active = None
+        elif self.active is not None and index < self.active:
+            self.active -= 1
+        if tab.document is not None:
+            tab.document.deleteLater()
+            tab.document = None
+        if tab.buffer is not None:
+            tab.buffer.close()
+            tab.buffer = None
+        self.drop_swap(tab)
+        return tab
+
+    def move(self, source, target):
+        '''
+        Follow a tab dragged from source to target
+        '''
+        tab = self.tabs.pop(source)
+        self.tabs.insert(target, tab)
+        if self.active is not None:
+            active = self.active
+            if active == source:
+                self.active = target
+            elif source < active <= target:
+                self.active = active - 1
+            elif target <= active < source:
+                self.active = active + 1
+
+    def current(self):
+        '''
+        Return the active tab, or None
+        '''
+        return None if self.active is None else self.tabs[self.active]
+
+    def index_of(self, path):
+        '''
+        Return the index of the tab of a file, or None
+        '''
+        path = os.path.abspath(path)
+        for index, tab in enumerate(self.tabs):
+            if tab.path is not None and os.path.abspath(tab.path) == path:
+                return index
+        return None
+
+    def touch(self, tab):
+        '''
+        Mark a tab as the most recently used
+        '''
+        self.clock += 1
+        tab.used = self.clock
+
+    @classmethod
+    def cost(cls, document):
+        '''
+        Return the estimated memory used by a document in bytes
+        '''
+        return (document.characterCount() * cls.CHAR_COST
+                + document.blockCount() * cls.BLOCK_COST)
+
+    def resident(self):
+        '''
+        Return the estimated memory used by all loaded documents
+        '''
+        return sum(self.cost(tab.document) for tab in self.tabs
+                   if tab.document is not None)
+
+    def materialize(self, tab):
+        '''
+        Give an evicted tab a document again, from its swap file or its file.
+        Return why the file could not be read, its document is then empty.
+        A swap file that could not be read is left on disk.
+        '''
+        if tab.document is not None:
+            return None
+        text = ''
+        error = None
+        if tab.swap is not None:
+            try:
+                text = read_text(tab.swap, 'utf-8')
+            except OSError as e:
+                error = str(e)
+                tab.swap = None
+        elif tab.path is not None and tab.buffer is None:
+            try:
+                text = self.read_file(tab)
+            except OSError as e:
+                error = str(e)
+        tab.document = self.new_document(text)
+        if tab.buffer is None:
+            tab.document.setModified(tab.modified)
+        self.drop_swap(tab)
+        self.restores += 1
+        return error
+
+    @staticmethod
+    def read_file(tab):
+        '''
+        Read the file of a tab, detecting its encoding again when it was
+        rewritten in another one
+        '''
+        try:
+            return read_text(tab.path, tab.encoding)
+        except UnicodeDecodeError:
+            pass
+        with open(tab.path, 'rb') as file:
+            tab.encoding = detect_encoding(file.read(FileLoader.HEAD))
+        try:
+            return read_text(tab.path, tab.encoding)
+        except UnicodeDecodeError:
+            tab.encoding = 'latin-1'
+            return read_text(tab.path, tab.encoding)
+
+    def evict(self, keep=()):
+        '''
+        Drop the least recently used inactive documents until the rest
+        fits in the budget, tabs in keep are never dropped
+        '''
+        total = self.resident()
+        if total <= self.budget:
+            return
+        candidates = sorted(
+            (tab for index, tab in enumerate(self.tabs)
+             if index != self.active and tab.document is not None
+             and tab not in keep),
+            key=lambda tab: tab.used)
+        for tab in candidates:
+            if total <= self.budget:
+                break
+            cost = self.cost(tab.document)
+            if self.drop(tab):
+                total -= cost
+
+    def drop(self, tab):
+        '''
+        Free the document of an inactive tab, writing unsaved text to a
+        swap file first, return False when it has to stay in memory
+        '''
+        document = tab.document
+        if tab.buffer is None:
+            tab.modified = document.isModified()
+            if tab.modified:
+                try:
+                    self.write_swap(tab)
+                except (OSError, UnicodeEncodeError):
+                    self.drop_swap(tab)
+                    return False
+        tab.document = None
+        document.deleteLater()
+        self.evictions += 1
+        return True
+
+    def write_swap(self, tab):
+        '''
+        Save the text of a tab to a private swap file
+        '''
+        os.makedirs(SWAP_DIR, exist_ok=True)
+        fd, tab.swap = tempfile.mkstemp(suffix='.swp', dir=SWAP_DIR)
+        with os.fdopen(fd, 'wb') as file:
+            for chunk in document_chunks(tab.document, 'utf-8'):
+                file.write(chunk)
+
+    @staticmethod
+    def drop_swap(tab):
+        '''
+        Delete the swap file of a tab
+        '''
+        if tab.swap is None:
+            return
+        try:
+            os.remove(tab.swap)
+        except OSError:
+            pass
+        tab.swap = None
+
+    def close(self):
+        '''
+        Close every tab
+        '''
+        while self.tabs:
+            self.remove(len(self.tabs) - 1)
+
+    def stats(self):
+        '''
+        Return the number of tabs, loaded documents, evictions and
+        restores, and the estimated memory against the budget
+        '''
+        return {'tabs': len(self.tabs),
+                'resident': sum(1 for tab in self.tabs if tab.document is not None),
+                'resident_bytes': self.resident(),
+                'budget_bytes': self.budget,
+                'evictions': self.evictions,
+                'restores': self.restores}
@@ -0,0 +1,22 @@
+'''
+Shared setup of the tests: the sources on the path, the offscreen platform
+and one QApplication.
+'''
+
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from PyQt5.QtWidgets import QApplication
+
+
+@pytest.fixture(scope='session')
+def app():
+    '''
+    Return the running QApplication, creating an offscreen one if needed.
+    '''
+    return QApplication.instance() or QApplication(sys.argv[:1])
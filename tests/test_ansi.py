@@ -0,0 +1,46 @@
+'''
+Tests of the escape sequence renderer of the terminal.
+'''
+
+from utils.ansi import DEFAULT, Screen
+
+
+def rendered(screen):
+    '''
+    Return the output of a screen as runs of (text, foreground)
+    '''
+    _, scrolled, lines = screen.take()
+    return [(text, style.foreground) for text, style in scrolled + lines]
+
+
+def text(screen):
+    return ''.join(piece for piece, _ in rendered(screen))
+
+
+def test_carriage_return_overwrites():
+    screen = Screen()
+    screen.feed('progress 10%\rprogress 50%\rdone\n')
+    assert text(screen) == 'doneress 50%\n'
+
+
+def test_erase_to_end_of_line():
+    screen = Screen()
+    screen.feed('progress 10%\r\x1b[Kdone\n')
+    assert text(screen) == 'done\n'
+
+
+def test_escape_split_across_chunks():
+    screen = Screen()
+    for chunk in ('plain \x1b', '[3', '1mred\x1b[', '0m plain\n'):
+        screen.feed(chunk)
+    assert rendered(screen) == [('plain ', None), ('red', 1), (' plain\n', None)]
+
+
+def test_lines_scrolled_out_are_kept_up_to_the_scrollback():
+    screen = Screen(rows=5, scrollback=20)
+    screen.feed(''.join('line %d\n' % i for i in range(100)))
+    _, scrolled, lines = screen.take()
+    output = ''.join(piece for piece, _ in scrolled + lines).split('\n')
+    assert output[-2] == 'line 99'
+    assert len(output) <= 20 + 5
+    assert screen.style == DEFAULT
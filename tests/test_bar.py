@@ -0,0 +1,20 @@
+'''
+Tests of the line number bar.
+'''
+
+from PyQt5.QtGui import QFont
+
+from view.editor import Editor
+
+
+def test_numbers_cache_keeps_the_font_method(app):
+    editor = Editor()
+    editor.display_welcome = False
+    editor.setPlainText('x\n' * 100)
+    editor.resize(400, 300)
+    editor.show()
+    app.processEvents()
+    editor.lineNumberBar.repaint()
+    assert isinstance(editor.lineNumberBar.font(), QFont)
+    assert editor.lineNumberBar.numbers
+    editor.close()
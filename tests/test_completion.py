@@ -0,0 +1,38 @@
+'''
+Tests of the completion worker process.
+'''
+
+import multiprocessing
+import time
+
+import pytest
+
+from utils.completion import PARENT_CHECK, serve
+
+jedi = pytest.importorskip('jedi')
+
+
+def test_worker_stays_warm_when_idle():
+    context = multiprocessing.get_context('spawn')
+    requests, responses = context.Queue(), context.Queue()
+    process = context.Process(target=serve, args=(requests, responses), daemon=True)
+    process.start()
+    try:
+        requests.put((1, None, None, 'import os\nos.pa', 2, 5))
+        request_id, completions, _, error = responses.get(timeout=60)
+        assert (request_id, error) == (1, None)
+        assert 'path' in [name for name, _ in completions]
+
+        time.sleep(PARENT_CHECK + 2)
+        assert process.is_alive()
+
+        requests.put((2, None, None, 'import os\nos.sep', 2, 5))
+        request_id, completions, _, error = responses.get(timeout=60)
+        assert (request_id, error) == (2, None)
+        assert 'sep' in [name for name, _ in completions]
+    finally:
+        requests.put(None)
+        process.join(10)
+        if process.is_alive():
+            process.terminate()
+    assert process.exitcode == 0
@@ -0,0 +1,83 @@
+'''
+Tests of the code folding index.
+'''
+
+import random
+
+from PyQt5.QtGui import QTextCursor, QTextDocument
+from PyQt5.QtWidgets import QPlainTextDocumentLayout
+
+from syntax.folding import FoldIndex
+
+SOURCE = '''\
+def f():
+    a = 1
+    if a:
+        a = 2
+    b = 2
+
+
+class K:
+    """
+    doc
+    """
+    def g(self):
+        return 1
+
+x = 1
+'''
+
+
+def make_document(text):
+    '''
+    Return a document laid out like the one of the editor, and its index
+    '''
+    document = QTextDocument()
+    document.setDocumentLayout(QPlainTextDocumentLayout(document))
+    document.setPlainText(text)
+    return document, FoldIndex(document)
+
+
+def hidden(document):
+    return {block.blockNumber() for block in blocks(document) if not block.isVisible()}
+
+
+def blocks(document):
+    block = document.firstBlock()
+    while block.isValid():
+        yield block
+        block = block.next()
+
+
+def folded_lines(folds):
+    return {line for header, end in folds.folded.items()
+            for line in range(header + 1, end + 1)}
+
+
+def test_backspace_after_fold_shows_merged_line(app):
+    document, folds = make_document(SOURCE)
+    assert folds.fold(0)
+    assert hidden(document) == {1, 2, 3, 4}
+    cursor = QTextCursor(document.findBlockByNumber(5))
+    cursor.deletePreviousChar()
+    assert not folds.folded
+    assert hidden(document) == set()
+
+
+def test_hidden_lines_follow_folds_under_random_edits(app):
+    pieces = ['\n', '    ', 'x', 'def h():\n    pass\n', '"""', '']
+    for seed in range(300):
+        rng = random.Random(seed)
+        document, folds = make_document(SOURCE)
+        for _ in range(10):
+            for line in rng.sample(range(document.blockCount()), 3):
+                folds.fold(line)
+            cursor = QTextCursor(document)
+            start = rng.randrange(document.characterCount())
+            cursor.setPosition(start)
+            cursor.setPosition(min(start + rng.randrange(12), document.characterCount() - 1),
+                               QTextCursor.KeepAnchor)
+            cursor.insertText(rng.choice(pieces))
+            assert hidden(document) == folded_lines(folds), seed
+        folds.unfold_all()
+        assert hidden(document) == set(), seed
@@ -0,0 +1,52 @@
+'''
+Tests of searching the files of a folder.
+'''
+
+from concurrent.futures import Future
+
+from utils.grep import MMAP_SIZE, FolderSearch, compile_query, search_file
+
+
+def large_file(path):
+    line = b'x = 1  # filler line of a large file\n'
+    lines = [line] * (MMAP_SIZE // len(line) + 1000)
+    lines[10] = b'needle = 10\n'
+    lines[-5] = b'    return needle\n'
+    path.write_bytes(b''.join(lines))
+    return len(lines)
+
+
+def test_search_mapped_file(tmp_path):
+    path = tmp_path / 'big.py'
+    count = large_file(path)
+    assert path.stat().st_size >= MMAP_SIZE
+    matches = search_file(str(path), compile_query('needle'))
+    assert matches == [(11, 1, 'needle = 10'), (count - 4, 12, '    return needle')]
+
+
+def test_folder_search_finds_matches_in_large_files(tmp_path):
+    large_file(tmp_path / 'big.py')
+    (tmp_path / 'small.py').write_text('print(needle)\n')
+    search = FolderSearch(str(tmp_path), compile_query('needle'))
+    found = []
+    search.found.connect(found.extend)
+    search.run()
+    assert search.error is None
+    assert sorted((path.rsplit('/', 1)[-1], len(matches)) for path, matches in found) == [
+        ('big.py', 2), ('small.py', 1)]
+
+
+def test_failed_batch_does_not_end_the_search():
+    search = FolderSearch('.', compile_query('needle'))
+    found = []
+    search.found.connect(found.extend)
+    failed, succeeded = Future(), Future()
+    failed.set_exception(AttributeError('count'))
+    succeeded.set_result([('a.py', [(1, 1, 'needle')])])
+    search.pending = {failed, succeeded}
+    search.batches = {failed: 3, succeeded: 1}
+    search.collect(0)
+    assert search.error is None
+    assert search.skipped == 3
+    assert found == [('a.py', [(1, 1, 'needle')])]
+    assert not search.isInterruptionRequested()
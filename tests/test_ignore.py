@@ -0,0 +1,39 @@
+'''
+Tests of walking a folder while honouring .gitignore files.
+'''
+
+import os
+
+from utils.ignore import ignored, walk
+
+
+def tree(root, files):
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+def names(root, found):
+    return sorted(os.path.relpath(path, root).replace(os.sep, '/') for path, _ in found)
+
+
+def test_subfolder_walk_applies_ancestor_rules(tmp_path):
+    tree(tmp_path, {'.gitignore': 'build/\n*.log\n', 'src/.gitignore': 'gen/\n',
+                    'src/a.py': '', 'src/b.log': '', 'src/gen/c.py': '',
+                    'src/pkg/d.py': '', 'src/pkg/e.log': '', 'build/f.py': ''})
+    full = names(tmp_path, walk(str(tmp_path)))
+    assert full == ['.gitignore', 'src/.gitignore', 'src/a.py', 'src/pkg/d.py']
+    below = names(tmp_path, walk(str(tmp_path / 'src' / 'pkg'), base=str(tmp_path)))
+    assert below == ['src/pkg/d.py']
+    assert names(tmp_path, walk(str(tmp_path / 'build'), base=str(tmp_path))) == []
+    assert names(tmp_path, walk(str(tmp_path / 'src' / 'gen'), base=str(tmp_path))) == []
+
+
+def test_ignored_file(tmp_path):
+    tree(tmp_path, {'.gitignore': 'build/\n*.log\n!keep.log\n', 'src/a.py': '',
+                    'build/b.py': '', 'src/c.log': '', 'src/keep.log': ''})
+    assert not ignored(str(tmp_path / 'src' / 'a.py'), str(tmp_path))
+    assert ignored(str(tmp_path / 'build' / 'b.py'), str(tmp_path))
+    assert ignored(str(tmp_path / 'src' / 'c.log'), str(tmp_path))
+    assert not ignored(str(tmp_path / 'src' / 'keep.log'), str(tmp_path))
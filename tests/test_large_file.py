@@ -0,0 +1,65 @@
+'''
+Tests of editing a file in large-file mode.
+'''
+
+import codecs
+
+import pytest
+from PyQt5.QtGui import QTextCursor
+
+from view.editor import Editor
+
+
+def edit(app, path, data, line=5):
+    '''
+    Insert a character at the start of a line of a file in large-file
+    mode, return the bytes of the piece table
+    '''
+    path.write_bytes(data)
+    editor = Editor()
+    editor.openLargeFile(str(path))
+    assert not editor.isReadOnly()
+    cursor = QTextCursor(editor.document().findBlockByNumber(line))
+    cursor.insertText('#')
+    editor.commitWindow()
+    written = b''.join(editor.buffer.chunks())
+    pieces = len(editor.buffer.pieces)
+    editor.closeLargeFile()
+    return written, pieces
+
+
+@pytest.mark.parametrize('newline', [b'\n', b'\r\n'])
+@pytest.mark.parametrize('line', ['café = 1', 'été    = 2'])
+def test_edit_keeps_the_other_bytes(app, tmp_path, newline, line):
+    lines = [line.encode('utf-8')] * 3000
+    data = newline.join(lines) + newline
+    written, pieces = edit(app, tmp_path / 'file.txt', data)
+    offset = 5 * (len(lines[0]) + len(newline))
+    assert written == data[:offset] + b'#' + data[offset:]
+    # Only the inserted byte is added, around the original
+    assert pieces == 3
+
+
+def test_edit_latin1(app, tmp_path):
+    data = 'café = 1\r\n'.encode('latin-1') * 3000
+    written, _ = edit(app, tmp_path / 'file.txt', data)
+    offset = 5 * len(b'caf\xe9 = 1\r\n')
+    assert written == data[:offset] + b'#' + data[offset:]
+
+
+def test_edit_with_bom(app, tmp_path):
+    data = codecs.BOM_UTF8 + b'x = 1\n' * 3000
+    written, _ = edit(app, tmp_path / 'file.txt', data, line=0)
+    assert written == codecs.BOM_UTF8 + b'#' + data[3:]
+
+
+def test_mixed_newlines_are_read_only(app, tmp_path):
+    path = tmp_path / 'file.txt'
+    path.write_bytes(b'a\r\nb\n' * 3000)
+    editor = Editor()
+    editor.openLargeFile(str(path))
+    assert editor.window_locked and editor.isReadOnly()
+    editor.setReadOnly(False)
+    assert editor.isReadOnly()
+    editor.closeLargeFile()
+    assert not editor.isReadOnly()
@@ -0,0 +1,103 @@
+'''
+Tests of the find, replace and jump bars of the main window.
+'''
+
+import pytest
+from PyQt5.QtCore import QCoreApplication, QEvent, Qt
+from PyQt5.QtTest import QTest
+
+from view.editor import Editor
+from view.mainwindow import MainWindow
+
+
+@pytest.fixture
+def window(app):
+    window = MainWindow()
+    window.editor.display_welcome = False
+    window.editor.setReadOnly(False)
+    yield window
+    window.editor.document().setModified(False)
+    window.close()
+    window.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+
+def replace_all(window, text, find, replace, regex=False):
+    window.editor.setPlainText(text)
+    window.regex_action.setChecked(regex)
+    window.find_bar.setText(find)
+    window.replace_bar.setText(replace)
+    window.rpl_all()
+    return window.editor.toPlainText()
+
+
+def test_replace_all_is_one_undo_step(window):
+    text = 'foo = 1\nfoo += foo\n\U0001F600 foo\n'
+    assert replace_all(window, text, 'foo', 'bar') == 'bar = 1\nbar += bar\n\U0001F600 bar\n'
+    document = window.editor.document()
+    document.undo()
+    assert document.toPlainText() == text
+    assert not document.isUndoAvailable()
+
+
+def test_replace_all_with_groups(window):
+    text = 'f(a, b)\nf(c, d)\n'
+    assert replace_all(window, text, r'f\((\w), (\w)\)', r'g(\2, \1)', regex=True) == \
+        'g(b, a)\ng(d, c)\n'
+
+
+def test_invalid_group_leaves_the_text(window):
+    text = 'f(a)\n'
+    assert replace_all(window, text, r'f\((\w)\)', r'\2', regex=True) == text
+
+
+def jump(window, target):
+    window.jump_bar.setText(target)
+    window.jump()
+    cursor = window.editor.textCursor()
+    return cursor.blockNumber() + 1, cursor.positionInBlock()
+
+
+def test_jump_to_line_and_column(window):
+    window.editor.setPlainText('\n'.join('line %d' % i for i in range(1, 1001)))
+    assert jump(window, '500') == (500, 0)
+    assert jump(window, '20:4') == (20, 3)
+    assert jump(window, '5:99') == (5, 6)
+    assert jump(window, '99999') == (1000, 0)
+    assert jump(window, '@7') == (2, 0)
+    # Not a target, the cursor stays
+    assert jump(window, '3:x') == (2, 0)
+
+
+def test_jump_column_after_astral_characters(window):
+    window.editor.setPlainText('a\n\U0001F600\U0001F600xyz\n')
+    assert jump(window, '2:3') == (2, 4)
+    assert window.editor.document().characterAt(window.editor.textCursor().position()) == 'x'
+
+
+def test_jump_to_offset_in_large_file(app, tmp_path):
+    path = tmp_path / 'large.txt'
+    path.write_bytes(('x = 1\n' * 1000 + '\U0001F600\U0001F600 target\n').encode('utf-8'))
+    editor = Editor()
+    editor.openLargeFile(str(path))
+    editor.goToOffset(6000 + 9)
+    cursor = editor.textCursor()
+    assert cursor.positionInBlock() == 5
+    assert editor.document().characterAt(cursor.position()) == 't'
+    editor.closeLargeFile()
+
+
+def test_editing_tools_are_built_when_the_welcome_text_goes(app):
+    window = MainWindow()
+    editor = window.editor
+    assert editor.display_welcome
+    assert editor.completer is None and editor.folds is None
+    assert window.hightlighter.semantic is None
+    QTest.keyClick(editor, Qt.Key_A)
+    assert editor.completer is not None and editor.folds is not None
+    assert window.hightlighter.semantic is not None
+    assert editor.folds.document is editor.document()
+    editor.document().setModified(False)
+    window.close()
+    window.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
@@ -0,0 +1,50 @@
+'''
+Tests of the coalesced UI updates.
+'''
+
+from PyQt5.QtTest import QTest
+
+from utils.scheduler import UpdateScheduler
+
+
+def recorder(scheduler, names):
+    calls = []
+    for name in names:
+        scheduler.register(name, lambda name=name: calls.append(name))
+    return calls
+
+
+def test_marks_are_coalesced_until_flushed(app):
+    scheduler = UpdateScheduler()
+    calls = recorder(scheduler, ['title', 'status'])
+    for _ in range(100):
+        scheduler.mark('status')
+        scheduler.mark('title', 'status')
+    assert calls == []
+    scheduler.flush()
+    # In registration order, once each
+    assert calls == ['title', 'status']
+    assert scheduler.stats()['status']['marks'] == 200
+    assert scheduler.stats()['status']['runs'] == 1
+    scheduler.flush()
+    assert calls == ['title', 'status']
+
+
+def test_mark_while_flushing_runs_in_the_same_flush(app):
+    scheduler = UpdateScheduler()
+    calls = []
+    scheduler.register('first', lambda: calls.append('first'))
+    scheduler.register('second', lambda: (calls.append('second'), scheduler.mark('first')))
+    scheduler.mark('second')
+    scheduler.flush()
+    assert calls == ['second', 'first']
+    assert not scheduler.timer.isActive()
+
+
+def test_marks_run_on_the_next_event_loop_turn(app):
+    scheduler = UpdateScheduler()
+    calls = recorder(scheduler, ['title'])
+    scheduler.mark('title')
+    scheduler.mark('title')
+    QTest.qWait(10)
+    assert calls == ['title']
@@ -0,0 +1,58 @@
+'''
+Tests of the incremental search index of a document.
+'''
+
+import random
+
+from PyQt5.QtGui import QTextCursor, QTextDocument
+from PyQt5.QtWidgets import QPlainTextDocumentLayout
+
+from utils.search import SearchIndex, compile_pattern, document_text
+
+
+def index_of(text, pattern):
+    document = QTextDocument()
+    # Without a layout the document does not report its changes
+    document.setDocumentLayout(QPlainTextDocumentLayout(document))
+    document.setPlainText(text)
+    index = SearchIndex(document)
+    index.set_pattern(pattern)
+    return document, index
+
+
+def matched(document, index):
+    return [document_text(document, start, end)
+            for start, end in zip(index.starts, index.ends)]
+
+
+def test_modes(app):
+    text = 'Foo foo food\nfoo_bar FOO\n'
+    assert index_of(text, compile_pattern('foo'))[1].count() == 5
+    assert index_of(text, compile_pattern('foo', case=True))[1].count() == 3
+    assert index_of(text, compile_pattern('foo', word=True))[1].count() == 3
+    document, index = index_of(text, compile_pattern(r'fo+d?\b', regex=True))
+    assert matched(document, index) == ['Foo', 'foo', 'food', 'FOO']
+
+
+def test_positions_are_utf16(app):
+    document, index = index_of('\U0001F600 x = x\n\U0001F600\U0001F600 x\n',
+                               compile_pattern('x'))
+    assert index.starts == [3, 7, 14]
+    assert matched(document, index) == ['x', 'x', 'x']
+
+
+def test_incremental_updates_match_a_rescan(app):
+    rng = random.Random(7)
+    words = ['foo', 'bar', 'Foo', 'x', ' ', '\n', '\U0001F600', 'fo', 'o']
+    pattern = compile_pattern('foo')
+    document, index = index_of(''.join(rng.choice(words) for _ in range(200)), pattern)
+    for _ in range(300):
+        end = document.characterCount() - 1
+        cursor = QTextCursor(document)
+        cursor.setPosition(rng.randint(0, end))
+        cursor.setPosition(rng.randint(0, end), QTextCursor.KeepAnchor)
+        if '\U0001F600' in cursor.selectedText()[-1:]:
+            continue
+        cursor.insertText(''.join(rng.choice(words) for _ in range(rng.randint(0, 5))))
+        expected = index_of(document.toPlainText(), pattern)[1]
+        assert (index.starts, index.ends) == (expected.starts, expected.ends)
@@ -0,0 +1,55 @@
+'''
+Tests of the semantic analysis of Python modules.
+'''
+
+from collections import OrderedDict
+
+import pytest
+
+from syntax.semantic import analyse
+
+AFTER = '''
+
+class K:
+    """
+    K
+    """
+    def m(self):
+        return K
+
+
+k = K()
+'''
+
+
+def styles(source):
+    '''
+    Return the spans of a module by line text, and its bound names
+    '''
+    lines = source.split('\n')
+    spans, module = analyse(lines, OrderedDict())
+    return {lines[line].strip(): found for line, found in spans.items()}, module
+
+
+@pytest.mark.parametrize('closing', ['"""', 'end"""', 'x = 2 """'])
+def test_string_spanning_top_level_lines(closing):
+    spans, module = styles('def f(a):\n    """doc\nx = 1\n%s\n    return a\n' % closing + AFTER)
+    assert 'x = 1' not in spans and 'x' not in module
+    assert spans['return a'] == ((11, 1, 'parameter'),)
+    assert module['f'] == 'functions' and module['K'] == 'classes'
+    assert spans['class K:'] == ((6, 1, 'classes'),)
+    assert spans['return K'] == ((15, 1, 'classes'),)
+    assert spans['k = K()'] == ((0, 1, 'variable'), (4, 1, 'classes'))
+
+
+def test_string_spanning_top_level_statements():
+    spans, module = styles('s = """\nclass Inside:\n    pass\n"""\n' + AFTER)
+    assert 'Inside' not in module and 'class Inside:' not in spans
+    assert module['s'] == 'variable' and module['K'] == 'classes'
+    assert spans['k = K()'] == ((0, 1, 'variable'), (4, 1, 'classes'))
+
+
+def test_unclosed_string_is_repaired():
+    spans, module = styles('def f(a):\n    s = """doc\n    return a\n' + AFTER.replace('"""', '#'))
+    assert module['f'] == 'functions' and module['K'] == 'classes'
+    assert spans['k = K()'] == ((0, 1, 'variable'), (4, 1, 'classes'))
@@ -0,0 +1,44 @@
+'''
+Tests of the terminal widget.
+'''
+
+import codecs
+
+from PyQt5.QtTest import QTest
+
+from utils.profiler import PROFILER
+from view.terminal import FRAME, Terminal
+
+
+def test_shell_output_is_profiled(app):
+    terminal = Terminal()
+    terminal.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    PROFILER.reset()
+    PROFILER.enabled = True
+    try:
+        terminal.handle_shell_output('héllo\n'.encode('utf-8'))
+    finally:
+        PROFILER.enabled = False
+    stats = PROFILER.stats()
+    assert stats['counters']['terminal.bytes'] == 7
+    assert stats['timers']['terminal.output']['count'] == 1
+    PROFILER.reset()
+
+
+def test_output_is_flushed_once_per_frame_within_the_scrollback(app):
+    terminal = Terminal(scrollback=100)
+    for start in range(0, 1000, 50):
+        terminal.write_output(''.join('line %d\n' % i for i in range(start, start + 50)))
+        assert terminal.flush_timer.isActive()
+    assert terminal.output_text.document().toPlainText() == ''
+    QTest.qWait(FRAME * 4)
+    assert not terminal.flush_timer.isActive()
+    document = terminal.output_text.document()
+    assert document.blockCount() <= 100
+    lines = document.toPlainText().split('\n')
+    assert lines[-2] == 'line 999'
+    assert 'line 899' not in lines
+    terminal.write_output('more\n')
+    QTest.qWait(FRAME * 4)
+    assert document.blockCount() <= 100
+    assert document.toPlainText().split('\n')[-2] == 'more'
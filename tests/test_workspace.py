@@ -0,0 +1,61 @@
+'''
+Tests of the documents of the tabs within a memory budget.
+'''
+
+import os
+
+from view.workspace import DocumentTab, Workspace
+
+
+def evicted(workspace, path, text):
+    '''
+    Return a tab of a file whose document was dropped
+    '''
+    path.write_text(text, encoding='utf-8')
+    tab = DocumentTab(workspace.new_document(text), str(path))
+    tab.document.setModified(False)
+    workspace.add(tab)
+    assert workspace.drop(tab)
+    return tab
+
+
+def test_restore_from_file(app, tmp_path):
+    workspace = Workspace()
+    tab = evicted(workspace, tmp_path / 'a.py', 'x = 1\n')
+    assert workspace.materialize(tab) is None
+    assert tab.document.toPlainText() == 'x = 1\n'
+    assert not tab.is_modified()
+
+
+def test_restore_detects_new_encoding(app, tmp_path):
+    workspace = Workspace()
+    tab = evicted(workspace, tmp_path / 'a.py', 'x = 1\n')
+    (tmp_path / 'a.py').write_bytes('é = 1\n'.encode('latin-1'))
+    assert workspace.materialize(tab) is None
+    assert tab.document.toPlainText() == 'é = 1\n'
+    assert tab.encoding == 'latin-1'
+
+
+def test_restore_of_deleted_file_reports_it(app, tmp_path):
+    workspace = Workspace()
+    tab = evicted(workspace, tmp_path / 'a.py', 'x = 1\n')
+    (tmp_path / 'a.py').unlink()
+    assert 'a.py' in workspace.materialize(tab)
+
+
+def test_restore_of_unreadable_swap_keeps_it(app, tmp_path):
+    workspace = Workspace()
+    path = tmp_path / 'a.py'
+    path.write_text('x = 1\n', encoding='utf-8')
+    tab = DocumentTab(workspace.new_document('x = 2\n'), str(path))
+    workspace.add(tab)
+    assert workspace.drop(tab)
+    swap = tab.swap
+    os.remove(swap)
+    os.mkdir(swap)
+    try:
+        assert swap in workspace.materialize(tab)
+        workspace.remove(0)
+        assert os.path.isdir(swap)
+    finally:
+        os.rmdir(swap)